@@ -0,0 +1,182 @@
+"""
+Parse and tag many DREF Final Reports offline, e.g. to rebuild the Ops Learning dataset.
+
+Reports are given by a folder of PDF files and/or by Appeal codes (PDFs are then
+downloaded using GO API). Parsing is spread over a pool of worker processes,
+while tagging runs in this process with one model instance: all excerpts
+of a shard of reports are tagged in one call, so that they are batched together.
+
+Output is written to a folder as Parquet shards (part-00000.parquet, ...),
+with the same columns as the /parse_and_tag app plus 'Item' (the Appeal code
+or PDF file name). Reports that failed are listed in part-00000.errors.json.
+A manifest fixes which reports go to which shard, so the command can be
+run again after a crash or interruption: finished shards are skipped
+(and shards with failed reports are processed again with --retry-failed).
+
+Run from the root folder, e.g.:
+
+    python batch.py --folder ../data/PDF-2020 --output ../data/ops_learning --workers 8
+    python batch.py --codes MDRDO013 MDRBO014 --output ../data/ops_learning
+    python batch.py --codes-file codes.txt --output ../data/ops_learning --retry-failed
+"""
+import argparse
+import glob
+import json
+import multiprocessing
+import os
+import re
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import pandas as pd
+
+from pipeline import parse_report, parsing_error_message, select_excerpts, add_tags
+from dref_tagging.prediction import predict_tags_any_length
+
+manifest_name = 'manifest.json'
+lead_pattern = re.compile(r'^MDR[A-Z0-9]{5}')
+
+
+# Items to process: dicts with item id, lead and path of the PDF file (or None to download)
+def get_items(folder=None, codes=(), offline=False):
+    items = []
+    if folder:
+        for pdf_path in sorted(glob.glob(os.path.join(folder, '*.pdf'))):
+            if pdf_path.endswith('_copy.pdf'):
+                continue
+            name = os.path.basename(pdf_path)
+            # Appeal code from the file name (e.g. MDRCD030dfr.pdf) gives the global features
+            match = lead_pattern.match(name)
+            lead = match.group(0) if (match and not offline) else 'Unknown'
+            items.append(dict(item=name, lead=lead, pdf_path=os.path.abspath(pdf_path)))
+    for code in codes:
+        items.append(dict(item=code, lead=code, pdf_path=None))
+
+    # drop duplicates, keep order
+    unique = {}
+    for item in items:
+        unique.setdefault(item['item'], item)
+    return list(unique.values())
+
+
+def shard_file(output, shard, suffix='.parquet'):
+    return os.path.join(output, f'part-{shard:05d}{suffix}')
+
+
+# Load the manifest, or create it by splitting items into shards
+def get_manifest(output, items, shard_size):
+    manifest_file = os.path.join(output, manifest_name)
+    if os.path.exists(manifest_file):
+        with open(manifest_file, 'r') as f:
+            manifest = json.load(f)
+        known = set(item['item'] for shard in manifest['shards'] for item in shard)
+        new_items = [item for item in items if item['item'] not in known]
+        if new_items:
+            # new reports go to new shards, existing shards stay as they are
+            for i in range(0, len(new_items), shard_size):
+                manifest['shards'].append(new_items[i:i+shard_size])
+            write_atomic(manifest_file, json.dumps(manifest, indent=1))
+        return manifest
+
+    manifest = dict(shards=[items[i:i+shard_size] for i in range(0, len(items), shard_size)])
+    os.makedirs(output, exist_ok=True)
+    write_atomic(manifest_file, json.dumps(manifest, indent=1))
+    return manifest
+
+
+def write_atomic(filename, data):
+    tmp_name = filename + '.tmp'
+    if isinstance(data, str):
+        data = data.encode('utf-8')
+    with open(tmp_name, 'wb') as f:
+        f.write(data)
+    os.replace(tmp_name, filename)
+
+
+# Shards that are not finished (or have failed reports, if retry_failed)
+def shards_to_process(output, manifest, retry_failed=False):
+    todo = []
+    for shard in range(len(manifest['shards'])):
+        if not os.path.exists(shard_file(output, shard)):
+            todo.append(shard)
+        elif retry_failed and os.path.exists(shard_file(output, shard, '.errors.json')):
+            # a shard without errors file (e.g. deleted by hand) has no failed reports to retry
+            with open(shard_file(output, shard, '.errors.json'), 'r') as f:
+                if json.load(f):
+                    todo.append(shard)
+    return todo
+
+
+# Tag all excerpts of the parsed reports of a shard in one call
+def tag_shard(parsed):
+    dfs = []
+    for item, all_parsed in parsed:
+        df = select_excerpts(all_parsed)
+        df['Item'] = item['item']
+        dfs.append(df)
+    if len(dfs) == 0:
+        return pd.DataFrame()
+    df = pd.concat(dfs, ignore_index=True)
+    item_column = df.pop('Item')
+    tags = predict_tags_any_length(df['Modified Excerpt'].tolist())
+    df = add_tags(df, tags)
+    df.insert(0, 'Item', item_column.loc[df.index].values)
+    return df.reset_index(drop=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Parse and tag DREF Final Reports in parallel')
+    parser.add_argument('-f', '--folder', help='Folder with PDF reports')
+    parser.add_argument('-c', '--codes', nargs='*', default=[], help='Appeal codes of reports to download')
+    parser.add_argument('--codes-file', help='Text file with Appeal codes, one per line')
+    parser.add_argument('-o', '--output', required=True, help='Output folder for Parquet shards')
+    parser.add_argument('-w', '--workers', type=int, default=os.cpu_count(), help='Number of parsing processes')
+    parser.add_argument('-s', '--shard-size', type=int, default=100, help='Number of reports per shard')
+    parser.add_argument('--offline', action='store_true',
+                        help="Don't use GO API for reports in folder (global features are 'Unknown')")
+    parser.add_argument('--retry-failed', action='store_true', help='Process again shards with failed reports')
+    args = parser.parse_args()
+
+    codes = list(args.codes)
+    if args.codes_file:
+        with open(args.codes_file, 'r') as f:
+            codes += [line.strip() for line in f if line.strip()]
+
+    items = get_items(folder=args.folder, codes=codes, offline=args.offline)
+    manifest = get_manifest(args.output, items, args.shard_size)
+    todo = shards_to_process(args.output, manifest, retry_failed=args.retry_failed)
+    print(f'{len(items)} reports, {len(manifest["shards"])} shards, {len(todo)} to process')
+
+    start = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=args.workers, mp_context=multiprocessing.get_context('spawn')) as pool:
+
+        # Parsing of the next shard is submitted before tagging of the current one,
+        # so that the workers keep parsing while the model is tagging
+        def submit(shard):
+            return [(item, pool.submit(parse_report, item['lead'], pdf_path=item['pdf_path']))
+                    for item in manifest['shards'][shard]]
+
+        futures = submit(todo[0]) if todo else []
+        for i, shard in enumerate(todo):
+            current = futures
+            futures = submit(todo[i+1]) if i+1 < len(todo) else []
+
+            parsed = []
+            errors = {}
+            for item, future in current:
+                try:
+                    parsed.append((item, future.result()))
+                except Exception as e:
+                    errors[item['item']] = f'{parsing_error_message(e, item["lead"])}: {e!r}'
+
+            df = tag_shard(parsed)
+            # errors first: a shard counts as finished once its parquet file exists
+            write_atomic(shard_file(args.output, shard, '.errors.json'), json.dumps(errors, indent=1))
+            write_atomic(shard_file(args.output, shard), df.to_parquet(index=False))
+
+            elapsed = time.perf_counter() - start
+            print(f'shard {shard}: {len(parsed)} reports parsed, {len(errors)} failed, {len(df)} rows; '
+                  f'{i+1}/{len(todo)} shards in {elapsed:.0f} s')
+
+if __name__ == '__main__':
+    main()
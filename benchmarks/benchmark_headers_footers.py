@@ -0,0 +1,188 @@
+"""
+Time of dropping repeating headers and footers in ea_parsing (AppealDocument.drop_all_repeating_headers_footers):
+
+  loop:   repeating elements found in the whole document again after each drop
+          (the previous method, copied here from the oracle in ea_parsing/tests/test_appeal_document.py)
+  peeling: pages peeled layer by layer, only changed pages updated (ea_parsing.page_edges.PageEdges)
+
+Uses synthetic documents with a header of two lines and a footer of two blocks on each page,
+and the raw lines saved for the tests (ea_parsing/tests/raw_lines, see ea_parsing/tests/extract_lines.py) if there are any.
+Run from the root folder, e.g.:
+
+    python benchmarks/benchmark_headers_footers.py --pages 20 80 200
+"""
+import argparse
+import glob
+import os
+import time
+
+import pandas as pd
+
+import ea_parsing.definitions
+from ea_parsing import normalization
+from ea_parsing.lines import Lines
+from ea_parsing.appeal_document import AppealDocument
+from ea_parsing.lessons_learned_extractor import get_title_matcher
+
+parser = argparse.ArgumentParser()
+parser.add_argument('-f', '--folder', default='ea_parsing/tests/raw_lines', help='Folder with saved raw lines')
+parser.add_argument('-p', '--pages', nargs='*', type=int, default=[20, 80, 200], help='Number of pages of synthetic documents')
+args = parser.parse_args()
+
+document = AppealDocument(name='', document_url='', created_at='')
+
+
+def drop_all_repeating_headers_footers_loop(lines):
+    """
+    Drop all repeating headers and footers, finding them again in the whole document after each drop (the method before AppealDocument.drop_all_repeating_headers_footers).
+    """
+    # Drop header blocks
+    while True:
+        repeating_blocks = get_repeating_blocks(which='top', lines=lines)
+        if repeating_blocks.empty:
+            break
+        lines = lines.drop(repeating_blocks['index'].explode())
+
+    # Drop header lines
+    while True:
+        repeating_lines = get_repeating_lines(which='top', lines=lines)
+        if repeating_lines.empty:
+            break
+        lines = lines.drop(repeating_lines['index'].explode())
+
+    # Drop footer blocks
+    while True:
+        repeating_blocks = get_repeating_blocks(which='bottom', lines=lines)
+        if repeating_blocks.empty:
+            break
+        lines = lines.drop(repeating_blocks['index'].explode())
+
+    # Drop footer lines
+    while True:
+        repeating_lines = get_repeating_lines(which='bottom', lines=lines)
+        if repeating_lines.empty:
+            break
+        lines = lines.drop(repeating_lines['index'].explode())
+
+    return lines
+
+
+def get_repeating_blocks(which, lines):
+    """
+    Get repeating blocks at the top or bottom of pages.
+    """
+    # Get spans in blocks at top of each page
+    lines['page_block'] = lines['page_number'].astype(str)+'_'+lines['block_number'].astype(str)
+
+    # Get the top and bottom blocks on each page
+    if which == 'top':
+        page_blocks = lines.loc[lines.groupby(['page_number'])['origin_y'].idxmin()]
+    elif which == 'bottom':
+        page_blocks = lines.loc[lines.groupby(['page_number'])['origin_y'].idxmax()]
+    else:
+        raise RuntimeError('Unrecognised value for "which", should be "top" or "bottom"')
+
+    # Get repeating texts
+    elements = lines.loc[lines['page_block'].isin(page_blocks['page_block'].unique())]
+    elements = elements\
+        .reset_index()\
+        .groupby(['page_number'])\
+        .agg({'text_base': lambda x: ' '.join(x), 'index': tuple})
+    elements = elements.loc[elements['text_base'].astype(bool)]
+    repeating_texts = elements\
+        .groupby(['text_base'])\
+        .filter(lambda x: len(x) > 2)
+
+    # Don't remove lessons learned or challenges titles
+    repeating_texts = repeating_texts.loc[
+        ~get_title_matcher().is_title(repeating_texts['text_base'])
+    ]
+
+    return repeating_texts
+
+
+def get_repeating_lines(which, lines):
+    """
+    Get repeating lines at the top or bottom of pages.
+    """
+    # Get the top and bottom lines on each page
+    if which == 'top':
+        page_lines = lines.loc[lines.groupby(['page_number'])['origin_y'].idxmin()]
+    elif which == 'bottom':
+        page_lines = lines.loc[lines.groupby(['page_number'])['origin_y'].idxmax()]
+    else:
+        raise RuntimeError('Unrecognised value for "which", should be "top" or "bottom"')
+
+    # Get repeating texts
+    page_lines = page_lines.loc[page_lines['text_base'].astype(bool)]
+    repeating_texts = page_lines\
+        .reset_index()\
+        .groupby(['text_base'])\
+        .filter(lambda x: len(x) > 2)
+
+    # Don't remove lessons learned or challenges titles
+    repeating_texts = repeating_texts.loc[
+        ~get_title_matcher().is_title_key(repeating_texts['text_key'])
+    ]
+
+    # Don't remove bullets
+    repeating_texts = repeating_texts.loc[~(
+        repeating_texts['text'].str.strip().isin(ea_parsing.definitions.BULLETS)
+    )]
+
+    return repeating_texts
+
+
+def synthetic_lines(n_pages):
+    """
+    Pages with a header block of two lines, 20 body blocks of three lines, and two footer blocks.
+    """
+    data = []
+    for page_number in range(n_pages):
+        blocks = [(0, ['emergency appeal', 'operation update'], 10)]
+        blocks += [(block_number, [f'text {page_number} {block_number} {i}' for i in range(3)], 50+30*block_number) for block_number in range(1, 21)]
+        blocks += [(21, ['internal'], 750), (22, ['ifrc org'], 780)]
+        for block_number, texts, origin_y in blocks:
+            for line_number, text in enumerate(texts):
+                data.append(dict(text=text, text_base=text, page_number=page_number, block_number=block_number, line_number=line_number, origin_y=origin_y+10*line_number))
+    lines = Lines(pd.DataFrame(data))
+    lines['text_key'] = normalization.text_key(lines['text_base'])
+    return lines
+
+
+def saved_lines(filename):
+    """
+    Saved raw lines, processed up to dropping headers and footers.
+    """
+    lines = Lines(pd.read_csv(filename, index_col=0))
+    lines = lines\
+        .merge_inline_text(exclude_texts=get_title_matcher())\
+        .sort_blocks_by_y()\
+        .combine_spans_same_style()\
+        .combine_bullet_spans()
+    lines['text_base'] = normalization.text_base(lines['text'])
+    lines['text_key'] = normalization.text_key(lines['text_base'])
+    lines = document.remove_photo_blocks(lines=lines)
+    return document.remove_page_labels_references(lines=lines)
+
+
+def measure(drop, lines):
+    start = time.perf_counter()
+    result = drop(lines=lines.copy())
+    return time.perf_counter() - start, len(lines) - len(result)
+
+
+documents = [(f'synthetic, {n_pages} pages', synthetic_lines(n_pages)) for n_pages in args.pages]
+documents += [(os.path.basename(filename), saved_lines(filename)) for filename in sorted(glob.glob(os.path.join(args.folder, '*.csv')))]
+
+rows = []
+for name, lines in documents:
+    time_before, dropped_before = measure(drop_all_repeating_headers_footers_loop, lines)
+    time_after, dropped_after = measure(document.drop_all_repeating_headers_footers, lines)
+    rows.append(dict(document=name, lines=len(lines), dropped=dropped_after, same=(dropped_before == dropped_after),
+                     time_before=time_before, time_after=time_after))
+
+df = pd.DataFrame(rows)
+pd.set_option('display.width', 200)
+print(df.to_string(index=False, float_format='{:.4f}'.format))
+print(f'Total time, s: {df.time_before.sum():.3f} -> {df.time_after.sum():.3f}')
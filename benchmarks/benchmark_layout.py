@@ -0,0 +1,66 @@
+"""
+Per-page cost of extracting header/footer candidates and text of DREF reports:
+
+  before: a pdfminer layout pass for header/footer candidates, 
+          then a separate text pass (--text-backend, Tika by default)
+  after:  a single pdfminer layout pass for both (text backend 'pdfminer', the default)
+
+This benchmark only measures the cost. The excerpts of the backends are compared
+by benchmarks/compare_text_backends.py.
+
+The cache of dref_parsing is not used. Run from the root folder, e.g.:
+
+    python benchmarks/benchmark_layout.py --folder ../data/PDF-2020 --limit 20
+    python benchmarks/benchmark_layout.py --folder ../data/PDF-2020 --text-backend pymupdf
+"""
+import argparse
+import glob
+import os
+import time
+
+import pandas as pd
+
+from dref_parsing.parser_utils import get_header_footer_candidates, get_header_footer_candidates_from_layout
+from dref_parsing.text_extraction import extract_text, extract_layout, layout_text
+
+parser = argparse.ArgumentParser()
+parser.add_argument('-f', '--folder', default='../data/PDF-2020', help='Folder with saved PDF reports')
+parser.add_argument('-n', '--limit', type=int, default=-1, help='Maximal number of PDFs to use')
+parser.add_argument('-b', '--text-backend', default='tika', help='Text backend of the separate text pass')
+args = parser.parse_args()
+
+filenames = sorted(glob.glob(os.path.join(args.folder, '*.pdf')))
+if args.limit > 0:
+    filenames = filenames[:args.limit]
+
+rows = []
+for filename in filenames:
+    with open(filename, 'rb') as f:
+        pdf_data = f.read()
+
+    start = time.perf_counter()
+    get_header_footer_candidates(pdf_data)
+    time_layout = time.perf_counter() - start
+    start = time.perf_counter()
+    extract_text(pdf_data, backend=args.text_backend)
+    time_text = time.perf_counter() - start
+
+    start = time.perf_counter()
+    pages = extract_layout(pdf_data)
+    get_header_footer_candidates_from_layout(pages)
+    layout_text(pages)
+    time_single = time.perf_counter() - start
+
+    rows.append(dict(file=os.path.basename(filename), pages=len(pages),
+                     before=time_layout+time_text, before_layout=time_layout, 
+                     before_text=time_text, after=time_single))
+
+df = pd.DataFrame(rows)
+if len(df) == 0:
+    print('No PDF files in', args.folder)
+else:
+    n_pages = df.pages.sum()
+    summary = pd.Series({col: 1000*df[col].sum()/n_pages for col in ['before_layout', 'before_text', 'before', 'after']})
+    print(f'{len(df)} PDFs, {n_pages} pages')
+    print('Time per page, ms:')
+    print(summary.round(1).to_string())
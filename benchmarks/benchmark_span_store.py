@@ -0,0 +1,109 @@
+"""
+Memory and construction time of the spans of ea_parsing (AppealDocument.raw_lines):
+
+  list of dicts: a DataFrame built from one dict per span (the previous extraction)
+  columns:       typed column arrays per page (ea_parsing.page_extraction.to_span_frame)
+
+Uses the raw lines saved for the tests (ea_parsing/tests/raw_lines, see ea_parsing/tests/extract_lines.py).
+If there are none, synthetic spans of a long report are used: a few fonts, sizes and colours, as in real reports.
+Run from the root folder, e.g.:
+
+    python benchmarks/benchmark_span_store.py
+    python benchmarks/benchmark_span_store.py --pages 200
+"""
+import argparse
+import glob
+import os
+import time
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+
+from ea_parsing.page_extraction import SPAN_COLUMNS, to_span_frame
+
+parser = argparse.ArgumentParser()
+parser.add_argument('-f', '--folder', default='ea_parsing/tests/raw_lines', help='Folder with saved raw lines')
+parser.add_argument('-p', '--pages', type=int, default=100, help='Number of pages of the synthetic report')
+args = parser.parse_args()
+
+
+def measure(build):
+    """
+    Time and peak traced memory of build(), and deep memory usage of the resulting DataFrame.
+    """
+    tracemalloc.start()
+    start = time.perf_counter()
+    df = build()
+    elapsed = time.perf_counter() - start
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return elapsed, peak, df.memory_usage(deep=True).sum()
+
+
+def synthetic_spans(n_pages, spans_per_page=150, seed=0):
+    """
+    Spans of a synthetic report, with the columns of the saved raw lines.
+    """
+    rng = np.random.default_rng(seed)
+    n = n_pages*spans_per_page
+    fonts = ['Helvetica', 'Helvetica-Bold', 'Arial-BoldMT', 'ArialMT', 'Montserrat-Light', 'Montserrat-SemiBold']
+    origin_y = rng.uniform(30, 810, n)
+    return pd.DataFrame({
+        'text': [f'Text of span {i} about the emergency response' for i in range(n)],
+        'font': rng.choice(fonts, n),
+        'size': rng.choice([8.0, 9.0, 10.5, 11.0, 14.0, 18.0], n),
+        'flags': rng.choice([4, 16, 20], n),
+        'color': rng.choice(['#000000', '#231f20', '#ed1b2e', '#ffffff'], n),
+        'bold': rng.random(n) < 0.2,
+        'highlight_color': rng.choice([None, '#ed1b2e', '#f2f2f2'], n, p=[0.9, 0.05, 0.05]),
+        'page_number': np.repeat(np.arange(n_pages), spans_per_page),
+        'block_number': rng.integers(0, 20, n),
+        'line_number': rng.integers(0, 10, n),
+        'span_number': rng.integers(0, 3, n),
+        'origin_x': rng.uniform(50, 500, n),
+        'origin_y': origin_y,
+        'total_y': origin_y + 842*np.repeat(np.arange(n_pages), spans_per_page),
+        'img': rng.random(n) < 0.05,
+        'bbox_x1': rng.uniform(50, 500, n),
+        'bbox_y1': origin_y - 10,
+        'bbox_x2': rng.uniform(50, 550, n),
+        'bbox_y2': origin_y + 2,
+    })
+
+
+filenames = sorted(glob.glob(os.path.join(args.folder, '*.csv')))
+if filenames:
+    documents = ((os.path.basename(filename), pd.read_csv(filename, index_col=0)) for filename in filenames)
+else:
+    print(f'No saved raw lines in {args.folder}, using a synthetic report of {args.pages} pages')
+    documents = [('synthetic', synthetic_spans(args.pages))]
+
+rows = []
+for name, saved in documents:
+
+    # Spans as dicts, as they were collected before: one dict per span with all keys
+    records = saved.to_dict(orient='records')
+
+    # Spans as column arrays of the pages, as they are collected now
+    pages_columns = [
+        {
+            col: page[col].to_numpy(dtype=dtype) if col in page else np.full(len(page), None, dtype=dtype)
+            for col, dtype in SPAN_COLUMNS.items()
+        }
+        for _, page in saved.groupby('page_number', sort=True)
+    ]
+
+    before = measure(lambda: pd.DataFrame(records))
+    after = measure(lambda: to_span_frame(pages_columns))
+    rows.append(dict(file=name, spans=len(saved),
+                     time_before=before[0], time_after=after[0],
+                     peak_before=before[1], peak_after=after[1],
+                     memory_before=before[2], memory_after=after[2]))
+
+df = pd.DataFrame(rows)
+summary = df.drop(columns=['file']).sum()
+print(f'{len(df)} documents, {int(summary.spans)} spans')
+print(f'DataFrame memory, MB:    {summary.memory_before/1e6:.1f} -> {summary.memory_after/1e6:.1f}')
+print(f'Peak construction, MB:   {df.peak_before.max()/1e6:.1f} -> {df.peak_after.max()/1e6:.1f} (largest document)')
+print(f'Construction time, s:    {summary.time_before:.3f} -> {summary.time_after:.3f}')
@@ -0,0 +1,56 @@
+"""
+Measure the startup cost of the tagging resources:
+time to import dref_tagging.prediction (and main), which no longer loads
+the model, and time to load tokenizer, model, tags, spaCy and translator
+with dref_tagging.registry.warmup.
+
+Every measurement runs in a fresh Python process, to get cold timings.
+Run from the root folder, e.g.:
+
+    python benchmarks/benchmark_startup.py --repeat 3
+"""
+import argparse
+import json
+import subprocess
+import sys
+
+import pandas as pd
+
+parser = argparse.ArgumentParser()
+parser.add_argument('-r', '--repeat', type=int, default=3, help='Number of fresh processes per measurement')
+args = parser.parse_args()
+
+# Code run in the fresh process; it prints a json dict of timings
+script = """
+import json, time
+timings = {}
+start = time.perf_counter()
+import dref_tagging.prediction
+timings['import prediction'] = time.perf_counter() - start
+
+start = time.perf_counter()
+import main
+timings['import main (parse_and_tag app)'] = time.perf_counter() - start
+
+from dref_tagging.registry import registry, warmup
+warmup([])
+for name in ['tokenizer', 'backend', 'tags_dict', 'nlp_spacy', 'translator']:
+    start = time.perf_counter()
+    registry.get(name)
+    timings['load ' + name] = time.perf_counter() - start
+
+start = time.perf_counter()
+dref_tagging.prediction.predict_tags(['A pre hurricane season meeting will be held in June.'])
+timings['first prediction after warmup'] = time.perf_counter() - start
+print(json.dumps(timings))
+"""
+
+results = []
+for i in range(args.repeat):
+    output = subprocess.run([sys.executable, '-c', script], check=True,
+                            capture_output=True, text=True).stdout
+    results.append(json.loads(output.strip().splitlines()[-1]))
+
+df = pd.DataFrame(results)
+summary = pd.DataFrame({'mean, s': df.mean(), 'min, s': df.min(), 'max, s': df.max()})
+print(summary.round(3).to_string())
@@ -0,0 +1,56 @@
+"""
+Compare latency of tagging the excerpts of a report row by row 
+(one predict_tags_any_length call per excerpt) against tagging 
+the whole report in one call, as done in main.parse_and_tag.
+
+Run from the root folder, e.g.:
+
+    python benchmarks/benchmark_tagging.py --folder ../data/PDF-2020 --limit 10
+"""
+import argparse
+import glob
+import os
+import time
+
+import pandas as pd
+
+from dref_parsing.parser_utils import parse_PDF_combined
+from dref_tagging.prediction import predict_tags_any_length
+
+parser = argparse.ArgumentParser()
+parser.add_argument('-f', '--folder', default='../data/PDF-2020', help='Folder with saved PDF reports')
+parser.add_argument('-n', '--limit', type=int, default=-1, help='Maximal number of PDFs to use')
+args = parser.parse_args()
+
+pdf_names = sorted(glob.glob(os.path.join(args.folder, '*.pdf')))
+if args.limit > 0:
+    pdf_names = pdf_names[:args.limit]
+
+results = []
+for pdf_name in pdf_names:
+    with open(pdf_name, 'rb') as f:
+        pdf_file = f.read()
+    excerpts = parse_PDF_combined('Unknown', pdf_file=pdf_file)['Modified Excerpt']
+
+    # Old approach: one call per excerpt
+    start = time.perf_counter()
+    per_row = excerpts.apply(lambda x: predict_tags_any_length(x)[0]).tolist()
+    time_per_row = time.perf_counter() - start
+
+    # New approach: one call per report
+    start = time.perf_counter()
+    per_report = predict_tags_any_length(excerpts.tolist())
+    time_per_report = time.perf_counter() - start
+
+    results.append({'pdf': os.path.basename(pdf_name),
+                    'excerpts': len(excerpts),
+                    'per_row, s': time_per_row,
+                    'per_report, s': time_per_report,
+                    'same tags': [set(t) for t in per_row] == [set(t) for t in per_report]})
+
+results = pd.DataFrame(results)
+print(results.to_string(index=False))
+if len(results) > 0:
+    print(f"\nTotal: per_row {results['per_row, s'].sum():.2f} s, "
+          f"per_report {results['per_report, s'].sum():.2f} s, "
+          f"speedup x{results['per_row, s'].sum() / results['per_report, s'].sum():.2f}")
@@ -0,0 +1,35 @@
+"""
+Regression check and timing of the text extraction backends of dref_parsing
+(see dref_parsing/text_extraction.py): Challenges and Lessons Learnt parsed 
+from the text of each backend are compared to those parsed from the Tika text.
+
+Run from the root folder, e.g.:
+
+    python benchmarks/compare_text_backends.py --folder ../data/PDF-2020 --limit 20
+"""
+import argparse
+
+from dref_parsing.parser_utils import compare_text_backends
+
+parser = argparse.ArgumentParser()
+parser.add_argument('-f', '--folder', default='../data/PDF-2020', help='Folder with saved PDF reports')
+parser.add_argument('-n', '--limit', type=int, default=-1, help='Maximal number of PDFs to use')
+parser.add_argument('-b', '--backends', nargs='+', default=['pdfminer', 'pymupdf'], help='Backends to compare')
+parser.add_argument('-r', '--reference', default='tika', help='Reference backend')
+parser.add_argument('-o', '--output', default='', help='Optional csv file for results per PDF')
+args = parser.parse_args()
+
+df = compare_text_backends(folder=args.folder, backends=args.backends, 
+                           reference=args.reference, limit=args.limit)
+if args.output:
+    df.to_csv(args.output, index=False)
+
+summary = df.groupby(['backend', 'Learning'])[['n_reference', 'n_excerpts', 'n_exact', 
+                                                'n_missed', 'n_extra', 'n_same_sector']].sum()
+summary['exact, %'] = (100*summary.n_exact/summary.n_reference).round(1)
+print(summary.to_string())
+
+# time is the same for both Learnings of a PDF
+times = df.drop_duplicates(['file', 'backend']).groupby('backend').time.agg(['mean', 'sum'])
+print('\nText extraction time per PDF, s:')
+print(times.round(3).to_string())
@@ -0,0 +1,237 @@
+import os
+import sys
+import hmac
+import json
+import shutil
+import hashlib
+import tempfile
+
+# ****************************************************************************************
+# ON-DISK CACHE OF DOWNLOADED AND PARSED PDFs
+# ****************************************************************************************
+# Layout of the cache folder:
+#   index/<sha1 of lead|url>.json   -> {"lead": ..., "url": ..., "sha": ...}
+#   docs/<sha256 of PDF content>/   -> document.pdf, text_<method>.txt, extras.json
+#
+# Documents are content-addressed: the same PDF (downloaded for a lead, or uploaded)
+# is stored and parsed only once. The index maps a lead and its document URL to
+# the content, so a new URL for the lead (e.g. an updated report) is a cache miss.
+# Folders are created by the first write, not on import.
+#
+# Eviction scans all documents, so it is not done after every write: only when the size
+# known to the worker (size at its last scan plus what it wrote since) exceeds the limit,
+# or after it wrote a tenth of the limit (to take into account writes of other workers).
+#
+# The cache is cleared with 'python -m dref_parsing.cache [lead]', or with the
+# /invalidate_cache/ endpoint, which needs the admin token in header X-Admin-Token.
+#
+# Settings by environment variables:
+#   DREF_PARSING_CACHE_DIR         - cache folder (default: dref_parsing_cache in temp folder)
+#   DREF_PARSING_CACHE_MAX_BYTES   - size limit of all documents, least recently used
+#                                    ones are evicted (default 1 GB, 0 disables the cache)
+#   DREF_PARSING_CACHE_ADMIN_TOKEN - token for /invalidate_cache/ (if not set, the endpoint is disabled)
+
+default_cache_dir = os.path.join(tempfile.gettempdir(), 'dref_parsing_cache')
+default_max_bytes = 1024**3
+
+admin_token = os.environ.get('DREF_PARSING_CACHE_ADMIN_TOKEN', '')
+
+
+def content_hash(data):
+    return hashlib.sha256(data).hexdigest()
+
+
+class PDFCache:
+    def __init__(self, folder=default_cache_dir, max_bytes=default_max_bytes):
+        self.folder = folder
+        self.max_bytes = max_bytes
+        self.enabled = max_bytes > 0
+        self.index_folder = os.path.join(folder, 'index')
+        self.docs_folder = os.path.join(folder, 'docs')
+        # Size of documents at the last eviction scan (None before the first one),
+        # and number of bytes written by this worker since then
+        self.scanned_bytes = None
+        self.written_bytes = 0
+
+    # ------------------------------------------------------------------
+    # Helpers
+
+    def _index_file(self, lead, url):
+        key = hashlib.sha1(f'{lead}|{url}'.encode('utf-8')).hexdigest()
+        return os.path.join(self.index_folder, key + '.json')
+
+    def _doc_folder(self, sha):
+        return os.path.join(self.docs_folder, sha)
+
+    # Write to a temporary file and rename it, so that readers
+    # (other workers) never see a partially written file
+    def _write_atomic(self, filename, data):
+        os.makedirs(os.path.dirname(filename), exist_ok=True)
+        fd, tmp_name = tempfile.mkstemp(dir=os.path.dirname(filename), suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(data)
+            os.replace(tmp_name, filename)
+        except BaseException:
+            if os.path.exists(tmp_name):
+                os.remove(tmp_name)
+            raise
+
+    # Returns file content, or None if it is not in cache.
+    # The document is marked as recently used.
+    def _read(self, sha, name):
+        if not self.enabled:
+            return None
+        try:
+            with open(os.path.join(self._doc_folder(sha), name), 'rb') as f:
+                data = f.read()
+            os.utime(self._doc_folder(sha))
+        except OSError:
+            # missing, or evicted in the meantime by another worker
+            return None
+        return data
+
+    # Returns True if the file is written. Errors (e.g. the document evicted by another
+    # worker in the meantime, or a full disk) are only reported, as for reading:
+    # the cache never fails a request
+    def _write(self, sha, name, data):
+        if not self.enabled:
+            return False
+        try:
+            self._write_atomic(os.path.join(self._doc_folder(sha), name), data)
+            os.utime(self._doc_folder(sha))
+        except OSError as e:
+            print(f'WARNING: PDF cache: {name} of {sha} not written: {e}')
+            return False
+        self.written_bytes += len(data)
+        if (self.scanned_bytes is None 
+                or self.scanned_bytes + self.written_bytes > self.max_bytes
+                or self.written_bytes > self.max_bytes / 10):
+            self.evict()
+        return True
+
+    # ------------------------------------------------------------------
+    # PDF bytes, by lead and URL
+
+    def get_pdf(self, lead, url):
+        if not self.enabled:
+            return None
+        try:
+            with open(self._index_file(lead, url), 'r') as f:
+                sha = json.load(f)['sha']
+        except (OSError, ValueError, KeyError):
+            return None
+        return self._read(sha, 'document.pdf')
+
+    def put_pdf(self, lead, url, pdf_data):
+        sha = content_hash(pdf_data)
+        if not self.enabled:
+            return sha
+        if self._write(sha, 'document.pdf', pdf_data):
+            entry = json.dumps(dict(lead=lead, url=url, sha=sha))
+            try:
+                self._write_atomic(self._index_file(lead, url), entry.encode('utf-8'))
+            except OSError as e:
+                print(f'WARNING: PDF cache: index entry of {lead} not written: {e}')
+        return sha
+
+    # ------------------------------------------------------------------
+    # Parsing results, by content hash
+
+    # Text extracted from PDF with a given method (e.g. 'tika')
+    def get_text(self, sha, method='tika'):
+        data = self._read(sha, f'text_{method}.txt')
+        return None if data is None else data.decode('utf-8')
+
+    def put_text(self, sha, text, method='tika'):
+        self._write(sha, f'text_{method}.txt', text.encode('utf-8'))
+
+    # Header/footer candidates, as a dict of lists of strings
+    def get_extras(self, sha):
+        data = self._read(sha, 'extras.json')
+        return None if data is None else json.loads(data.decode('utf-8'))
+
+    def put_extras(self, sha, extras):
+        self._write(sha, 'extras.json', json.dumps(extras).encode('utf-8'))
+
+    # ------------------------------------------------------------------
+    # Eviction & invalidation
+
+    # Total size of documents and their last use, sorted from least recently used
+    def _doc_usage(self):
+        usage = []
+        for sha in self._listdir(self.docs_folder):
+            folder = self._doc_folder(sha)
+            try:
+                size = sum(os.path.getsize(os.path.join(folder, name)) for name in os.listdir(folder))
+                usage.append((os.path.getmtime(folder), size, sha))
+            except OSError:
+                continue
+        return sorted(usage)
+
+    @staticmethod
+    def _listdir(folder):
+        try:
+            return os.listdir(folder)
+        except FileNotFoundError:
+            return []
+
+    # Remove least recently used documents until the cache fits into max_bytes
+    def evict(self):
+        if not self.enabled:
+            return
+        usage = self._doc_usage()
+        total = sum(size for _, size, _ in usage)
+        for _, size, sha in usage:
+            if total <= self.max_bytes:
+                break
+            shutil.rmtree(self._doc_folder(sha), ignore_errors=True)
+            total -= size
+        self.scanned_bytes = total
+        self.written_bytes = 0
+        # Index entries of evicted documents are harmless:
+        # get_pdf returns None for them, and put_pdf overwrites them
+
+    # Remove cached data for a lead (or everything if lead is None)
+    def invalidate(self, lead=None):
+        if not self.enabled:
+            return 0
+        if lead is None:
+            n_removed = len(self._listdir(self.docs_folder))
+            shutil.rmtree(self.index_folder, ignore_errors=True)
+            shutil.rmtree(self.docs_folder, ignore_errors=True)
+            self.scanned_bytes = 0
+            self.written_bytes = 0
+            return n_removed
+
+        n_removed = 0
+        for name in self._listdir(self.index_folder):
+            index_file = os.path.join(self.index_folder, name)
+            try:
+                with open(index_file, 'r') as f:
+                    entry = json.load(f)
+            except (OSError, ValueError):
+                continue
+            if entry.get('lead') == lead:
+                shutil.rmtree(self._doc_folder(entry['sha']), ignore_errors=True)
+                if os.path.exists(index_file):
+                    os.remove(index_file)
+                n_removed += 1
+        return n_removed
+
+
+# Cache used by parser_utils
+pdf_cache = PDFCache(folder = os.environ.get('DREF_PARSING_CACHE_DIR', default_cache_dir),
+                     max_bytes = int(os.environ.get('DREF_PARSING_CACHE_MAX_BYTES', default_max_bytes)))
+
+
+# Check the admin token of a request to /invalidate_cache/
+def invalidation_allowed(token):
+    return bool(admin_token) and (token is not None) and hmac.compare_digest(token.encode('utf-8'), admin_token.encode('utf-8'))
+
+
+# Clear the cache of a lead (or the whole cache) from the command line:
+#   python -m dref_parsing.cache [lead]
+if __name__ == "__main__":
+    lead = sys.argv[1] if len(sys.argv) > 1 else None
+    print(f'PDF cache: {pdf_cache.invalidate(lead=lead)} documents removed')
@@ -0,0 +1,24 @@
+import os
+from dref_parsing.bounded_executor import BoundedExecutor, ExecutorSaturated, process_pool
+
+__all__ = ['ExecutorSaturated', 'parsing_workers', 'parsing_executor']
+
+# ****************************************************************************************
+# EXECUTION OF PARSING OUTSIDE THE EVENT LOOP
+# ****************************************************************************************
+# Parsing (downloads, tika, pdfminer) is blocking and CPU-bound, so the API runs it
+# in a pool of worker processes. The number of requests waiting for or running in
+# the pool is limited: when the limit is reached, ExecutorSaturated is raised and 
+# the API answers 503, instead of queueing requests without bounds.
+#
+# Settings by environment variables:
+#   DREF_PARSING_WORKERS     - number of parsing processes (default: number of CPUs, at most 4)
+#   DREF_PARSING_MAX_PENDING - maximal number of parsing requests running or queued
+#                              (default: 2 x number of parsing processes)
+# BoundedExecutor is shared with dref_tagging and ea_parsing, see bounded_executor.py
+
+# Worker processes are spawned (see bounded_executor.process_pool).
+# They load GO data from the local snapshot and share the PDF cache on disk
+parsing_workers = int(os.environ.get('DREF_PARSING_WORKERS', min(4, os.cpu_count() or 1)))
+parsing_executor = BoundedExecutor(process_pool(parsing_workers),
+                                   max_pending = int(os.environ.get('DREF_PARSING_MAX_PENDING', 2*parsing_workers)))
@@ -0,0 +1,132 @@
+"""
+HTTP client shared across the process: a requests.Session with a connection pool, timeouts and bounded retries.
+
+This module is copied, identical, in dref_parsing and ea_parsing: the packages are installed and deployed independently
+(each has its own setup.py, requirements and Dockerfile), so neither can import it from the other.
+Keep the copies identical (checked by ea_parsing/tests/test_shared_modules.py).
+Settings are read from environment variables prefixed with the package name, e.g. EA_PARSING_HTTP_TIMEOUT or DREF_PARSING_HTTP_TIMEOUT.
+"""
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+# Prefix of environment variables, e.g. EA_PARSING_HTTP_
+ENV_PREFIX = __name__.split('.')[0].upper() + '_HTTP_'
+
+
+class HTTPClient:
+    def __init__(self, timeout=None, retries=None, backoff_factor=None, max_workers=None):
+        """
+        HTTP client with connection pooling, timeouts and retries, shared across the process (see get_client).
+
+        Parameters
+        ----------
+        timeout : float (default=None)
+            Timeout in seconds for connecting and for reading a response. Default from environment variable <PACKAGE>_HTTP_TIMEOUT, or 60.
+
+        retries : int (default=None)
+            Maximum number of retries of a request after connection errors and 429/5xx responses. Default from environment variable <PACKAGE>_HTTP_RETRIES, or 3.
+
+        backoff_factor : float (default=None)
+            Retries wait backoff_factor * 2^(retry number - 1) seconds. Default from environment variable <PACKAGE>_HTTP_BACKOFF, or 0.5.
+
+        max_workers : int (default=None)
+            Number of pages fetched concurrently, and size of the connection pool. Default from environment variable <PACKAGE>_HTTP_MAX_WORKERS, or 8.
+        """
+        self.timeout = timeout if timeout is not None else float(os.environ.get(ENV_PREFIX+'TIMEOUT', 60))
+        retries = retries if retries is not None else int(os.environ.get(ENV_PREFIX+'RETRIES', 3))
+        backoff_factor = backoff_factor if backoff_factor is not None else float(os.environ.get(ENV_PREFIX+'BACKOFF', 0.5))
+        self.max_workers = max_workers if max_workers is not None else int(os.environ.get(ENV_PREFIX+'MAX_WORKERS', 8))
+
+        retry = Retry(
+            total=retries,
+            backoff_factor=backoff_factor,
+            status_forcelist=[429, 500, 502, 503, 504],
+            allowed_methods=['GET'],
+            raise_on_status=False
+        )
+        adapter = HTTPAdapter(max_retries=retry, pool_connections=self.max_workers, pool_maxsize=self.max_workers)
+        self.session = requests.Session()
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+        self.executor = ThreadPoolExecutor(max_workers=self.max_workers)
+
+    def get(self, url, params=None):
+        """
+        Send a GET request and return the response, raising an error for unsuccessful status codes.
+
+        Parameters
+        ----------
+        url : string (required)
+            URL to request.
+
+        params : dict (default=None)
+            Params to pass in the request.
+        """
+        response = self.session.get(url=url, params=params, timeout=self.timeout)
+        response.raise_for_status()
+        return response
+
+    def get_results(self, url, params=None):
+        """
+        Get results from a paginated API (e.g. IFRC GO API) from the URL.
+        After the first page, the total number of results is known, and the remaining pages are fetched concurrently.
+
+        Parameters
+        ----------
+        url : string (required)
+            URL to request.
+
+        params : dict (default=None)
+            Params to pass in the request.
+        """
+        data = self.get(url, params=params).json()
+        results = data['results']
+        if not data.get('next'):
+            return results
+
+        # Page offsets, if the total count is known
+        page_size = len(results)
+        count = data.get('count')
+        if (count is None) or (page_size == 0):
+            return results + self._get_results_sequentially(data['next'])
+
+        params = dict(params or {})
+        pages = self.executor.map(
+            lambda offset: self.get(url, params={**params, 'limit': page_size, 'offset': offset}).json()['results'],
+            range(page_size, count, page_size)
+        )
+        for page in pages:
+            results += page
+        return results
+
+    def _get_results_sequentially(self, url):
+        """
+        Get results looping through the pages, following the 'next' URLs.
+        """
+        results = []
+        while url:
+            data = self.get(url).json()
+            results += data['results']
+            url = data['next']
+        return results
+
+
+_client = None
+_client_pid = None
+_client_lock = threading.Lock()
+
+
+def get_client():
+    """
+    Get the HTTP client shared across the process. A forked process creates its own client, as connections cannot be shared.
+    """
+    global _client, _client_pid
+    with _client_lock:
+        if (_client is None) or (_client_pid != os.getpid()):
+            _client = HTTPClient()
+            _client_pid = os.getpid()
+    return _client
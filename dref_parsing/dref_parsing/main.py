@@ -1,6 +1,9 @@
-from fastapi import FastAPI, Query, HTTPException
+from fastapi import FastAPI, Query, HTTPException, Header
+from typing import Optional
 
 from dref_parsing.parser_utils import *
+from dref_parsing.cache import invalidation_allowed
+from dref_parsing.executors import parsing_executor, ExecutorSaturated
 
 
 app = FastAPI()
@@ -35,10 +38,12 @@ async def run_parsing(
     # Renaming: In the program we call it 'lead', while IFRC calls it 'Appeal_code'
     lead = Appeal_code 
 
-    all_parsed = parse_PDF_combined(lead)
-    
     try:
-        all_parsed = parse_PDF_combined(lead)
+        # Parsing runs in a worker process, so that the event loop keeps serving other requests
+        all_parsed = await parsing_executor.run(parse_PDF_combined, lead)
+    except ExecutorSaturated:
+        raise HTTPException(status_code=503, detail="All parsing workers are busy, please try again later",
+                            headers={"Retry-After": "30"})
     except ExceptionNotInAPI:
         raise HTTPException(status_code=404, 
                             detail=f"{lead} doesn't have a DREF Final Report in IFRC GO appeal database")
@@ -60,10 +65,11 @@ async def run_parsing(
 
 
 @app.post("/refresh/")
-async def reload_GO_API_data():
+def reload_GO_API_data(full: bool = Query(False, 
+        description='Download all data again. By default, only changes since the last refresh are downloaded')):
     try:
-        initialize_apdo(refresh=True)
-        initialize_aadf(refresh=True)
+        initialize_apdo(refresh=True, full=full)
+        initialize_aadf(refresh=True, full=full)
 
         # NB: we need to do import again, 
         # otherwise updated apdo, aadf won't be accessible here
@@ -73,7 +79,31 @@ async def reload_GO_API_data():
         output += ' (only DREF Final Reports are selected)'
     except:
         raise HTTPException(status_code=500, detail="Error while accessing GO API data")
-    return output 
+    return output
+
+
+# *********************************************************************
+
+@app.post("/invalidate_cache/")
+def invalidate_PDF_cache(
+    Appeal_code: Optional[str] = Query(None, title="Appeal code",
+        description="Remove cached PDF and parsing results for this Appeal code. If empty, the whole cache is cleared"),
+    x_admin_token: Optional[str] = Header(None)):
+    """
+    Remove downloaded PDFs and their parsing results from the cache.  
+    Normally not needed, since a new URL of the report is not found in cache.
+    But it may be useful if a PDF was replaced under the same URL,
+    or if the parser changed.
+
+    Needs the token set by environment variable DREF_PARSING_CACHE_ADMIN_TOKEN 
+    in header X-Admin-Token (without it, the endpoint is disabled).
+    The cache can also be cleared with 'python -m dref_parsing.cache [Appeal code]'
+    """
+    if not invalidation_allowed(x_admin_token):
+        raise HTTPException(status_code=403, detail="Cache invalidation needs a valid X-Admin-Token")
+    n_removed = pdf_cache.invalidate(lead=Appeal_code)
+    return f'PDF cache: {n_removed} documents removed'
+
 
     # Command to start API:
     # uvicorn main:app --reload
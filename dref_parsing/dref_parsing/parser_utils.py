@@ -1,21 +1,26 @@
 import pandas as pd
 import numpy as np
 import sys
+import os
 import io
 import glob
-import requests
+import time
 from ast import literal_eval
 
 import datetime
 import dateutil.parser 
+from functools import cached_property
 from munch import Munch
 
-import tika.parser
 import pdfminer.high_level
 from pdfminer.high_level import extract_pages
 from pdfminer.layout import LTTextContainer, LTImage, LTFigure, LTTextBox, LTTextBoxHorizontal
 
-pbflag = '!!!Page_Break!!!'
+from dref_parsing.cache import pdf_cache, content_hash
+from dref_parsing.snapshot import go_snapshot
+from dref_parsing.http_client import get_client
+from dref_parsing.text_extraction import extract_text, default_text_backend, extract_layout, layout_text, pbflag
+
 all_bullets = ['•','●','▪','-']
 
 all_pdf_folders = ['../data/PDF-2020',
@@ -26,6 +31,15 @@ all_pdf_folders = ['../data/PDF-2020',
                    
 aadf = pd.DataFrame()
 apdo = pd.DataFrame()
+# versions of the local GO snapshot that aadf, apdo were loaded from
+aadf_version = 0
+apdo_version = 0
+
+# Indexes by appeal code, built once per (re)load of aadf / apdo:
+# global features of the appeal (and number of its rows in aadf),
+# and URL of its DREF Final Report (None = to be built)
+appeal_index = {}
+pdf_url_index = None
 
 
 class ExceptionNotInAPI(Exception):
@@ -201,7 +215,7 @@ def findall_patterns(patterns, s0, region=True, n=30, nback=-1, pattern2='', ign
 
 # Download PDF and optionally save to file
 def download_pdf(url, filename=''):
-    pdf_data = requests.get(url).content
+    pdf_data = get_client().get(url).content
     if filename != '':
         with open(filename, 'wb') as handler:
             handler.write(pdf_data)
@@ -229,23 +243,42 @@ def filter_DREF_Final_Reports(df, names=DREF_Final_Report_names):
 
 # get all API results as a df
 def download_api_results(call='appeal'):
-    href = "https://goadmin.ifrc.org/api/v2/"+call+"/?format=json&limit=300000"
-    aa = requests.get(href).json()    
-    aadf = pd.DataFrame(aa['results'])
+    href = "https://goadmin.ifrc.org/api/v2/"+call+"/"
+    results = get_client().get_results(href, params={'format': 'json', 'limit': 300000})
+    aadf = pd.DataFrame(results)
     return aadf
 
-# If global variable aadf is empty, we download it from GO API.
-# Always download if refresh=True
-def initialize_aadf(refresh = False):
+# Table from the local GO snapshot (see dref_parsing.snapshot), shared by all workers. 
+# The snapshot is downloaded if it is empty, updated with changes in GO if refresh=True
+# (or downloaded again if full=True).
+# Returns (table, version), or None if the snapshot still has loaded_version
+def load_from_snapshot(call, loaded_version, refresh = False, full = False):
+    if refresh or full:
+        go_snapshot.refresh(call, full=full)
+    else:
+        # only one process downloads an empty snapshot, the others wait for it
+        go_snapshot.ensure_loaded(call)
+    if go_snapshot.version(call) == loaded_version:
+        return None
+    return go_snapshot.load(call)
+
+# If global variable aadf is empty or outdated, we load it from the GO snapshot.
+# Always update the snapshot from GO API if refresh=True
+def initialize_aadf(refresh = False, full = False):
 
     # Old version:
     # if (not 'aadf' in locals()) and (not 'aadf' in globals()): 
     #     return download_api_results()
 
-    global aadf
+    global aadf, aadf_version, appeal_index, pdf_url_index
     length_ini = len(aadf)
-    if refresh or (len(aadf) == 0): 
-        aadf = download_api_results(call='appeal')
+    loaded = load_from_snapshot('appeal', aadf_version, refresh=refresh, full=full)
+    if loaded is not None: 
+        new_aadf, new_version = loaded
+        appeal_index = build_appeal_index(new_aadf)
+        # swap only when the new table is ready
+        aadf, aadf_version = new_aadf, new_version
+        pdf_url_index = None
 
     # For Debugging:
     if False:
@@ -258,17 +291,63 @@ def initialize_aadf(refresh = False):
                 aadf.start_date = aadf.start_date.apply(lambda x: 'L1'+x)
     return 
 
-# If global variable apdo is empty, we download it from GO API & preprocess
-# Always download if refresh=True
-def initialize_apdo(refresh = False):
-    global apdo
-    if refresh or (len(apdo) == 0): 
-        apdo = download_api_results(call='appeal_document')
-        apdo = filter_DREF_Final_Reports(apdo)
-        apdo.appeal = apdo.appeal.astype(str)
+# If global variable apdo is empty or outdated, we load it from the GO snapshot & preprocess
+# Always update the snapshot from GO API if refresh=True
+def initialize_apdo(refresh = False, full = False):
+    global apdo, apdo_version, pdf_url_index
+    loaded = load_from_snapshot('appeal_document', apdo_version, refresh=refresh, full=full)
+    if loaded is not None: 
+        new_apdo, new_version = loaded
+        new_apdo = filter_DREF_Final_Reports(new_apdo)
+        new_apdo.appeal = new_apdo.appeal.astype(str)
+        apdo, apdo_version = new_apdo, new_version
+        pdf_url_index = None
     return 
 
 
+# Global features of an appeal from its fields in aadf
+def global_features_from_fields(lead, name, dtype, country, region, start_date):
+    hazard = get_hazard_from_names(name, dtype['name'])
+    return Munch(lead=lead, Hazard=hazard, Country=country['name'], 
+                 Region=region['region_name'], Date=start_date[:10])
+
+# Index: appeal code -> (global features, number of rows in aadf).
+# Features are taken from the first row with the code. 
+# If they cannot be determined, the exception is stored and raised on lookup
+def build_appeal_index(aadf):
+    index = {}
+    if len(aadf) == 0:
+        return index
+    counts = aadf.code.value_counts()
+    first_rows = aadf.drop_duplicates(subset='code')
+    fields = zip(first_rows['code'], first_rows['name'], first_rows['dtype'], 
+                 first_rows['country'], first_rows['region'], first_rows['start_date'])
+    for lead, name, dtype, country, region, start_date in fields:
+        try:
+            features = global_features_from_fields(lead, name, dtype, country, region, start_date)
+        except Exception as e:
+            features = e
+        index[lead] = (features, counts[lead])
+    return index
+
+# Index: appeal code -> URL of its DREF Final Report.
+# Same as the first match of get_pdf_url(''), i.e. of merging aadf and apdo by appeal id:
+# first row in aadf with the code (that has a document), first document in apdo for its id
+def build_pdf_url_index(aadf, apdo):
+    if (len(aadf) == 0) or (len(apdo) == 0):
+        return {}
+    appeal_ids = apdo.appeal.apply(lambda x: literal_eval(x) if isinstance(x, str) else x).str['id']
+    url_by_id = pd.Series(apdo.document_url.values, index=appeal_ids.values)
+    url_by_id = url_by_id[~url_by_id.index.duplicated()]
+
+    aadf_ids = aadf['id'].astype(int)
+    has_document = aadf_ids.isin(url_by_id.index)
+    urls = pd.Series(aadf_ids[has_document].map(url_by_id).values, 
+                     index=aadf.code[has_document].values)
+    urls = urls[~urls.index.duplicated()]
+    return urls.to_dict()
+
+
 # For a given lead get all global features using an API call
 def get_global_features(lead):
 
@@ -276,54 +355,106 @@ def get_global_features(lead):
         hazard = country = region = start_date = 'Unknown'
     else:
         initialize_aadf()
-        if not lead in aadf.code.unique():
+        if not lead in appeal_index:
             print('print ERROR: '+lead+' is not among API codes')
             raise ExceptionNotInAPI(f'Error: {lead} is not among API codes')
         
-        row = aadf[aadf.code==lead]
-        if len(row)!=1:
-            print(f'WARNING: {lead} is present in API codes {len(row)} times (must be 1)')
-            row = row[0:1]
-        
-        hazard = get_hazard_from_names(row.name.values[0], row.dtype.values[0]['name'])
-        country = row.country.values[0]['name']
-        region = row.region.values[0]['region_name']
-        start_date = row.start_date.values[0][:10]
+        features, count = appeal_index[lead]
+        if count!=1:
+            print(f'WARNING: {lead} is present in API codes {count} times (must be 1)')
+        if isinstance(features, Exception):
+            raise features
+        return Munch(features)
     
     output = Munch(lead=lead, Hazard=hazard, Country=country, Region=region, Date=start_date)
     return output
 
 # URL for PDF file, can be used by tika.parser instead of PDF filename
 def get_pdf_url(lead):
+    global pdf_url_index
     initialize_aadf()
     initialize_apdo()
-    apdo['appeal'] = apdo['appeal'].apply(lambda x: literal_eval(x) if isinstance(x, str) else x)
-    merged = aadf.merge(apdo, left_on=aadf['id'].astype(int), right_on=apdo.appeal.str['id'])
     
     # Lets return all merged df if we dont specify a lead
     if lead=='':
+        apdo['appeal'] = apdo['appeal'].apply(lambda x: literal_eval(x) if isinstance(x, str) else x)
+        merged = aadf.merge(apdo, left_on=aadf['id'].astype(int), right_on=apdo.appeal.str['id'])
         return merged
 
-    url_list = merged[merged.code==lead].document_url
-    if len(url_list)==0:
+    if pdf_url_index is None:
+        pdf_url_index = build_pdf_url_index(aadf, apdo)
+
+    if not lead in pdf_url_index:
         print(f'ERROR: No URL for PDF with lead = {lead}')
         raise ExceptionNoURLforPDF(f"no URL for PDF with lead = {lead}")
         
-    url = url_list.values[0]
+    url = pdf_url_index[lead]
     return url
 
+# Bytes with PDF content for a lead: from cache, or downloaded (and cached)
+def get_pdf_data(lead, url=None):
+    if url is None:
+        url = get_pdf_url(lead)
+    pdf_data = pdf_cache.get_pdf(lead, url)
+    if pdf_data is None:
+        pdf_data = download_pdf(url)
+        pdf_cache.put_pdf(lead, url, pdf_data)
+    return pdf_data
+
 # IO object for PDF data, can be used by tika & pdfminer instead of PDF filename
 def get_pdf_io_object(lead):
-    url = get_pdf_url(lead)
-    pdf_data = download_pdf(url) # bytes with PDF content
+    pdf_data = get_pdf_data(lead)
     pdf_io = io.BytesIO(pdf_data)
     return pdf_io
 
+# PDF document of one request. URL and PDF bytes are obtained only once, 
+# and are shared by the header/footer pass (pdfminer) and the text pass (text_backend).
+# With the default text_backend 'pdfminer' (see text_extraction) both come from
+# a single pdfminer layout pass; with tika or pymupdf there are two passes
+class PDFDocument:
+    def __init__(self, lead, pdf_file = None, text_backend = None):
+        self.lead = lead
+        # bytes of PDF file, if given (then lead is not used to get the PDF)
+        self.pdf_file = pdf_file
+        self.text_backend = text_backend
+
+    @cached_property
+    def url(self):
+        return get_pdf_url(self.lead)
+
+    @cached_property
+    def pdf_data(self):
+        if self.pdf_file:
+            return self.pdf_file
+        return get_pdf_data(self.lead, url=self.url)
+
+    @cached_property
+    def sha(self):
+        return content_hash(self.pdf_data)
+
+    # pdfminer layout, only computed if needed (i.e. not in cache)
+    @cached_property
+    def layout(self):
+        return extract_layout(self.pdf_data)
+
+    @cached_property
+    def text(self):
+        return get_PDFtext_from_bytes(self.pdf_data, sha=self.sha, method=self.text_backend, document=self)
+
+    @cached_property
+    def header_footer_candidates(self):
+        return get_header_footer_candidates_from_bytes(self.pdf_data, sha=self.sha, document=self)
+
 # Complete PDF parsing
-def parse_PDF_combined(lead, PDFextras=Munch(), pdf_file = None):
+def parse_PDF_combined(lead, PDFextras=None, pdf_file = None):
+    # NB: a default Munch() would be shared by all calls, so that a long-running
+    # process would reuse PDFextras of an earlier document with the same lead (e.g. 'Unknown')
+    if PDFextras is None:
+        PDFextras = Munch()
     gf_parsed = get_global_features(lead)
-    PDFextras = get_PDFextras([lead], PDFextras, source='api', renew=False, pdf_file = pdf_file)
-    exs_parsed, _ = get_CHLLs(lead=lead, PDFextras=PDFextras, source='api', pdf_file = pdf_file)
+    document = PDFDocument(lead, pdf_file = pdf_file)
+    PDFextras = get_PDFextras([lead], PDFextras, source='api', renew=False, document = document)
+    exs_parsed, _ = get_CHLLs(lead=lead, PDFextras=PDFextras, source='api', document = document)
     all_parsed = exs_parsed.merge(pd.DataFrame([gf_parsed]), on='lead')
     return all_parsed
 
@@ -839,17 +970,13 @@ def get_PDFfilename_from_lead(lead, folder=''):
     return filenames[0]
 
 # get PDF text from lead (from disk or from API) 
-def get_PDFtext_from_lead(lead, source='disk', folder='', method='tika'):
+# method: text extraction backend, see text_extraction.py (None = default backend)
+def get_PDFtext_from_lead(lead, source='disk', folder='', method=None):
 
     if source=='disk':
         filename = get_PDFfilename_from_lead(lead, folder=folder)
-
-        # Two methods to extract text, they give very similar results.
-        # TODO: check which method is better
-        if method == 'tika':
-            txt = tika.parser.from_file(filename)['content'] 
-        else:
-            txt = pdfminer.high_level.extract_text(filename)        
+        with open(filename, 'rb') as f:
+            txt = extract_text(f.read(), backend=method)
 
     else:
         # source = 'api'.
@@ -859,8 +986,25 @@ def get_PDFtext_from_lead(lead, source='disk', folder='', method='tika'):
         #url = get_pdf_url(lead)
         #txt = tika.parser.from_file(url)['content'] 
         # Option 2
-        pdf_io = get_pdf_io_object(lead)
-        txt = tika.parser.from_buffer(pdf_io)['content'] 
+        txt = get_PDFtext_from_bytes(get_pdf_data(lead), method=method)
+    return txt
+
+# get PDF text from bytes of PDF file with a text extraction backend 
+# (from cache if parsed before).
+# If document (PDFDocument) is given, 'pdfminer' text uses its layout
+def get_PDFtext_from_bytes(pdf_data, sha=None, method=None, document=None):
+    if method is None:
+        method = default_text_backend
+    if sha is None:
+        sha = content_hash(pdf_data)
+    txt = pdf_cache.get_text(sha, method=method)
+    if txt is None:
+        if (method == 'pdfminer') and (document is not None):
+            txt = layout_text(document.layout)
+        else:
+            txt = extract_text(pdf_data, backend=method)
+        if txt is not None:
+            pdf_cache.put_text(sha, txt, method=method)
     return txt
 
 
@@ -932,15 +1076,62 @@ def assess_match_all(pp):
     match.lead = pp.lead
     return match
 
+# ****************************************************************************************
+# Regression check of text extraction backends (see text_extraction.py).
+# For each PDF in folder, Challenges and Lessons Learnt are parsed from the text 
+# of each backend and compared to those parsed from the text of the reference backend.
+# Returns a df with one row per PDF, backend and Learning:
+# time of text extraction, number of excerpts, how many of the reference excerpts
+# are found exactly, are missed, how many excerpts are extra, 
+# and how many exactly found excerpts have the same DREF_Sector
+def compare_text_backends(folder='../data/PDF-2020', backends=('pdfminer', 'pymupdf'), 
+                          reference='tika', limit=-1, n=30):
+    filenames = sorted(glob.glob(os.path.join(folder, '*.pdf')))
+    if limit > 0:
+        filenames = filenames[:limit]
+
+    rows = []
+    for filename in filenames:
+        with open(filename, 'rb') as f:
+            pdf_data = f.read()
+        headers, footers, postheaders = get_header_footer_candidates_from_bytes(pdf_data)
+        PDFextras = Munch(Unknown=Munch(headers=headers, footers=footers, postheaders=postheaders))
+
+        excerpts = {}
+        times = {}
+        for backend in set(backends) | {reference}:
+            start = time.perf_counter()
+            txt = extract_text(pdf_data, backend=backend)
+            times[backend] = time.perf_counter() - start
+
+            document = PDFDocument('Unknown', pdf_file=pdf_data, text_backend=backend)
+            document.text = txt # not from cache, since we timed the extraction
+            excerpts[backend], _ = get_CHLLs(lead='Unknown', PDFextras=PDFextras, document=document)
+
+        for backend in backends:
+            for Learning in ['Challenges', 'Lessons Learnt']:
+                ref = excerpts[reference][excerpts[reference].Learning==Learning]
+                exs = excerpts[backend][excerpts[backend].Learning==Learning]
+                match = assess_match(build_comp_matrix(list(ref['Modified Excerpt']), list(exs['Modified Excerpt']), n=n))
+                same = ref.merge(exs, on='Modified Excerpt', suffixes=('_ref', ''))
+                rows.append(dict(file=os.path.basename(filename), backend=backend, Learning=Learning,
+                                 time=times[backend], n_excerpts=len(exs), n_reference=len(ref),
+                                 n_exact=match.nexact, n_missed=len(match.missed), n_extra=len(match.extra),
+                                 n_same_sector=int((same.DREF_Sector_ref==same.DREF_Sector).sum())))
+    return pd.DataFrame(rows)
+
 # ******************************************************************
 # Get Parsed CH & LL.
 # source = api or disk
 def get_CHLLs(lead='MDRCD028', Learnings=['CH','LL'], PDFextras=Munch(), 
-              do_remove_footer=True, source='api', folder='', pdf_file = None):
+              do_remove_footer=True, source='api', folder='', pdf_file = None, document = None):
 
-    if pdf_file:
+    if document is not None:
+        # text of the PDFDocument shared within the request
+        txt = document.text
+    elif pdf_file:
         # get text directly from bytes of PDF file
-        txt = tika.parser.from_buffer(pdf_file)['content']
+        txt = get_PDFtext_from_bytes(pdf_file)
     else:
         # get text from lead (by downloading the corresponding PDF file first)
         txt = get_PDFtext_from_lead(lead, source=source, folder=folder) 
@@ -1145,31 +1336,41 @@ def get_LLs_from_text(txt):
 # They are presumable header and footer.
 # Also, postheader - what comes after header.
 def get_header_footer_candidates(filename = "../data/PDF-2020/MDRCD030dfr.pdf"):
+    return get_header_footer_candidates_from_layout(extract_layout(filename))
+
+# The same from the page layout (see text_extraction.extract_layout)
+def get_header_footer_candidates_from_layout(pages):
     headers = []
     footers = []
     postheaders = []
-    for page_layout in extract_pages(filename):
-        postheader_now = False
-        header_now = True
-        for element in page_layout:
-            if isinstance(element, LTTextContainer):
-                # ignoring empty elements
-                if strip_all_empty(element.get_text()) != '':
-                    element_text = element.get_text()
-                    if postheader_now:
-                        postheader = element_text
-                        postheader_now = False
-                    if header_now:
-                        header = element_text
-                        header_now = False
-                        postheader_now = True
-
-        footer = element_text
+    # A page with less than 2 (non-empty) elements keeps the candidates of the previous page
+    header = footer = postheader = ''
+    for texts in pages:
+        # ignoring empty elements
+        texts = [text for text in texts if strip_all_empty(text) != '']
+        if len(texts) > 0:
+            header = texts[0]
+            footer = texts[-1]
+        if len(texts) > 1:
+            postheader = texts[1]
         headers.append(header)
         postheaders.append(postheader)
         footers.append(footer)
     return headers, footers, postheaders    
 
+# Header/footer candidates from bytes of PDF file (from cache if parsed before)
+# If document (PDFDocument) is given, its layout is used
+def get_header_footer_candidates_from_bytes(pdf_data, sha=None, document=None):
+    if sha is None:
+        sha = content_hash(pdf_data)
+    extras = pdf_cache.get_extras(sha)
+    if extras is None:
+        pages = document.layout if document is not None else extract_layout(pdf_data)
+        headers, footers, postheaders = get_header_footer_candidates_from_layout(pages)
+        extras = dict(headers=headers, footers=footers, postheaders=postheaders)
+        pdf_cache.put_extras(sha, extras)
+    return extras['headers'], extras['footers'], extras['postheaders']
+
 #***************************************************************
 # Returns substring preceeding a number
 def before_number(s):
@@ -1310,20 +1511,22 @@ def remove_header(txt, PDFextra):
 # Load PDFextras for all leads where it's missing.
 # Keep existing values if renew=False.
 # (Makes sense since it takes long time to process all PDFs)
-def get_PDFextras(leads, PDFextras, renew=False, source='disk', folder='', pdf_file = None):
+def get_PDFextras(leads, PDFextras, renew=False, source='disk', folder='', pdf_file = None, document = None):
     for lead in leads:
         if renew or (not lead in PDFextras.keys()):
-            # get pdf_io which is either filename or a file-like object
-            if pdf_file:
+            if (document is not None) and (document.lead == lead):
+                # PDFDocument shared within the request
+                headers, footers, postheaders = document.header_footer_candidates
+            elif pdf_file:
                 # if pdf_file (as bytes) is given:
-                pdf_io = io.BytesIO(pdf_file)
+                headers, footers, postheaders = get_header_footer_candidates_from_bytes(pdf_file)
+            elif source=='disk':
+                # otherwise, read pdf file from disk
+                pdf_filename = get_PDFfilename_from_lead(lead, folder=folder)
+                headers, footers, postheaders = get_header_footer_candidates(filename = pdf_filename)
             else:
-                # otherwise, read pdf file from disk, or download
-                if source=='disk':
-                    pdf_io = get_PDFfilename_from_lead(lead, folder=folder)
-                else:
-                    pdf_io = get_pdf_io_object(lead) # IO object with PDF data
-            headers, footers, postheaders  = get_header_footer_candidates(filename = pdf_io)
+                # or download (from cache if downloaded before)
+                headers, footers, postheaders = get_header_footer_candidates_from_bytes(get_pdf_data(lead))
             PDFextras[lead] = Munch(headers = headers, footers=footers, postheaders = postheaders)
     return PDFextras    
 
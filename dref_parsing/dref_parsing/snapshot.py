@@ -0,0 +1,173 @@
+import os
+import json
+import sqlite3
+import datetime
+import tempfile
+from contextlib import contextmanager
+try:
+    import fcntl
+except ImportError:
+    # Not available on Windows: refreshes are then not serialized across processes
+    fcntl = None
+
+import pandas as pd
+
+from dref_parsing.http_client import get_client
+
+# ****************************************************************************************
+# LOCAL SNAPSHOT OF GO API TABLES
+# ****************************************************************************************
+# The GO API tables 'appeal' and 'appeal_document' are kept in a SQLite database,
+# shared by all workers on the machine:
+#   records(call, id, modified, data)  - one row per API record, data is the record as json
+#   meta(call, last_modified, version, refreshed_at)
+#
+# The first refresh downloads the whole table. Later refreshes request only records
+# modified (or created) after the latest one in the snapshot, page by page, and
+# upsert them by id in one transaction. So readers (other workers, requests in
+# flight) see either the old or the new snapshot, never a mix.
+# 'version' is increased by every refresh, so that workers can notice that their
+# in-memory copy is outdated.
+#
+# Records deleted in GO stay in the snapshot until a full refresh.
+#
+# Refreshes hold a lock file next to the database, so that only one process downloads at a time.
+# When the snapshot is empty, the first worker downloads the whole table, and workers starting
+# at the same time wait for it and then use its snapshot (see ensure_loaded).
+# If GO API ignores the filter of an incremental refresh (records not newer than the last one
+# are returned), the whole table was downloaded anyway, and it replaces the snapshot.
+#
+# Settings by environment variables:
+#   DREF_PARSING_SNAPSHOT_DB - SQLite file (default: dref_parsing_go.sqlite in temp folder)
+
+go_api_url = "https://goadmin.ifrc.org/api/v2/"
+default_snapshot_db = os.path.join(tempfile.gettempdir(), 'dref_parsing_go.sqlite')
+
+# Field used for incremental refresh of each table.
+# Records of appeal_document are not modified, only created
+incremental_fields = {'appeal': 'modified_at',
+                      'appeal_document': 'created_at'}
+
+page_size = 10000
+
+
+# Download records of a GO API table, page by page.
+# Only records with incremental field > since (if given)
+def download_api_pages(call, since=None, limit=page_size):
+    params = {'format': 'json', 'limit': limit}
+    if since:
+        params[incremental_fields[call] + '__gt'] = since
+    return get_client().get_results(go_api_url + call + '/', params=params)
+
+
+class GOSnapshotStore:
+    def __init__(self, path=default_snapshot_db):
+        self.path = path
+        with self._connect() as con:
+            # WAL: readers are not blocked by a refresh and see the last committed snapshot
+            con.execute('PRAGMA journal_mode=WAL')
+            con.execute('CREATE TABLE IF NOT EXISTS records '
+                        '(call TEXT, id INTEGER, modified TEXT, data TEXT, PRIMARY KEY (call, id))')
+            con.execute('CREATE TABLE IF NOT EXISTS meta '
+                        '(call TEXT PRIMARY KEY, last_modified TEXT, version INTEGER, refreshed_at TEXT)')
+
+    # Connection that commits (or rolls back) the transaction and is closed at exit
+    @contextmanager
+    def _connect(self):
+        con = sqlite3.connect(self.path, timeout=60)
+        try:
+            with con:
+                yield con
+        finally:
+            con.close()
+
+    # Number of refreshes of the table (0 if the snapshot is empty)
+    def version(self, call):
+        with self._connect() as con:
+            return self._version(con, call)
+
+    @staticmethod
+    def _version(con, call):
+        row = con.execute('SELECT version FROM meta WHERE call=?', (call,)).fetchone()
+        return 0 if row is None else row[0]
+
+    def last_modified(self, call):
+        with self._connect() as con:
+            row = con.execute('SELECT last_modified FROM meta WHERE call=?', (call,)).fetchone()
+        return None if row is None else row[0]
+
+    # Lock file held by one process at a time while it refreshes the snapshot
+    @contextmanager
+    def _refresh_lock(self):
+        if fcntl is None:
+            yield
+            return
+        with open(self.path + '.lock', 'a') as f:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+    # Download the whole table if the snapshot is empty. Processes starting at the same
+    # time wait for the first one, instead of all downloading the table.
+    # Returns the number of downloaded records (0 if the snapshot was not empty)
+    def ensure_loaded(self, call):
+        if self.version(call) > 0:
+            return 0
+        with self._refresh_lock():
+            if self.version(call) > 0:
+                return 0
+            return self._refresh(call, full=True)
+
+    # Update snapshot from GO API: only the delta, or the whole table if full=True.
+    # Returns the number of downloaded records
+    def refresh(self, call, full=False):
+        with self._refresh_lock():
+            return self._refresh(call, full=full)
+
+    # Check that all records were modified (or created) after since,
+    # i.e. that GO API applied the filter of the incremental refresh
+    @staticmethod
+    def _filter_applied(records, field, since):
+        modified = pd.to_datetime(pd.Series([r.get(field) for r in records], dtype=object), utc=True, errors='coerce')
+        return bool((modified > pd.to_datetime(since, utc=True)).all())
+
+    def _refresh(self, call, full=False):
+        since = None if full else self.last_modified(call)
+        # Download before opening the transaction, so that the database is locked only shortly
+        records = download_api_pages(call, since=since)
+
+        field = incremental_fields[call]
+        if since and not self._filter_applied(records, field, since):
+            # The filter was ignored, so records are the whole table
+            print(f'WARNING: GO API ignored {field}__gt for {call}, the snapshot is replaced by the whole table')
+            full = True
+        rows = [(call, int(r['id']), r.get(field), json.dumps(r)) for r in records]
+
+        with self._connect() as con:
+            con.execute('BEGIN IMMEDIATE')
+            if full:
+                con.execute('DELETE FROM records WHERE call=?', (call,))
+            con.executemany('INSERT OR REPLACE INTO records (call, id, modified, data) VALUES (?,?,?,?)', rows)
+            (last_modified,) = con.execute('SELECT MAX(modified) FROM records WHERE call=?', (call,)).fetchone()
+            con.execute('INSERT INTO meta (call, last_modified, version, refreshed_at) VALUES (?,?,1,?) '
+                        'ON CONFLICT(call) DO UPDATE SET last_modified=excluded.last_modified, '
+                        'version=version+1, refreshed_at=excluded.refreshed_at',
+                        (call, last_modified, datetime.datetime.utcnow().isoformat()))
+        return len(rows)
+
+    # Snapshot of a table as a DataFrame (same columns as the API results, 
+    # rows ordered by id), and its version
+    def load(self, call):
+        with self._connect() as con:
+            # one read transaction, so that data and version are consistent
+            con.execute('BEGIN')
+            version = self._version(con, call)
+            data = con.execute('SELECT data FROM records WHERE call=? ORDER BY id', (call,)).fetchall()
+        df = pd.DataFrame([json.loads(d) for (d,) in data])
+        return df, version
+
+
+# Snapshot store used by parser_utils
+go_snapshot = GOSnapshotStore(os.environ.get('DREF_PARSING_SNAPSHOT_DB', default_snapshot_db))
@@ -0,0 +1,86 @@
+import os
+import io
+
+# ****************************************************************************************
+# TEXT EXTRACTION FROM PDF
+# ****************************************************************************************
+# Backends that extract the text of a PDF file, given as bytes:
+#   pdfminer - pdfminer.six, in-process (pure Python). Text is built from the page layout,
+#             which is also used to find header/footer candidates, so that one layout pass
+#             gives both (see parser_utils.PDFDocument)
+#   tika    - Apache Tika (a Java server, started by the tika package on first use)
+#   pymupdf - PyMuPDF, in-process, no Java needed
+# pdfminer and pymupdf write text as Tika does: lines of a paragraph (text element) separated 
+# by a linebreak, paragraphs by an empty line, pages by a linebreak. As with Tika, there is 
+# no page break flag in the text: parser_utils puts it in place of removed headers/footers,
+# and the splitting of excerpts depends on it.
+# Libraries are imported only when their backend is used.
+#
+# The backend is set by environment variable DREF_PARSING_TEXT_BACKEND (default: pdfminer).
+# With tika or pymupdf, every PDF that is not cached is parsed twice: for the text,
+# and by pdfminer for header/footer candidates.
+# Excerpts of the backends can be compared with parser_utils.compare_text_backends
+# (benchmarks/compare_text_backends.py).
+
+default_text_backend = os.environ.get('DREF_PARSING_TEXT_BACKEND', 'pdfminer').lower()
+
+# Page break flag, put by parser_utils in place of removed headers/footers
+pbflag = '!!!Page_Break!!!'
+
+
+def extract_text_tika(pdf_data):
+    import tika.parser
+    return tika.parser.from_buffer(pdf_data)['content']
+
+
+def extract_text_pymupdf(pdf_data):
+    import fitz
+    pages = []
+    with fitz.open(stream=pdf_data, filetype='pdf') as doc:
+        for page in doc:
+            # blocks: (x0, y0, x1, y1, text, block_no, block_type), type 0 is text
+            blocks = page.get_text('blocks', flags=fitz.TEXT_PRESERVE_LIGATURES | fitz.TEXT_PRESERVE_WHITESPACE)
+            pages.append([block[4] for block in blocks if block[6] == 0])
+    return layout_text(pages)
+
+
+# Page layout with pdfminer: list of pages, each is a list of texts 
+# of its text elements (incl. empty ones), in the order of pdfminer.
+# pdf_data: bytes of PDF file, or filename / file object
+def extract_layout(pdf_data):
+    from pdfminer.high_level import extract_pages
+    from pdfminer.layout import LTTextContainer
+    if isinstance(pdf_data, bytes):
+        pdf_data = io.BytesIO(pdf_data)
+    pages = []
+    for page_layout in extract_pages(pdf_data):
+        pages.append([element.get_text() for element in page_layout if isinstance(element, LTTextContainer)])
+    return pages
+
+
+# Text from the page layout (list of pages, each is a list of texts of its elements),
+# written as Tika does: elements are separated by an empty line, pages by a linebreak
+def layout_text(pages):
+    page_texts = []
+    for texts in pages:
+        texts = [text if text.endswith('\n') else text+'\n' for text in texts]
+        page_texts.append('\n'.join(texts))
+    return '\n'.join(page_texts)
+
+
+def extract_text_pdfminer(pdf_data):
+    return layout_text(extract_layout(pdf_data))
+
+
+text_backends = {'tika': extract_text_tika,
+                 'pymupdf': extract_text_pymupdf,
+                 'pdfminer': extract_text_pdfminer}
+
+
+# Text of a PDF file (bytes) with the given backend (default backend if None)
+def extract_text(pdf_data, backend=None):
+    if backend is None:
+        backend = default_text_backend
+    if not backend in text_backends:
+        raise ValueError(f"Unknown text extraction backend '{backend}', choose one of {list(text_backends)}")
+    return text_backends[backend](pdf_data)
@@ -0,0 +1,129 @@
+import os
+import shutil
+import tempfile
+import time
+import unittest
+from unittest import mock
+from dref_parsing import cache
+from dref_parsing.cache import PDFCache, content_hash
+
+
+class TestPDFCache(unittest.TestCase):
+
+    def setUp(self):
+        self.folder = os.path.join(tempfile.mkdtemp(), 'cache')
+        self.cache = PDFCache(self.folder, max_bytes=1000)
+
+    def tearDown(self):
+        shutil.rmtree(os.path.dirname(self.folder))
+
+    def test_folders_created_lazily(self):
+        self.assertFalse(os.path.exists(self.folder))
+        self.assertIsNone(self.cache.get_pdf('MDRDO013', 'url'))
+        self.assertEqual(self.cache.invalidate(), 0)
+        self.assertFalse(os.path.exists(self.folder))
+        self.cache.put_pdf('MDRDO013', 'url', b'pdf')
+        self.assertTrue(os.path.isdir(self.cache.docs_folder))
+
+    def test_content_hash_keys(self):
+        sha = self.cache.put_pdf('MDRDO013', 'url1', b'pdf content')
+        self.assertEqual(sha, content_hash(b'pdf content'))
+        self.assertEqual(self.cache.get_pdf('MDRDO013', 'url1'), b'pdf content')
+        # a new URL of the lead is a cache miss
+        self.assertIsNone(self.cache.get_pdf('MDRDO013', 'url2'))
+
+        # the same content for another lead is stored once, with its parsing results
+        self.cache.put_text(sha, 'text')
+        self.assertEqual(self.cache.put_pdf('MDRBO014', 'url3', b'pdf content'), sha)
+        self.assertEqual(os.listdir(self.cache.docs_folder), [sha])
+        self.assertEqual(self.cache.get_text(sha), 'text')
+        self.assertIsNone(self.cache.get_text(sha, method='pdfminer'))
+        self.cache.put_extras(sha, {'headers': ['Header']})
+        self.assertEqual(self.cache.get_extras(sha), {'headers': ['Header']})
+
+    def test_invalidate(self):
+        self.cache.put_pdf('MDRDO013', 'url1', b'pdf 1')
+        self.cache.put_pdf('MDRBO014', 'url2', b'pdf 2')
+        self.assertEqual(self.cache.invalidate(lead='MDRDO013'), 1)
+        self.assertIsNone(self.cache.get_pdf('MDRDO013', 'url1'))
+        self.assertEqual(self.cache.get_pdf('MDRBO014', 'url2'), b'pdf 2')
+
+        self.assertEqual(self.cache.invalidate(), 1)
+        self.assertIsNone(self.cache.get_pdf('MDRBO014', 'url2'))
+        # the cache still works after being cleared
+        self.cache.put_pdf('MDRBO014', 'url2', b'pdf 2')
+        self.assertEqual(self.cache.get_pdf('MDRBO014', 'url2'), b'pdf 2')
+
+    def test_disabled(self):
+        disabled = PDFCache(self.folder, max_bytes=0)
+        self.assertEqual(disabled.put_pdf('MDRDO013', 'url', b'pdf'), content_hash(b'pdf'))
+        self.assertIsNone(disabled.get_pdf('MDRDO013', 'url'))
+        self.assertFalse(os.path.exists(self.folder))
+
+    def test_eviction(self):
+        for i in range(3):
+            self.cache.put_pdf(f'MDR{i}', 'url', bytes([i]) * 400)
+            # different modification times of the documents
+            time.sleep(0.01)
+        # the least recently used document is evicted
+        self.assertIsNone(self.cache.get_pdf('MDR0', 'url'))
+        self.assertEqual(self.cache.get_pdf('MDR1', 'url'), bytes([1]) * 400)
+        time.sleep(0.01)
+        self.cache.put_pdf('MDR3', 'url', bytes([3]) * 400)
+        # MDR1 was read after MDR2 was written
+        self.assertIsNone(self.cache.get_pdf('MDR2', 'url'))
+        self.assertIsNotNone(self.cache.get_pdf('MDR1', 'url'))
+        self.assertIsNotNone(self.cache.get_pdf('MDR3', 'url'))
+
+    def test_eviction_scans(self):
+        cache = PDFCache(self.folder, max_bytes=10000)
+        with mock.patch.object(cache, '_doc_usage', wraps=cache._doc_usage) as doc_usage:
+            cache.put_pdf('MDR0', 'url', b'0' * 100)
+            # the first write scans the documents
+            self.assertEqual(doc_usage.call_count, 1)
+            for i in range(1, 10):
+                cache.put_pdf(f'MDR{i}', 'url', b'0' * 100 + bytes([i]))
+            self.assertEqual(doc_usage.call_count, 1)
+            # after writing a tenth of max_bytes, documents are scanned again
+            cache.put_pdf('MDR10', 'url', b'1' * 100)
+            self.assertEqual(doc_usage.call_count, 2)
+            # a document that does not fit is evicted at once
+            cache.put_pdf('MDR11', 'url', b'2' * 10000)
+            self.assertEqual(doc_usage.call_count, 3)
+            self.assertIsNone(cache.get_pdf('MDR0', 'url'))
+
+    def test_write_errors(self):
+        # the document is evicted by another worker while it is written
+        with mock.patch('os.utime', side_effect=FileNotFoundError):
+            sha = self.cache.put_pdf('MDRDO013', 'url', b'pdf')
+            self.cache.put_text(sha, 'text')
+        self.assertEqual(self.cache.written_bytes, 0)
+        self.assertIsNone(self.cache.get_pdf('MDRDO013', 'url'))
+
+        # the cache folder can not be created
+        filename = os.path.join(os.path.dirname(self.folder), 'file')
+        with open(filename, 'w') as f:
+            f.write('not a folder')
+        broken = PDFCache(os.path.join(filename, 'cache'))
+        self.assertEqual(broken.put_pdf('MDRDO013', 'url', b'pdf'), sha)
+        broken.put_extras(sha, {'headers': ['Header']})
+        self.assertIsNone(broken.get_pdf('MDRDO013', 'url'))
+        self.assertIsNone(broken.get_extras(sha))
+
+    def test_invalidation_allowed(self):
+        with mock.patch.object(cache, 'admin_token', ''):
+            self.assertFalse(cache.invalidation_allowed(None))
+            self.assertFalse(cache.invalidation_allowed(''))
+        with mock.patch.object(cache, 'admin_token', 'secret'):
+            self.assertFalse(cache.invalidation_allowed(None))
+            self.assertFalse(cache.invalidation_allowed('wrong'))
+            self.assertTrue(cache.invalidation_allowed('secret'))
+            # non-ASCII header values
+            self.assertFalse(cache.invalidation_allowed('sécret'))
+        with mock.patch.object(cache, 'admin_token', 'sécret'):
+            self.assertFalse(cache.invalidation_allowed('secret'))
+            self.assertTrue(cache.invalidation_allowed('sécret'))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,41 @@
+import threading
+import unittest
+from unittest import mock
+from concurrent.futures import ThreadPoolExecutor
+from dref_parsing.bounded_executor import BoundedExecutor
+
+try:
+    from fastapi.testclient import TestClient
+    from dref_parsing import main
+except ImportError:
+    main = None
+
+
+@unittest.skipIf(main is None, 'The API needs fastapi')
+class TestParsingAPI(unittest.TestCase):
+
+    def test_saturated(self):
+        # a 1-slot executor, filled by a task that waits until the end of the test
+        executor = BoundedExecutor(lambda: ThreadPoolExecutor(max_workers=1), max_pending=1)
+        started, release = threading.Event(), threading.Event()
+
+        def block():
+            started.set()
+            release.wait(10)
+
+        thread = threading.Thread(target=executor.run_sync, args=(block,))
+        thread.start()
+        try:
+            self.assertTrue(started.wait(10))
+            with mock.patch.object(main, 'parsing_executor', executor):
+                response = TestClient(main.app).post('/parse/', params={'Appeal_code': 'MDRDO013'})
+        finally:
+            release.set()
+            thread.join()
+            executor.executor.shutdown()
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(response.headers['Retry-After'], '30')
+
+
+if __name__ == '__main__':
+    unittest.main()
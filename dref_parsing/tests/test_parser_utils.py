@@ -0,0 +1,103 @@
+import unittest
+from ast import literal_eval
+from unittest import mock
+import pandas as pd
+from dref_parsing import parser_utils
+from dref_parsing.parser_utils import build_appeal_index, build_pdf_url_index, get_hazard_from_names
+
+
+def appeal(id, code, name='Flood', dtype='Flood', start_date='2021-05-01T00:00:00Z'):
+    return {'id': id, 'code': code, 'name': name, 'dtype': {'name': dtype},
+            'country': {'name': f'Country {code}'}, 'region': {'region_name': 'Africa'},
+            'start_date': start_date}
+
+
+def document(appeal_id, url, as_string=False):
+    appeal = {'id': appeal_id, 'code': f'code {appeal_id}'}
+    return {'appeal': str(appeal) if as_string else appeal, 'document_url': url,
+            'name': 'DREF Final Report'}
+
+
+# Global features of a lead, as computed before the appeal index
+def global_features_by_filter(aadf, lead):
+    row = aadf[aadf.code==lead][0:1]
+    hazard = get_hazard_from_names(row.name.values[0], row.dtype.values[0]['name'])
+    return dict(lead=lead, Hazard=hazard, Country=row.country.values[0]['name'],
+                Region=row.region.values[0]['region_name'], Date=row.start_date.values[0][:10])
+
+
+# URL of the report of a lead, as computed before the URL index (None = no URL)
+def pdf_url_by_merge(aadf, apdo, lead):
+    apdo = apdo.copy()
+    apdo['appeal'] = apdo['appeal'].apply(lambda x: literal_eval(x) if isinstance(x, str) else x)
+    merged = aadf.merge(apdo, left_on=aadf['id'].astype(int), right_on=apdo.appeal.str['id'])
+    url_list = merged[merged.code==lead].document_url
+    return url_list.values[0] if len(url_list) else None
+
+
+class TestAppealIndexes(unittest.TestCase):
+
+    def setUp(self):
+        self.aadf = pd.DataFrame([
+            appeal(1, 'MDRDO013'),
+            # duplicate leads: the first row is used, the second one has no document
+            appeal(2, 'MDRBO014', name='Bolivia: Floods', dtype='Other'),
+            appeal(3, 'MDRBO014', dtype='Epidemic'),
+            # duplicate leads, only the second row has documents
+            appeal(4, 'MDRCL014'),
+            appeal(5, 'MDRCL014', name='Chile: Forest Fires', dtype='Fire'),
+            # no document at all
+            appeal(6, 'MDRAR017', dtype='Drought'),
+            # id as string
+            appeal('7', 'MDRVU008', name='Vanuatu: Cyclone Harold', dtype='Other'),
+        ])
+        self.apdo = pd.DataFrame([
+            document(1, 'url1'),
+            # two documents for an appeal: the first one is used
+            document(2, 'url2a', as_string=True),
+            document(2, 'url2b'),
+            document(5, 'url5'),
+            document(7, 'url7', as_string=True),
+            # document of an appeal not in aadf
+            document(99, 'url99'),
+        ])
+        self.leads = list(self.aadf.code.unique()) + ['MDRXX000']
+
+    def test_appeal_index(self):
+        index = build_appeal_index(self.aadf)
+        self.assertEqual(set(index), set(self.aadf.code))
+        for lead, (features, count) in index.items():
+            self.assertEqual(dict(features), global_features_by_filter(self.aadf, lead))
+            self.assertEqual(count, (self.aadf.code == lead).sum())
+        self.assertEqual(index['MDRBO014'][1], 2)
+        self.assertEqual(build_appeal_index(pd.DataFrame()), {})
+
+    def test_pdf_url_index(self):
+        index = build_pdf_url_index(self.aadf, self.apdo)
+        for lead in self.leads:
+            self.assertEqual(index.get(lead), pdf_url_by_merge(self.aadf, self.apdo, lead), lead)
+        self.assertEqual(index, {'MDRDO013': 'url1', 'MDRBO014': 'url2a', 'MDRCL014': 'url5', 'MDRVU008': 'url7'})
+        self.assertEqual(build_pdf_url_index(self.aadf, pd.DataFrame()), {})
+
+    def test_lookups(self):
+        with mock.patch.multiple(parser_utils, aadf=self.aadf, apdo=self.apdo.copy(),
+                                 appeal_index=build_appeal_index(self.aadf), pdf_url_index=None,
+                                 initialize_aadf=mock.DEFAULT, initialize_apdo=mock.DEFAULT):
+            for lead in self.leads:
+                url = pdf_url_by_merge(self.aadf, self.apdo, lead)
+                if url is None:
+                    with self.assertRaises(parser_utils.ExceptionNoURLforPDF):
+                        parser_utils.get_pdf_url(lead)
+                else:
+                    self.assertEqual(parser_utils.get_pdf_url(lead), url)
+
+                if lead in self.aadf.code.values:
+                    self.assertEqual(dict(parser_utils.get_global_features(lead)),
+                                     global_features_by_filter(self.aadf, lead))
+                else:
+                    with self.assertRaises(parser_utils.ExceptionNotInAPI):
+                        parser_utils.get_global_features(lead)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,101 @@
+import os
+import shutil
+import tempfile
+import threading
+import time
+import unittest
+from unittest import mock
+from dref_parsing import snapshot
+from dref_parsing.snapshot import GOSnapshotStore
+
+
+class TestGOSnapshotStore(unittest.TestCase):
+
+    def setUp(self):
+        self.folder = tempfile.mkdtemp()
+        self.store = GOSnapshotStore(os.path.join(self.folder, 'go.sqlite'))
+        self.table = {}
+        self.calls = []
+        self.honor_filter = True
+
+    def tearDown(self):
+        shutil.rmtree(self.folder)
+
+    def set_appeal(self, id, code, modified_at):
+        self.table[id] = {'id': id, 'code': code, 'modified_at': modified_at}
+
+    def download_api_pages(self, call, since=None):
+        """
+        Stub of GO API: records of self.table, filtered by modified_at if self.honor_filter.
+        """
+        self.calls.append((call, since))
+        records = sorted(self.table.values(), key=lambda r: r['id'], reverse=True)
+        if since and self.honor_filter:
+            records = [r for r in records if r['modified_at'] > since]
+        return [dict(r) for r in records]
+
+    def refresh(self, **kwargs):
+        with mock.patch.object(snapshot, 'download_api_pages', self.download_api_pages):
+            return self.store.refresh('appeal', **kwargs)
+
+    def load_codes(self):
+        df, version = self.store.load('appeal')
+        return df.code.tolist(), version
+
+    def test_full_refresh(self):
+        self.assertEqual(self.store.version('appeal'), 0)
+        self.set_appeal(2, 'B', '2023-01-02T00:00:00Z')
+        self.set_appeal(1, 'A', '2023-01-01T00:00:00Z')
+        self.assertEqual(self.refresh(), 2)
+        self.assertEqual(self.calls, [('appeal', None)])
+        # rows ordered by id, with the version of the snapshot
+        self.assertEqual(self.load_codes(), (['A', 'B'], 1))
+        self.assertEqual(self.store.last_modified('appeal'), '2023-01-02T00:00:00Z')
+
+    def test_incremental_refresh(self):
+        self.set_appeal(1, 'A', '2023-01-01T00:00:00Z')
+        self.set_appeal(2, 'B', '2023-01-02T00:00:00Z')
+        self.refresh()
+        self.set_appeal(2, 'B2', '2023-01-03T00:00:00Z')
+        self.set_appeal(3, 'C', '2023-01-04T00:00:00Z')
+        # only the delta is downloaded and upserted by id
+        self.assertEqual(self.refresh(), 2)
+        self.assertEqual(self.calls[-1], ('appeal', '2023-01-02T00:00:00Z'))
+        self.assertEqual(self.load_codes(), (['A', 'B2', 'C'], 2))
+        # a full refresh drops the records deleted in GO
+        del self.table[1]
+        self.refresh(full=True)
+        self.assertEqual(self.load_codes(), (['B2', 'C'], 3))
+
+    def test_ignored_filter(self):
+        self.set_appeal(1, 'A', '2023-01-01T00:00:00Z')
+        self.set_appeal(2, 'B', '2023-01-02T00:00:00Z')
+        self.refresh()
+        self.honor_filter = False
+        del self.table[1]
+        self.set_appeal(3, 'C', '2023-01-03T00:00:00Z')
+        self.refresh()
+        # the whole table was returned, so it replaces the snapshot
+        self.assertEqual(self.load_codes(), (['B', 'C'], 2))
+
+    def test_initial_fetch_once(self):
+        self.set_appeal(1, 'A', '2023-01-01T00:00:00Z')
+        original = self.download_api_pages
+
+        def slow_download(call, since=None):
+            time.sleep(0.2)
+            return original(call, since=since)
+
+        with mock.patch.object(snapshot, 'download_api_pages', slow_download):
+            threads = [threading.Thread(target=self.store.ensure_loaded, args=('appeal',)) for _ in range(4)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+            self.assertEqual(self.store.ensure_loaded('appeal'), 0)
+        self.assertEqual(self.calls, [('appeal', None)])
+        self.assertEqual(self.load_codes(), (['A'], 1))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,107 @@
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+from munch import Munch
+from dref_parsing import parser_utils
+from dref_parsing.cache import PDFCache
+from dref_parsing.parser_utils import PDFDocument, get_CHLLs
+from dref_parsing.text_extraction import extract_layout, extract_text, layout_text, pbflag
+
+try:
+    import fitz
+except ImportError:
+    fitz = None
+
+
+# Paragraphs of the pages of a report, Challenges continue on the next page
+PAGES = [
+    ['Health', 'Challenges', 'Access to the affected communities was difficult because of the floods.',
+     'Some volunteers had no previous training in first aid'],
+    ['and had to be trained during the operation.',
+     'Lessons Learnt', 'Training of volunteers should start before the rainy season.'],
+    ['Shelter', 'Challenges', 'Shelter kits arrived late.'],
+]
+HEADER = 'DREF Final Report'
+FOOTER = 'International Federation of Red Cross'
+
+
+def create_report():
+    doc = fitz.open()
+    for paragraphs in PAGES:
+        page = doc.new_page(width=595, height=842)
+        page.insert_text((72, 40), HEADER, fontname='helv', fontsize=9)
+        for number, paragraph in enumerate(paragraphs):
+            page.insert_text((72, 120+40*number), paragraph, fontname='helv', fontsize=11)
+        page.insert_text((72, 800), FOOTER, fontname='helv', fontsize=8)
+    return doc.tobytes()
+
+
+# Text of the report as Tika writes it: paragraphs separated by an empty line,
+# pages by a linebreak, no page break flag
+def tika_text():
+    pages = [[HEADER]+paragraphs+[FOOTER] for paragraphs in PAGES]
+    return '\n'.join(''.join(paragraph+'\n\n' for paragraph in paragraphs)[:-1] for paragraphs in pages)
+
+
+@unittest.skipIf(fitz is None, 'PyMuPDF is needed to create the test PDF')
+class TestTextExtraction(unittest.TestCase):
+
+    def setUp(self):
+        self.pdf_data = create_report()
+        self.folder = tempfile.mkdtemp()
+        self.patcher = mock.patch.object(parser_utils, 'pdf_cache', PDFCache(self.folder))
+        self.patcher.start()
+
+    def tearDown(self):
+        self.patcher.stop()
+        shutil.rmtree(self.folder)
+
+    def excerpts(self, document):
+        headers, footers, postheaders = document.header_footer_candidates
+        PDFextras = Munch(Unknown=Munch(headers=headers, footers=footers, postheaders=postheaders))
+        excerpts, _ = get_CHLLs(lead='Unknown', PDFextras=PDFextras, document=document)
+        return excerpts[['Modified Excerpt', 'Learning']].values.tolist()
+
+    def test_tika_format(self):
+        pages = extract_layout(self.pdf_data)
+        self.assertEqual(len(pages), len(PAGES))
+        txt = layout_text(pages)
+        self.assertNotIn(pbflag, txt)
+        self.assertEqual(txt, tika_text())
+        self.assertEqual(extract_text(self.pdf_data, backend='pdfminer'), txt)
+
+    def test_pymupdf(self):
+        txt = extract_text(self.pdf_data, backend='pymupdf')
+        self.assertNotIn(pbflag, txt)
+        self.assertEqual(txt, tika_text())
+        # each page ends with its footer, followed by a linebreak and the header of the next page
+        self.assertEqual(txt.count(f'{FOOTER}\n\n{HEADER}\n'), len(PAGES)-1)
+        self.assertTrue(txt.endswith(f'{FOOTER}\n'))
+
+        # the same excerpts as from the Tika text
+        document = PDFDocument('Unknown', pdf_file=self.pdf_data, text_backend='pymupdf')
+        reference = PDFDocument('Unknown', pdf_file=self.pdf_data, text_backend='tika')
+        reference.text = tika_text()
+        self.assertEqual(self.excerpts(document), self.excerpts(reference))
+
+    def test_single_pass_excerpts(self):
+        document = PDFDocument('Unknown', pdf_file=self.pdf_data)
+        with mock.patch.object(parser_utils, 'extract_layout', wraps=extract_layout) as layout:
+            excerpts = self.excerpts(document)
+        # one layout pass gives both the header/footer candidates and the text
+        layout.assert_called_once()
+
+        # the same excerpts as from the Tika text
+        reference = PDFDocument('Unknown', pdf_file=self.pdf_data, text_backend='tika')
+        reference.text = tika_text()
+        self.assertEqual(excerpts, self.excerpts(reference))
+        self.assertEqual(excerpts, [
+            ['Access to the affected communities was difficult because of the floods.', 'Challenges'],
+            ['Some volunteers had no previous training in first aidand had to be trained during the operation.', 'Challenges'],
+            ['Shelter kits arrived late.', 'Challenges'],
+            ['Training of volunteers should start before the rainy season.', 'Lessons Learnt']])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,182 @@
+"""
+Inference backends for the docBERT model used by dref_tagging.prediction
+
+Classes
+-------
+    TorchBackend: runs the trained PyTorch model (fp32 or quantized)
+    OnnxBackend: runs the model exported to ONNX with ONNX Runtime on CPU
+
+Functions
+---------
+    load_backend: creates the backend used for serving
+    export_onnx: exports the trained PyTorch model to ONNX
+
+Notes
+-----
+    Every backend has a method 'predict_logits' that takes the input ids,
+    input mask and segment ids as integer NumPy arrays of shape 
+    (batch size, sequence length) and returns the logits as a NumPy 
+    array of shape (batch size, number of tags).
+    torch and onnxruntime are imported only by the backend that needs 
+    them, so that a worker serving the ONNX model does not import torch.
+    To create the ONNX model, run 
+
+        python -m dref_tagging.backends
+"""
+
+import os
+import random
+from importlib import resources
+
+import numpy as np
+
+# Names of the model inputs and output in the ONNX graph
+onnx_input_names = ["input_ids", "attention_mask", "token_type_ids"]
+onnx_output_names = ["logits"]
+
+
+class TorchBackend:
+    def __init__(self, model_path, cpu_only=False, seed=3435):
+        """
+        Backend running the trained (possibly quantized) PyTorch model.
+
+        Parameters
+        ----------
+            model_path: path to the model saved with torch.save
+            cpu_only: run on CPU even if a GPU is available 
+                (quantized models can run on CPU only)
+            seed: random seed, set for reproducibility
+        """
+        import torch
+
+        self.torch = torch
+        self.device = torch.device("cuda" if torch.cuda.is_available() and not cpu_only else "cpu")
+        n_gpu = torch.cuda.device_count() if self.device.type == "cuda" else 0
+
+        # Set random seed for reproducibility
+        random.seed(seed)
+        np.random.seed(seed)
+        torch.manual_seed(seed)
+        if n_gpu > 0:
+            torch.cuda.manual_seed_all(seed)
+
+        model = torch.load(model_path, map_location=self.device)
+        if n_gpu > 1:
+            model = torch.nn.DataParallel(model)
+        model = model.to(self.device)
+        model.eval()
+        self.model = model
+
+    def predict_logits(self, input_ids, input_mask, segment_ids):
+        input_ids = self.torch.from_numpy(input_ids).to(self.device)
+        input_mask = self.torch.from_numpy(input_mask).to(self.device)
+        segment_ids = self.torch.from_numpy(segment_ids).to(self.device)
+
+        with self.torch.no_grad():
+            logits = self.model(input_ids, input_mask, segment_ids)[0]
+        return logits.cpu().numpy()
+
+
+class OnnxBackend:
+    def __init__(self, model_path, num_threads=0):
+        """
+        Backend running the ONNX model with ONNX Runtime on CPU, 
+        with all graph optimizations enabled.
+
+        Parameters
+        ----------
+            model_path: path to the ONNX model created by export_onnx
+            num_threads: number of threads used within an operator,
+                0 lets ONNX Runtime decide
+        """
+        import onnxruntime
+
+        options = onnxruntime.SessionOptions()
+        options.graph_optimization_level = onnxruntime.GraphOptimizationLevel.ORT_ENABLE_ALL
+        options.intra_op_num_threads = num_threads
+        self.session = onnxruntime.InferenceSession(
+            str(model_path), options, providers=["CPUExecutionProvider"]
+        )
+
+    def predict_logits(self, input_ids, input_mask, segment_ids):
+        inputs = dict(zip(onnx_input_names, [input_ids, input_mask, segment_ids]))
+        return self.session.run(onnx_output_names, inputs)[0]
+
+
+# **************************************************************************
+# Backend for serving, chosen by its name
+# **************************************************************************
+def load_backend(name="torch", quantized=False):
+    """
+    Create the inference backend for the model files in dref_tagging/config.
+
+    Parameters
+    ----------
+        name: "torch" (DREF_docBERT.pt) or "onnx" (DREF_docBERT.onnx)
+        quantized: for the torch backend, use the dynamically quantized 
+            model DREF_docBERT_int8.pt (see dref_tagging.quantization)
+    """
+    if name == "torch":
+        model_file = "DREF_docBERT_int8.pt" if quantized else "DREF_docBERT.pt"
+        with resources.path("dref_tagging.config", model_file) as model_path:
+            return TorchBackend(model_path, cpu_only=quantized)
+    if name == "onnx":
+        with resources.path("dref_tagging.config", "DREF_docBERT.onnx") as model_path:
+            return OnnxBackend(model_path)
+    raise ValueError(f"Unknown inference backend '{name}', must be 'torch' or 'onnx'")
+
+
+# **************************************************************************
+# Export the trained PyTorch model to ONNX
+# **************************************************************************
+def export_onnx(model_file="DREF_docBERT.pt", output_file="DREF_docBERT.onnx", 
+                max_seq_length=128, opset_version=12, model_dir=None):
+    """
+    Export the trained docBERT model to ONNX, with dynamic batch and 
+    sequence axes. The model is saved next to the PyTorch model in 
+    dref_tagging/config (or in 'model_dir', if given).
+
+    Returns
+    -------
+        output_path: full path to the saved ONNX model
+    """
+    import torch
+
+    if model_dir is None:
+        with resources.path("dref_tagging.config", model_file) as model_path:
+            model_dir = os.path.dirname(model_path)
+    model = torch.load(os.path.join(model_dir, model_file), map_location=torch.device("cpu"))
+    output_path = os.path.join(model_dir, output_file)
+
+    if isinstance(model, torch.nn.DataParallel):
+        model = model.module
+    model.eval()
+
+    # ONNX graph should output only the logits
+    class LogitsOnly(torch.nn.Module):
+        def __init__(self, model):
+            super().__init__()
+            self.model = model
+
+        def forward(self, input_ids, attention_mask, token_type_ids):
+            return self.model(input_ids, attention_mask, token_type_ids)[0]
+
+    dummy_input = tuple(torch.ones((2, max_seq_length), dtype=torch.long) for _ in onnx_input_names)
+    dynamic_axes = {name: {0: "batch", 1: "sequence"} for name in onnx_input_names}
+    dynamic_axes[onnx_output_names[0]] = {0: "batch"}
+
+    torch.onnx.export(
+        LogitsOnly(model),
+        dummy_input,
+        output_path,
+        input_names=onnx_input_names,
+        output_names=onnx_output_names,
+        dynamic_axes=dynamic_axes,
+        opset_version=opset_version,
+        do_constant_folding=True,
+    )
+    return output_path
+
+
+if __name__ == "__main__":
+    print('ONNX model saved to', export_onnx())
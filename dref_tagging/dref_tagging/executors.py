@@ -0,0 +1,33 @@
+"""
+Execution of model inference outside the FastAPI event loop
+
+Classes
+-------
+    ExecutorSaturated: raised when the executor does not accept more tasks
+    BoundedExecutor: runs functions in an executor, with a limit on pending tasks
+        (shared with dref_parsing and ea_parsing, see bounded_executor.py)
+
+Notes
+-----
+    Inference is blocking, so the API runs it in a thread pool 
+    (PyTorch and ONNX Runtime release the GIL and use several threads 
+    per call themselves, so one inference thread is the default).
+    The number of requests waiting for or running inference is limited: 
+    when the limit is reached, ExecutorSaturated is raised and the API 
+    answers 503, instead of queueing requests without bounds.
+    Settings by environment variables:
+        DREF_TAGGING_WORKERS: number of inference threads (default 1)
+        DREF_TAGGING_MAX_PENDING: maximal number of inference requests 
+            running or queued (default 8)
+"""
+import os
+from concurrent.futures import ThreadPoolExecutor
+from dref_tagging.bounded_executor import BoundedExecutor, ExecutorSaturated
+
+__all__ = ["ExecutorSaturated", "inference_workers", "inference_executor"]
+
+inference_workers = int(os.environ.get("DREF_TAGGING_WORKERS", 1))
+inference_executor = BoundedExecutor(
+    lambda: ThreadPoolExecutor(max_workers=inference_workers, thread_name_prefix="inference"),
+    max_pending=int(os.environ.get("DREF_TAGGING_MAX_PENDING", 8)),
+)
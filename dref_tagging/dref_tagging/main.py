@@ -8,11 +8,14 @@ Classes
 Functions
 ---------
     classify: implement the FastAPI endpoint for automatic tagging
+    load_tagging_resources: load the model etc. at startup of the API
     translate: translate text to English
 """
 
-from fastapi import Body, FastAPI
+from fastapi import Body, FastAPI, HTTPException
 from dref_tagging.prediction import predict_tags_any_length
+from dref_tagging.executors import inference_executor, ExecutorSaturated
+from dref_tagging.registry import warmup
 
 from typing import Union, List
 from pydantic import BaseModel
@@ -43,6 +46,13 @@ from typing import List, Sequence, Tuple, Union
 
 app = FastAPI()
 
+
+# Load tokenizer, model and spaCy at startup, 
+# so that the first request does not have to wait for them
+@app.on_event("startup")
+def load_tagging_resources():
+    warmup()
+
 example_text = (
 "A  pre hurricane season meeting will be held in June. Discussion will be held to improve the coordination in the use of shelter kits in the future."
 )
@@ -95,7 +105,13 @@ async def classify(
     # make sure 'texts' is a list
     if isinstance(texts, str): texts = [texts]
 
-    merged_predictions = predict_tags_any_length(texts)
+    # Inference runs in a worker thread, so that the event loop keeps serving other requests
+    try:
+        merged_predictions = await inference_executor.run(predict_tags_any_length, texts)
+    except ExecutorSaturated:
+        raise HTTPException(status_code=503, 
+                            detail="The model is busy with other requests, please try again later",
+                            headers={"Retry-After": "10"})
 
     #texts[0] = '22 ' + texts[0] # for debugging
 
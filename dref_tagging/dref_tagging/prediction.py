@@ -5,6 +5,9 @@ Functions
 ---------
     predict_tags: predict IFRC tags for given texts
     _get_features: extracts features from given texts, to be used by predict_tags
+    check_tokenizer_parity: compares features of the fast tokenizer and the original one
+    compare_backends: compares predictions of the ONNX and the PyTorch backends
+    _make_batches: groups texts of similar length into batches, to be used by predict_tags
 
 Notes
 -----
@@ -14,62 +17,54 @@ Notes
     Apache License 2.0. See the included LICENSE.txt for licensing details.
 """
 
-import pathlib
+import os
 from importlib import resources
-import random
 
 import numpy as np
 import pandas as pd
-import torch
-from torch.utils.data import DataLoader, SequentialSampler, TensorDataset
-from transformers import BertTokenizer
 from typing import List, Sequence, Tuple, Union
 
+from dref_tagging.backends import load_backend, OnnxBackend, TorchBackend
+from dref_tagging.registry import registry
 from dref_tagging.tag_utils import split_into_chunks, merge_predicted_tags
 
 # **************************************************************************
 # SETUP / PREPARATIONS
 # **************************************************************************
 
-# Set default configuration in args.py
-device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
-n_gpu = torch.cuda.device_count()
+# Inference backend, set by environment variable DREF_TAGGING_BACKEND:
+# "torch" (default) runs the PyTorch model, "onnx" runs the model exported
+# by 'python -m dref_tagging.backends' with ONNX Runtime (torch is not imported)
+backend_name = os.environ.get("DREF_TAGGING_BACKEND", "torch").lower()
 
-# print('Device:', str(device).upper())
-# print('Number of GPUs:', n_gpu)
+# Serve the dynamically quantized (INT8) model instead of the fp32 one,
+# if environment variable DREF_TAGGING_QUANTIZED is set to 1/true.
+# The quantized model is created by 'python -m dref_tagging.quantization'
+quantized = os.environ.get("DREF_TAGGING_QUANTIZED", "0").lower() in ["1", "true", "yes"]
 
-# Set random seed for reproducibility
-seed = 3435
-random.seed(seed)
-np.random.seed(seed)
-torch.manual_seed(seed)
-
-# BASE_DIRECTORY = pathlib.Path(__file__).parent.parent
-
-model = "bert-base-uncased"
-# trained_model = BASE_DIRECTORY / "DREF_docBERT.pt"
-
-if n_gpu > 0:
-    torch.cuda.manual_seed_all(seed)
+bert_model_name = "bert-base-uncased"
 
 args = dict()
 args["max_seq_length"] = 128
-args["batch_size"] = 2
-args["device"] = device
+# Upper limit for (number of texts) x (padded length) in one model call.
+# Texts are sorted by length and padded only up to the longest text in the batch
+args["max_tokens_per_batch"] = 4096
 
-tokenizer = BertTokenizer.from_pretrained(model)
+# The tokenizer, the model and the tags are loaded on first use 
+# (or by dref_tagging.registry.warmup), not on import of this module
+def _load_tokenizer():
+    from transformers import BertTokenizerFast
+    return BertTokenizerFast.from_pretrained(bert_model_name)
 
-with resources.path("dref_tagging.config", "DREF_docBERT.pt") as trained_model:
-    model = torch.load(trained_model, map_location=device)
 
-if n_gpu > 1:
-    model = torch.nn.DataParallel(model)
+def _load_tags_dict():
+    with resources.path("dref_tagging.config", "tags_dict.csv") as tags_file:
+        return pd.read_csv(tags_file, index_col=0).loc[:, "Category"]
 
-model = model.to(device)
-model.eval()
 
-with resources.path("dref_tagging.config", "tags_dict.csv") as tags_file:
-    tags_dict = pd.read_csv(tags_file, index_col=0).loc[:, "Category"]
+registry.register("tokenizer", _load_tokenizer)
+registry.register("backend", lambda: load_backend(backend_name, quantized=quantized))
+registry.register("tags_dict", _load_tags_dict)
 
 
 # **************************************************************************
@@ -77,7 +72,7 @@ with resources.path("dref_tagging.config", "tags_dict.csv") as tags_file:
 # Splits them into chuncks, does tagging and merges the tags
 # **************************************************************************
 def predict_tags_any_length(
-    eval_texts: Union[str, Sequence[str]], forcetag = 0
+    eval_texts: Union[str, Sequence[str]], forcetag = 0, backend = None
 ) -> Tuple[List[str], List[List[str]]]:
 
     if isinstance(eval_texts, str):
@@ -88,7 +83,7 @@ def predict_tags_any_length(
     divided_text, text_indicies = split_into_chunks(eval_texts, max_len = max_len, verbose=0) 
 
     # make predictions on the chunks
-    returned_texts, predictions = predict_tags(divided_text, forcetag = forcetag)
+    returned_texts, predictions = predict_tags(divided_text, forcetag = forcetag, backend = backend)
 
     # merge the predictions
     merged_predictions = merge_predicted_tags(predictions, text_indicies) 
@@ -101,7 +96,7 @@ def predict_tags_any_length(
 # Predict tags (for shorter chunks of text)
 # **************************************************************************
 def predict_tags(
-    eval_texts: Union[str, Sequence[str]], forcetag = 0
+    eval_texts: Union[str, Sequence[str]], forcetag = 0, backend = None
 ) -> Tuple[List[str], List[List[str]]]:
     """
     Given a text or sequence of texts this function automatically
@@ -112,6 +107,11 @@ def predict_tags(
     Parameters
     ----------
         eval_texts: The text(s) to be evaluated
+        forcetag: if 1, assign the most likely tag to texts without 
+            predicted tags
+        backend: the inference backend with the docBERT model to use 
+            (see dref_tagging.backends). If None, the backend loaded 
+            by this module is used
 
     Returns
     -------
@@ -132,39 +132,39 @@ def predict_tags(
         error_msg = "Unable to transform input to a list of strings"
         raise TypeError(error_msg)
 
-    features = _get_features(eval_texts, args["max_seq_length"])
-    unpadded_input_ids, unpadded_input_mask, unpadded_segment_ids = features
+    if len(eval_texts) == 0:
+        return (eval_texts, [])
 
-    padded_input_ids = torch.tensor(unpadded_input_ids, dtype=torch.long)
-    padded_input_mask = torch.tensor(unpadded_input_mask, dtype=torch.long)
-    padded_segment_ids = torch.tensor(unpadded_segment_ids, dtype=torch.long)
+    if backend is None:
+        backend = registry.get("backend")
+    tags_dict = registry.get("tags_dict")
 
-    eval_data = TensorDataset(padded_input_ids, padded_input_mask, padded_segment_ids)
-    eval_sampler = SequentialSampler(eval_data)
-    eval_dataloader = DataLoader(
-        eval_data, sampler=eval_sampler, batch_size=args["batch_size"]
-    )
-    
-    predicted_tags = []
-    # loop over batches
-    for input_ids, input_mask, segment_ids in eval_dataloader:
-        input_ids = input_ids.to(args["device"])
-        input_mask = input_mask.to(args["device"])
-        segment_ids = segment_ids.to(args["device"])
-
-        
-        with torch.no_grad():
-            logits = model(input_ids, input_mask, segment_ids)[0]
-            preds = torch.sigmoid(logits*5).round().long().cpu().detach().numpy()
-
-            if forcetag == 1:                    
-                # if no tags predicted, assign the most likely tag.
-                for pred, logit in zip(preds,logits.cpu()):
-                    if max(pred)==0:
-                        i_max = int(np.argmax(logit))
-                        pred[i_max] = 1
-
-            predicted_tags.extend(preds)
+    features = _get_features(eval_texts, args["max_seq_length"])
+    padded_input_ids, padded_input_mask, padded_segment_ids = features
+
+    # Number of real (non-padding) tokens in each text
+    lengths = padded_input_mask.sum(axis=1)
+
+    predicted_tags = [None] * len(eval_texts)
+    # loop over batches of texts with similar length
+    for batch in _make_batches(lengths, args["max_tokens_per_batch"]):
+        # Pad only up to the longest text in the batch
+        batch_len = int(lengths[batch].max())
+        logits = backend.predict_logits(padded_input_ids[batch, :batch_len],
+                                        padded_input_mask[batch, :batch_len],
+                                        padded_segment_ids[batch, :batch_len])
+        preds = np.round(1 / (1 + np.exp(-logits*5))).astype(np.int64)
+
+        if forcetag == 1:                    
+            # if no tags predicted, assign the most likely tag.
+            for pred, logit in zip(preds,logits):
+                if max(pred)==0:
+                    i_max = int(np.argmax(logit))
+                    pred[i_max] = 1
+
+        # put predictions back to the original order of texts
+        for i, pred in zip(batch, preds):
+            predicted_tags[i] = pred
 
     for i, prediction in enumerate(predicted_tags):
         prediction = [bool(d) for d in prediction]
@@ -176,24 +176,141 @@ def predict_tags(
 def analyze_predictions(data_path="training_model/DocBERT/hedwig-data/datasets/DREF/dev.tsv",
                         model_path="\dref_tagging\dref_tagging\config\DREF_docBERT.pt",
                         basepath = "../DREF_IFRC/", forcetag = 0,
-                        limit=-1):
+                        limit=-1, cpu_only=None):
 
-    model = torch.load(basepath+model_path, map_location=device)
-    if n_gpu > 1:
-        model = torch.nn.DataParallel(model)
-    model = model.to(device)
+    # Backend is chosen by the model file: ONNX or PyTorch.
+    # Quantized models (*_int8.pt, see dref_tagging.quantization) run on CPU only
+    if model_path.endswith('.onnx'):
+        backend = OnnxBackend(basepath+model_path)
+    else:
+        if cpu_only is None:
+            cpu_only = model_path.endswith('_int8.pt')
+        backend = TorchBackend(basepath+model_path, cpu_only=cpu_only)
 
-    
     df = pd.read_csv(basepath+data_path, sep="\t", header=None, names=['tags01','text'])
     if limit>0:
         df = df[:limit]
 
+    tags_dict = registry.get("tags_dict")
     df['tags'] = df.tags01.apply(lambda x: tags_dict.loc[[bool(int(d)) for d in x]].to_list())
-    df['preds'] = df.text.apply(lambda x: predict_tags_any_length(x, forcetag = forcetag)[0])
+    df['preds'] = df.text.apply(lambda x: predict_tags_any_length(x, forcetag = forcetag, backend = backend)[0])
     df['match'] = df.tags == df.preds
 
     return df[['text','tags','preds','match']]
 
+
+# **************************************************************************
+# Parity check: predictions of the ONNX backend vs the PyTorch backend
+# **************************************************************************
+def compare_backends(data_path="training_model/DocBERT/hedwig-data/datasets/DREF/dev.tsv",
+                     model_path="dref_tagging/dref_tagging/config/DREF_docBERT.pt",
+                     onnx_model_path="dref_tagging/dref_tagging/config/DREF_docBERT.onnx",
+                     basepath="../DREF_IFRC/", limit=-1):
+    """
+    Run both backends on the same texts and compare logits and tags.
+    The texts are truncated to args["max_seq_length"] tokens, 
+    i.e. no splitting into chunks, so that logits can be compared directly.
+
+    Returns
+    -------
+        df: a DataFrame with the texts, the maximal absolute difference 
+            between the logits of the two backends, and whether the 
+            predicted tags are the same
+    """
+    df = pd.read_csv(basepath+data_path, sep="\t", header=None, names=['tags01','text'])
+    if limit>0:
+        df = df[:limit]
+    texts = df.text.astype(str).to_list()
+
+    input_ids, input_mask, segment_ids = _get_features(texts, args["max_seq_length"])
+    logits = {}
+    for name, backend in [('torch', TorchBackend(basepath+model_path)), 
+                          ('onnx', OnnxBackend(basepath+onnx_model_path))]:
+        logits[name] = np.concatenate([
+            backend.predict_logits(input_ids[batch], input_mask[batch], segment_ids[batch])
+            for batch in np.array_split(np.arange(len(texts)), max(1, len(texts) // 32))
+        ])
+
+    df = pd.DataFrame({'text': texts})
+    df['max_logit_diff'] = np.abs(logits['torch'] - logits['onnx']).max(axis=1)
+    df['same_tags'] = ((logits['torch'] > 0) == (logits['onnx'] > 0)).all(axis=1)
+    return df
+
+# **************************************************************************
+# **************************************************************************
+def _make_batches(lengths: Sequence[int], max_tokens_per_batch: int) -> List[np.ndarray]:
+    """
+    group texts of similar length into batches for the model
+
+    This helper function for the 'predict_tags' function sorts the texts 
+    by their token length and cuts the sorted sequence into batches, 
+    such that each batch padded to its longest text has at most 
+    'max_tokens_per_batch' tokens. A single text longer than the budget 
+    still gets its own batch.
+
+    Parameters
+    ----------
+        lengths: the number of tokens in each text
+        max_tokens_per_batch: the maximum of (batch size) x (padded 
+            length of the batch)
+
+    Returns
+    -------
+        batches: a list of arrays with the indices of the texts in 
+            each batch. Together the batches contain every index once.
+    """
+    batches = []
+    batch = []
+    for i in np.argsort(lengths, kind="stable"):
+        # texts are sorted, so the current text is the longest in the batch
+        if batch and lengths[i] * (len(batch) + 1) > max_tokens_per_batch:
+            batches.append(np.array(batch))
+            batch = []
+        batch.append(i)
+    if batch:
+        batches.append(np.array(batch))
+    return batches
+
+
+# **************************************************************************
+# Parity check: token ids of the fast (Rust) tokenizer used in _get_features
+# must coincide with the ids of the original (pure Python) BertTokenizer path
+# **************************************************************************
+def check_tokenizer_parity(data_paths=("training_model/DocBERT/hedwig-data/datasets/DREF/train.tsv",
+                                       "training_model/DocBERT/hedwig-data/datasets/DREF/dev.tsv",
+                                       "training_model/DocBERT/hedwig-data/datasets/DREF/test.tsv"),
+                           basepath="../DREF_IFRC/", limit=-1):
+    """
+    Compare the features from '_get_features' with the features from 
+    '_get_features_slow' on the training TSV files. 
+    Returns a DataFrame with the texts where the features differ 
+    (i.e. an empty DataFrame if the two tokenizers agree).
+    """
+    from transformers import BertTokenizer
+    slow_tokenizer = BertTokenizer.from_pretrained(bert_model_name)
+
+    mismatches = []
+    for data_path in data_paths:
+        df = pd.read_csv(basepath+data_path, sep="\t", header=None, names=['tags01','text'])
+        if limit>0:
+            df = df[:limit]
+        texts = df.text.astype(str).to_list()
+
+        fast = _get_features(texts, args["max_seq_length"])
+        slow = _get_features_slow(texts, args["max_seq_length"], slow_tokenizer)
+
+        # fast features are padded only up to the longest text, slow ones up to max_seq_length
+        n_tokens = fast[0].shape[1]
+        slow = [np.array(feature, dtype=np.int64) for feature in slow]
+        assert (slow[1][:, n_tokens:] == 0).all()
+
+        differs = np.zeros(len(texts), dtype=bool)
+        for feature_fast, feature_slow in zip(fast, slow):
+            differs |= (feature_fast != feature_slow[:, :n_tokens]).any(axis=1)
+        mismatches.append(pd.DataFrame({'data_path': data_path, 'text': np.array(texts)[differs]}))
+
+    return pd.concat(mismatches, ignore_index=True)
+
 # **************************************************************************
 # **************************************************************************
 def _get_features(texts: Sequence[str], max_seq_length: int):
@@ -201,8 +318,9 @@ def _get_features(texts: Sequence[str], max_seq_length: int):
     generate input features to the BERT model from texts
 
     This helper function for the 'predict_tags' function takes in a list
-    of texts and transforms each of them to the set of input features
-    required by the BERT model that makes the tag predictions.
+    of texts and transforms all of them at once (with the batched fast 
+    tokenizer) to the set of input features required by the BERT model 
+    that makes the tag predictions.
 
     Parameters
     ----------
@@ -213,33 +331,55 @@ def _get_features(texts: Sequence[str], max_seq_length: int):
 
     Returns
     -------
-        input_idss: a list of length equal to the number of texts. 
-            Element i is a list of length 'max_seq_len' with the 
-            (zero padded) integer ids for the tokenized input text for 
-            element i of 'texts'. 
-        input_masks: a list of length equal to the number of texts. 
-            Element i is a list of length 'max_seq_len' with the input 
-            mask for element i of 'input_idss'. The input mask has value 
-            1 if the corresponding input id is not padding, and 0 
-            otherwise.
-        segment_ids: a list of length equal to the number of texts. 
-            Element i is a list of length 'max_seq_len' with the segment 
-            ids for element i of 'input_idss'. These may be used to 
-            distinguish between sequences in a sequence pair. However 
-            here each text is treated as a single sequence, so the 
-            seqment ids are all 0.
+        input_ids: an integer array with one row per text. Row i holds
+            the (zero padded) integer ids for the tokenized input text 
+            for element i of 'texts'. Texts longer than 'max_seq_length' 
+            are truncated and shorter ones are padded up to the longest 
+            text, so the number of columns is at most 'max_seq_length'.
+        input_mask: an integer array with the same shape as 'input_ids'. 
+            The input mask has value 1 if the corresponding input id is 
+            not padding, and 0 otherwise.
+        segment_ids: an integer array with the same shape as 'input_ids'. 
+            These may be used to distinguish between sequences in a 
+            sequence pair. However here each text is treated as a single 
+            sequence, so the seqment ids are all 0.
+    """
+    tokenizer = registry.get("tokenizer")
+    encoded = tokenizer(
+        list(texts),
+        padding="longest",
+        truncation=True,
+        max_length=max_seq_length,
+        return_attention_mask=True,
+        return_token_type_ids=True,
+        return_tensors="np",
+    )
+    input_ids = encoded["input_ids"].astype(np.int64, copy=False)
+    input_mask = encoded["attention_mask"].astype(np.int64, copy=False)
+    segment_ids = encoded["token_type_ids"].astype(np.int64, copy=False)
+    return (input_ids, input_mask, segment_ids)
+
+
+# **************************************************************************
+# Original feature extraction with the pure Python tokenizer.
+# Only used to check the parity of the fast tokenizer
+# **************************************************************************
+def _get_features_slow(texts: Sequence[str], max_seq_length: int, slow_tokenizer):
+    """
+    generate input features to the BERT model from texts, one text at a 
+    time, with lists zero padded up to 'max_seq_length'
     """
     input_idss = []
     input_masks = []
     segment_idss = []
     for text in texts:
-        tokens_a = tokenizer.tokenize(text)
+        tokens_a = slow_tokenizer.tokenize(text)
         if len(tokens_a) > max_seq_length - 2:
             tokens_a = tokens_a[: (max_seq_length - 2)]
 
         tokens = ["[CLS]"] + tokens_a + ["[SEP]"]
 
-        input_ids = tokenizer.convert_tokens_to_ids(tokens)
+        input_ids = slow_tokenizer.convert_tokens_to_ids(tokens)
 
         # The mask has 1 for real tokens and 0 for padding tokens. Only real
         # tokens are attended to.
@@ -260,6 +400,3 @@ def _get_features(texts: Sequence[str], max_seq_length: int):
         segment_idss.append(segment_ids)
 
     return (input_idss, input_masks, segment_idss)
-
-
-
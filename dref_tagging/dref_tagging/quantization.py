@@ -0,0 +1,104 @@
+"""
+Offline export of a dynamically quantized (INT8) docBERT model for CPU serving
+
+Functions
+---------
+    quantize_model: quantizes the Linear layers of the trained docBERT 
+        model and saves the result next to it
+    compare_quantized_model: compares accuracy and speed of the fp32 and 
+        the quantized models on a labelled dataset
+
+Notes
+-----
+    Run the export with 
+
+        python -m dref_tagging.quantization
+
+    and set the environment variable DREF_TAGGING_QUANTIZED=1 to make 
+    dref_tagging.prediction serve the quantized model.
+"""
+
+import os
+import time
+from importlib import resources
+
+import pandas as pd
+import torch
+
+
+# **************************************************************************
+# Quantize the trained model and save it to the config folder
+# **************************************************************************
+def quantize_model(model_file="DREF_docBERT.pt", output_file="DREF_docBERT_int8.pt"):
+    """
+    Apply dynamic quantization (INT8 weights, activations quantized on 
+    the fly) to all Linear layers of the trained docBERT model.
+
+    Parameters
+    ----------
+        model_file: name of the fp32 model file in dref_tagging/config
+        output_file: name of the quantized model file in dref_tagging/config
+
+    Returns
+    -------
+        output_path: full path to the saved quantized model
+    """
+    with resources.path("dref_tagging.config", model_file) as model_path:
+        model = torch.load(model_path, map_location=torch.device("cpu"))
+        output_path = os.path.join(os.path.dirname(model_path), output_file)
+
+    # DataParallel wrapper is not needed (and not supported) for quantization
+    if isinstance(model, torch.nn.DataParallel):
+        model = model.module
+    model.eval()
+
+    quantized_model = torch.quantization.quantize_dynamic(
+        model, {torch.nn.Linear}, dtype=torch.qint8
+    )
+    torch.save(quantized_model, output_path)
+    return output_path
+
+
+# **************************************************************************
+# Compare fp32 and quantized models using analyze_predictions
+# **************************************************************************
+def compare_quantized_model(data_path="training_model/DocBERT/hedwig-data/datasets/DREF/dev.tsv",
+                            model_path="dref_tagging/dref_tagging/config/DREF_docBERT.pt",
+                            quantized_model_path="dref_tagging/dref_tagging/config/DREF_docBERT_int8.pt",
+                            basepath="../DREF_IFRC/", forcetag=0, limit=-1):
+    """
+    Run analyze_predictions with both models on the same data.
+
+    Returns
+    -------
+        summary: a DataFrame with accuracy (share of texts where the 
+            predicted tags match the true tags), run time and model 
+            file size for each model, and the share of texts where 
+            both models predict the same tags
+        predictions: a DataFrame with the predictions of both models
+    """
+    # imported here since it loads the serving model
+    from dref_tagging.prediction import analyze_predictions
+
+    summary = []
+    predictions = {}
+    for name, path in [('fp32', model_path), ('int8', quantized_model_path)]:
+        start = time.perf_counter()
+        predictions[name] = analyze_predictions(data_path=data_path, model_path=path,
+                                                basepath=basepath, forcetag=forcetag,
+                                                limit=limit, cpu_only=(name == 'int8'))
+        summary.append({'model': name,
+                        'accuracy': predictions[name]['match'].mean(),
+                        'time, s': time.perf_counter() - start,
+                        'size, MB': os.path.getsize(basepath+path) / 1e6})
+
+    summary = pd.DataFrame(summary).set_index('model')
+    same_preds = (predictions['fp32'].preds.apply(set) == predictions['int8'].preds.apply(set))
+    summary['same predictions as fp32'] = same_preds.mean()
+
+    predictions = predictions['fp32'].join(predictions['int8'][['preds', 'match']], rsuffix='_int8')
+    return summary, predictions
+
+
+if __name__ == "__main__":
+    print('Quantized model saved to', quantize_model())
@@ -0,0 +1,99 @@
+"""
+Registry of the heavy resources used for tagging
+(BERT tokenizer, docBERT model, spaCy model, translator)
+
+Classes
+-------
+    Registry: lazily initialized, thread-safe store of named resources
+
+Functions
+---------
+    get_resource: returns a resource of the default registry, loading it on first use
+    warmup: loads all resources of the default registry, e.g. at API startup
+
+Notes
+-----
+    Resources are not loaded when a module is imported, but the first
+    time they are needed. So importing dref_tagging (e.g. for the
+    /refresh/ endpoint or in the parsing-only app) is cheap.
+    An API should call 'warmup' at startup, so that the first request
+    does not have to wait for the model to load:
+
+        @app.on_event("startup")
+        def load_resources():
+            warmup()
+"""
+
+import threading
+from typing import Any, Callable, Dict, Iterable, Optional
+
+
+class Registry:
+    def __init__(self):
+        """
+        A store of named resources, each created by a factory function
+        the first time it is requested. Every resource is created only
+        once, even if several threads request it at the same time.
+        """
+        self._factories: Dict[str, Callable[[], Any]] = {}
+        self._resources: Dict[str, Any] = {}
+        # Re-entrant, so that a factory can request other resources
+        self._lock = threading.RLock()
+
+    def register(self, name: str, factory: Callable[[], Any]):
+        """
+        Register a factory function without arguments for resource 'name'.
+        Re-registering a name drops the resource loaded before.
+        """
+        with self._lock:
+            self._factories[name] = factory
+            self._resources.pop(name, None)
+
+    def get(self, name: str) -> Any:
+        """
+        Return resource 'name', creating it if it is not loaded yet
+        """
+        # Fast path without locking, once the resource is loaded
+        try:
+            return self._resources[name]
+        except KeyError:
+            pass
+
+        with self._lock:
+            if name not in self._resources:
+                if name not in self._factories:
+                    raise KeyError(f"Resource '{name}' is not registered")
+                self._resources[name] = self._factories[name]()
+            return self._resources[name]
+
+    def is_loaded(self, name: str) -> bool:
+        return name in self._resources
+
+    def warmup(self, names: Optional[Iterable[str]] = None):
+        """
+        Load the given resources (all registered resources by default)
+        """
+        if names is None:
+            names = list(self._factories)
+        for name in names:
+            self.get(name)
+
+
+# Default registry used by dref_tagging
+registry = Registry()
+
+
+def get_resource(name: str) -> Any:
+    return registry.get(name)
+
+
+def warmup(names: Optional[Iterable[str]] = None):
+    """
+    Load the tagging resources (all by default), so that the first
+    request does not pay for loading them.
+    """
+    # Importing the modules registers their resources
+    import dref_tagging.tag_utils  # noqa: F401
+    import dref_tagging.prediction  # noqa: F401
+
+    registry.warmup(names)
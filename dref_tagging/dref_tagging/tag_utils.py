@@ -1,19 +1,33 @@
 import numpy as np
 import re
-import spacy
-from googletrans import Translator
 from langdetect import detect
 import time
 
+from dref_tagging.registry import registry
 
-nlp_spacy = spacy.load("en_core_web_md")
-translator = Translator()
+
+# spaCy model and translator are loaded on first use 
+# (or by dref_tagging.registry.warmup), not on import of this module
+def _load_nlp_spacy():
+    import spacy
+    return spacy.load("en_core_web_md")
+
+
+def _load_translator():
+    from googletrans import Translator
+    return Translator()
+
+
+registry.register("nlp_spacy", _load_nlp_spacy)
+registry.register("translator", _load_translator)
 
 
 # ******************************************************************
 # Splits long text into chunks based on max length and linebreaks.
 # Does it for each text in the list 'texts'
-# Also translates if text is not in English 
+# Also translates if text is not in English.
+# The language is detected once for each distinct text, and the paragraphs
+# too long for one chunk are split into sentences with one spaCy nlp.pipe call
 # ******************************************************************
 def split_into_chunks(texts, max_len=320, verbose=0):
 
@@ -21,61 +35,83 @@ def split_into_chunks(texts, max_len=320, verbose=0):
     if isinstance(texts, str): texts = [texts]
     
     newline_reg = re.compile(r"\n+")
+    mod_texts = [newline_reg.sub(r"\n", text) for text in texts]
+    translations = {}
+    for mod_text in mod_texts:
+        if mod_text not in translations:
+            translations[mod_text] = translate_text(mod_text)
+    mod_texts = [translations[mod_text] for mod_text in mod_texts]
+
+    # pieces of each text: a chunk, or the index of a paragraph to split into sentences
+    pieces = []
+    long_paragraphs = []
+    for mod_text in mod_texts:
+        # check if we can do the full text
+        if len(mod_text.split()) <= max_len:
+            pieces.append([mod_text])
+            continue
+        # divide into paragrahps based on newline
+        text_pieces = []
+        for paragraph in mod_text.split("\n"):
+            # check if we can do paragraph
+            if len(paragraph.split()) <= max_len:
+                text_pieces.append(paragraph)
+            else:
+                text_pieces.append(len(long_paragraphs))
+                long_paragraphs.append(paragraph)
+        pieces.append(text_pieces)
+
+    paragraph_sentences = []
+    if long_paragraphs:
+        paragraph_sentences = [
+            [sentence.text for sentence in doc.sents]
+            for doc in registry.get("nlp_spacy").pipe(long_paragraphs)
+        ]
+
     divided_text = []
     text_indicies = [0]
     text_ind = 0
-    for text in texts:
-        mod_text = newline_reg.sub(r"\n", text)
-        mod_text = translate_text(mod_text)
-        # check if we can do the full text
-        if len(mod_text.split()) <= max_len:
-            divided_text.append(mod_text)
-            text_ind += 1
-        else:
-            # divide into paragrahps based on newline
-            paragraphs = mod_text.split("\n")
-            for paragraph in paragraphs:
-                # check if we can do paragraph
-                if len(paragraph.split()) <= max_len:
-                    divided_text.append(paragraph)
-                    text_ind += 1
-                else:
-                    # divide paragraph into approximately equal chunks
-                    sentences = [
-                        sentence.text for sentence in nlp_spacy(paragraph).sents
-                    ]
-                    sentence_lengths = np.cumsum(
-                        [len(sentence.split()) for sentence in sentences]
-                    )
-                    rem_lengths = sentence_lengths.copy()
-
-                    # find the minimal number of splits we need
-                    n_splits = 1
-                    while rem_lengths[-1] > max_len:
-                        ind = np.searchsorted(rem_lengths, max_len)
-                        rem_lengths -= rem_lengths[ind]
-                        n_splits += 1
-                    # determine which sentences go into which chunks
-                    split_indicies = [0]
-                    for i in range(1, n_splits):
-                        len_target = int(i * sentence_lengths[-1] / n_splits)
-                        ind = np.searchsorted(
-                            sentence_lengths, len_target, side="right"
-                        )
-                        split_indicies.append(ind)
-                    split_indicies.append(len(sentence_lengths))
-                    if verbose>0:
-                        print(split_indicies)
-                        print(len(sentences))
-                    text_ind += n_splits
-
-                    # form the chunks
-                    for j, _ in enumerate(split_indicies[:-1]):
-                        par_sentences = sentences[
-                            split_indicies[j] : split_indicies[j + 1]
-                        ]
-                        new_par = " ".join(par_sentences)
-                        divided_text.append(new_par)
+    for text_pieces in pieces:
+        for piece in text_pieces:
+            if isinstance(piece, str):
+                divided_text.append(piece)
+                text_ind += 1
+                continue
+
+            # divide paragraph into approximately equal chunks
+            sentences = paragraph_sentences[piece]
+            sentence_lengths = np.cumsum(
+                [len(sentence.split()) for sentence in sentences]
+            )
+            rem_lengths = sentence_lengths.copy()
+
+            # find the minimal number of splits we need
+            n_splits = 1
+            while rem_lengths[-1] > max_len:
+                ind = np.searchsorted(rem_lengths, max_len)
+                rem_lengths -= rem_lengths[ind]
+                n_splits += 1
+            # determine which sentences go into which chunks
+            split_indicies = [0]
+            for i in range(1, n_splits):
+                len_target = int(i * sentence_lengths[-1] / n_splits)
+                ind = np.searchsorted(
+                    sentence_lengths, len_target, side="right"
+                )
+                split_indicies.append(ind)
+            split_indicies.append(len(sentence_lengths))
+            if verbose>0:
+                print(split_indicies)
+                print(len(sentences))
+            text_ind += n_splits
+
+            # form the chunks
+            for j, _ in enumerate(split_indicies[:-1]):
+                par_sentences = sentences[
+                    split_indicies[j] : split_indicies[j + 1]
+                ]
+                new_par = " ".join(par_sentences)
+                divided_text.append(new_par)
         text_indicies.append(text_ind)
 
     return divided_text, text_indicies
@@ -98,20 +134,25 @@ def merge_predicted_tags(predictions, text_indicies):
 # ******************************************
 # Translate if not English 
 # ******************************************
-def translate_text(text):
+def is_english(text):
     """
-    translate text to English if it is not already in English
+    True if the text is in English, or too short to detect its language
     """
     if len(text.split()) < 5:
-        return text
+        return True
+    return detect(text) == "en"
 
-    text_language = detect(text)
-    if text_language == "en":
+
+def translate_text(text):
+    """
+    translate text to English if it is not already in English
+    """
+    if is_english(text):
         return text
 
     time.sleep(1)
     try:
-        translation = translator.translate(text)
+        translation = registry.get("translator").translate(text)
 
         text = translation.text  # Update the field to English!
     #except RuntimeError:
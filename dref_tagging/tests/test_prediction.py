@@ -0,0 +1,135 @@
+import os
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+import numpy as np
+import pandas as pd
+
+try:
+    import torch
+    from transformers import BertConfig, BertForSequenceClassification, BertTokenizer, BertTokenizerFast
+    from dref_tagging import prediction
+    from dref_tagging.backends import TorchBackend, OnnxBackend, export_onnx
+    from dref_tagging.registry import registry
+except ImportError:
+    prediction = None
+
+WORDS = ['the', 'flood', 'water', 'relief', 'shelter', 'health', 'people', 'were', 'affected', 'by',
+         'and', 'in', 'of', 'to', 'a', 'camp', 'distribution', 'volunteers', 'national', 'society', '.', ',']
+WORDPIECES = ['##s', '##ed', '##ing', '##ly', 're', '##lief', 'hea', '##lth']
+
+TEXTS = ['The flood affected people.',
+         'Relief distribution in the camps, and shelter repairs were delayed by the rains.',
+         'HEALTH volunteers of the National Society',
+         'Unknown wörds ünicode and 123 numbers',
+         ' '.join(['shelter and water'] * 60),
+         '']
+
+
+def create_model_files(folder):
+    """
+    Create a tiny BERT tokenizer and docBERT-like model (random weights) in folder.
+    Returns the path to the saved model.
+    """
+    vocab_file = os.path.join(folder, 'vocab.txt')
+    with open(vocab_file, 'w') as f:
+        f.write('\n'.join(['[PAD]', '[UNK]', '[CLS]', '[SEP]', '[MASK]'] + WORDS + WORDPIECES))
+    BertTokenizer(vocab_file, do_lower_case=True).save_pretrained(folder)
+
+    torch.manual_seed(0)
+    config = BertConfig(vocab_size=5 + len(WORDS) + len(WORDPIECES), hidden_size=16,
+                        num_hidden_layers=2, num_attention_heads=2, intermediate_size=32,
+                        max_position_embeddings=prediction.args['max_seq_length'],
+                        num_labels=len(registry.get('tags_dict')))
+    model = BertForSequenceClassification(config)
+    model.eval()
+    model_path = os.path.join(folder, 'model.pt')
+    torch.save(model, model_path)
+    return model_path
+
+
+@unittest.skipIf(prediction is None, 'torch, transformers or other dependencies of dref_tagging are not installed')
+class TestPrediction(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.folder = tempfile.mkdtemp()
+        cls.model_path = create_model_files(cls.folder)
+        # the tokenizer and the model of the tests are loaded from the folder, instead of the real ones
+        cls.patcher = mock.patch.object(prediction, 'bert_model_name', cls.folder)
+        cls.patcher.start()
+        registry.register('tokenizer', prediction._load_tokenizer)
+        cls.backend = TorchBackend(cls.model_path, cpu_only=True)
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.patcher.stop()
+        registry.register('tokenizer', prediction._load_tokenizer)
+        shutil.rmtree(cls.folder)
+
+    def test_fast_tokenizer(self):
+        self.assertIsInstance(registry.get('tokenizer'), BertTokenizerFast)
+        max_seq_length = prediction.args['max_seq_length']
+        fast = prediction._get_features(TEXTS, max_seq_length)
+        slow = prediction._get_features_slow(TEXTS, max_seq_length, BertTokenizer.from_pretrained(self.folder))
+
+        # fast features are padded up to the longest text, slow ones up to max_seq_length
+        n_tokens = fast[0].shape[1]
+        self.assertEqual(n_tokens, max_seq_length)
+        for feature_fast, feature_slow in zip(fast, slow):
+            np.testing.assert_array_equal(feature_fast, np.array(feature_slow)[:, :n_tokens])
+
+        # the same texts in the training data format
+        pd.DataFrame({'tags01': '0', 'text': TEXTS}).to_csv(
+            os.path.join(self.folder, 'dev.tsv'), sep='\t', header=False, index=False)
+        mismatches = prediction.check_tokenizer_parity(data_paths=('dev.tsv',), basepath=self.folder + '/')
+        self.assertEqual(len(mismatches), 0)
+
+    def test_dynamic_padding(self):
+        input_ids, input_mask, segment_ids = prediction._get_features(TEXTS[:4], prediction.args['max_seq_length'])
+        full_logits = self.backend.predict_logits(input_ids, input_mask, segment_ids)
+
+        # the short texts padded only up to the longest one in the batch
+        batch_len = int(input_mask.sum(axis=1).max())
+        self.assertLess(batch_len, input_ids.shape[1])
+        logits = self.backend.predict_logits(input_ids[:, :batch_len], input_mask[:, :batch_len],
+                                             segment_ids[:, :batch_len])
+        np.testing.assert_allclose(logits, full_logits, atol=1e-5)
+
+        # and every text on its own, without padding
+        for i, length in enumerate(input_mask.sum(axis=1)):
+            logits = self.backend.predict_logits(input_ids[i:i+1, :length], input_mask[i:i+1, :length],
+                                                 segment_ids[i:i+1, :length])
+            np.testing.assert_allclose(logits[0], full_logits[i], atol=1e-5)
+
+        # predict_tags with small batches gives the same tags as with one batch
+        with mock.patch.dict(prediction.args, {'max_tokens_per_batch': 10**6}):
+            _, tags = prediction.predict_tags(TEXTS, backend=self.backend)
+        with mock.patch.dict(prediction.args, {'max_tokens_per_batch': 64}):
+            _, tags_small_batches = prediction.predict_tags(TEXTS, backend=self.backend)
+        self.assertEqual(tags_small_batches, tags)
+
+    def test_onnx_backend(self):
+        try:
+            import onnxruntime  # noqa: F401
+        except ImportError:
+            self.skipTest('onnxruntime is not installed')
+        export_onnx(model_file='model.pt', output_file='model.onnx', model_dir=self.folder)
+
+        input_ids, input_mask, segment_ids = prediction._get_features(TEXTS, prediction.args['max_seq_length'])
+        onnx_backend = OnnxBackend(os.path.join(self.folder, 'model.onnx'))
+        np.testing.assert_allclose(onnx_backend.predict_logits(input_ids, input_mask, segment_ids),
+                                   self.backend.predict_logits(input_ids, input_mask, segment_ids),
+                                   atol=1e-4)
+
+        pd.DataFrame({'tags01': '0', 'text': TEXTS}).to_csv(
+            os.path.join(self.folder, 'dev.tsv'), sep='\t', header=False, index=False)
+        df = prediction.compare_backends(data_path='dev.tsv', model_path='model.pt', onnx_model_path='model.onnx',
+                                         basepath=self.folder + '/')
+        self.assertEqual(len(df), len(TEXTS))
+        self.assertLess(df.max_logit_diff.max(), 1e-4)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,53 @@
+import unittest
+from types import SimpleNamespace
+from unittest import mock
+
+try:
+    from dref_tagging import tag_utils
+    from dref_tagging.registry import registry
+except ImportError:
+    tag_utils = None
+
+
+class FakeTranslator:
+    def __init__(self):
+        self.texts = []
+
+    def translate(self, text):
+        self.texts.append(text)
+        return SimpleNamespace(text='Translated: ' + text)
+
+
+def detect(text):
+    return 'fr' if 'inondations' in text else 'en'
+
+
+@unittest.skipIf(tag_utils is None, 'langdetect or other dependencies of dref_tagging are not installed')
+class TestSplitIntoChunks(unittest.TestCase):
+
+    def setUp(self):
+        self.translator = FakeTranslator()
+        registry.register('translator', lambda: self.translator)
+        patchers = [mock.patch.object(tag_utils, 'detect', side_effect=detect),
+                    mock.patch.object(tag_utils.time, 'sleep')]
+        for patcher in patchers:
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        self.addCleanup(registry.register, 'translator', tag_utils._load_translator)
+
+    def test_mixed_languages(self):
+        """
+        Only the texts which are not in English are translated, however long the English texts are.
+        """
+        english = 'The volunteers distributed relief items to the affected families. ' * 20
+        french = 'Les inondations ont touché de nombreuses familles dans la région'
+        chunks, text_indicies = tag_utils.split_into_chunks([english, french, english, french])
+        self.assertEqual(chunks, [english, 'Translated: ' + french, english, 'Translated: ' + french])
+        self.assertEqual(text_indicies, [0, 1, 2, 3, 4])
+        # each distinct text is translated once
+        self.assertEqual(self.translator.texts, [french])
+        self.assertEqual(tag_utils.detect.call_count, 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
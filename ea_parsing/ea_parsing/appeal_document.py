@@ -1,20 +1,25 @@
-import requests
 from functools import cached_property
-import fitz
 import pandas as pd
-import ea_parsing.definitions
-from ea_parsing import utils
-from ea_parsing.sectors import Sectors
+from ea_parsing import utils, normalization
+from ea_parsing.http_client import get_client
+from ea_parsing.sectors import get_sectors
 from ea_parsing.lines import Lines
-from ea_parsing.lessons_learned_extractor import ChallengesLessonsLearnedExtractor
+from ea_parsing.page_extraction import extract_document_spans
+from ea_parsing.page_edges import PageEdges
+from ea_parsing.lessons_learned_extractor import ChallengesLessonsLearnedExtractor, get_title_matcher
 
 
 class GOAPI:
-    def __init__(self):
+    def __init__(self, client=None):
         """
         Class to interact with the IFRC GO API.
+
+        Parameters
+        ----------
+        client : ea_parsing.http_client.HTTPClient (default=None)
+            HTTP client to send the requests. Default is the client shared across the process.
         """
-        pass
+        self.client = client if client is not None else get_client()
 
     def get_appeal_data(self, mdr_code):
         """
@@ -61,7 +66,7 @@ class GOAPI:
 
     def _get_results(self, url, params=None):
         """
-        Get results from the GO API from the URL, looping through pages.
+        Get results from the GO API from the URL, fetching all pages.
 
         Parameters
         ----------
@@ -71,19 +76,7 @@ class GOAPI:
         params : dict (default=None)
             Params to pass in the request.
         """
-        # Loop through pages until there are no pages left
-        results = []
-        while url:
-            response = requests.get(
-                url=url,
-                params=params
-            )
-            response.raise_for_status()
-            json = response.json()
-            results += json['results']
-            url = json['next']
-
-        return results
+        return self.client.get_results(url=url, params=params)
 
 
 class Appeal:
@@ -174,7 +167,7 @@ class AppealDocument:
     @cached_property
     def raw_lines(self):
         """
-        Extract lines from the appeal document using PyMuPDF.
+        Extract lines from the appeal document using PyMuPDF. Pages are extracted in parallel, see ea_parsing.page_extraction.
         """
         if self.raw_lines_input is not None:
             return Lines(self.raw_lines_input)
@@ -182,77 +175,11 @@ class AppealDocument:
         if not self.document_url:
             return None
 
-        # Extract lines from the PDF
-        data = []
-        total_y = 0
-
-        # Get the document content and open with fitz
-        document_url = self.document_url
-        document = requests.get(document_url)
-        doc = fitz.open(stream=document.content, filetype='pdf')
+        # Get the document content, and extract the spans of the pages in parallel
+        document = get_client().get(self.document_url)
+        spans = extract_document_spans(document.content)
 
-        # Loop through pages and paragraphs
-        for page_number, page_layout in enumerate(doc):
-
-            # Get drawings to get text highlights
-            coloured_drawings = [
-                drawing
-                for drawing in page_layout.get_drawings()
-                if (drawing['fill'] != (0.0, 0.0, 0.0))
-            ]
-            page_images = page_layout.get_image_info()
-
-            # Loop through blocks
-            blocks = page_layout.get_text("dict", flags=11)["blocks"]
-            for block_number, block in enumerate(blocks):
-                for line_number, line in enumerate(block["lines"]):
-                    spans = [span for span in line['spans'] if span['text'].strip()]
-                    for span_number, span in enumerate(spans):
-
-                        # Check if the text block is contained in a drawing
-                        highlights = []
-                        for drawing in coloured_drawings:
-                            if utils.get_overlap(span['bbox'], drawing['rect']):
-                                drawing['overlap'] = utils.get_overlap(span['bbox'], drawing['rect'])
-                                highlights.append(drawing)
-
-                        # Get largest overlap
-                        highlight_color_hex = None
-                        if highlights:
-                            largest_highlight = max(highlights, key=lambda x: x['overlap'])
-                            highlight_color = largest_highlight['fill']
-                            if highlight_color:
-                                highlight_color_hex = '#%02x%02x%02x' % (
-                                    int(255*highlight_color[0]),
-                                    int(255*highlight_color[1]),
-                                    int(255*highlight_color[2])
-                                )
-
-                        # Check if the span is contained in any page images
-                        contains_images = [img for img in page_images if utils.contains(img['bbox'], span['bbox'])]
-
-                        # Append results
-                        span['text'] = span['text'].replace('\r', '\n')
-                        span['bold'] = ("black" in span['font'].lower()) or ("bold" in span['font'].lower())
-                        span['color'] = "#%06x" % span['color']
-                        span['highlight_color'] = highlight_color_hex
-                        span['page_number'] = page_number
-                        span['block_number'] = block_number
-                        span['line_number'] = line_number
-                        span['span_number'] = span_number
-                        span['origin_x'] = span['origin'][0]
-                        span['origin_y'] = span['origin'][1]
-                        span['total_y'] = span['origin'][1]+total_y
-                        span['img'] = bool(contains_images)
-                        span['bbox_x1'] = span['bbox'][0]
-                        span['bbox_y1'] = span['bbox'][1]
-                        span['bbox_x2'] = span['bbox'][2]
-                        span['bbox_y2'] = span['bbox'][3]
-                        data.append(span)
-
-            total_y += page_layout.rect.height
-
-        return Lines(pd.DataFrame(data))
+        return Lines(spans)
 
     @cached_property
     def lines(self):
@@ -260,7 +187,10 @@ class AppealDocument:
         Process the raw lines to get the document content.
         """
         if self.lines_input is not None:
-            return Lines(self.lines_input)
+            lines = Lines(self.lines_input)
+            if 'text_key' not in lines.columns:
+                lines['text_key'] = normalization.text_key(lines['text_base'])
+            return lines
 
         if self.raw_lines is None:
             return None
@@ -269,7 +199,7 @@ class AppealDocument:
 
         # Merge inline texts
         lines = lines.merge_inline_text(
-            exclude_texts=ChallengesLessonsLearnedExtractor().title_texts()
+            exclude_texts=get_title_matcher()
         )
 
         # Sort lines by y of blocks
@@ -281,12 +211,9 @@ class AppealDocument:
         # Combine bullet points and lines
         lines = lines.combine_bullet_spans()
 
-        # Add text_base
-        lines['text_base'] = lines['text']\
-            .str.replace(r'[^A-Za-z0-9 ]+', ' ', regex=True)\
-            .str.replace(' +', ' ', regex=True)\
-            .str.lower()\
-            .str.strip()
+        # Add text_base, and text_key to match titles
+        lines['text_base'] = normalization.text_base(lines['text'])
+        lines['text_key'] = normalization.text_key(lines['text_base'])
 
         # Remove photo blocks, page numbers, references
         lines = self.remove_photo_blocks(lines=lines)
@@ -319,156 +246,69 @@ class AppealDocument:
         """
         Remove page numbers from page headers and footers.
         Assumes headers and footers are the vertically highest and lowest elements on the page.
+        On each page, blocks are checked from the top (headers) or bottom (footers), dropping lines which are page labels or references,
+        until a block with other lines is found. For footers, whole blocks which are page labels or references are also dropped.
         """
+        block_keys = ['page_number', 'block_number']
+        line_keys = block_keys+['line_number']
         for option in ['headers', 'footers']:
 
             # For each page, get the order of the blocks by vertical y distance
-            ordered_blocks_by_page = lines\
+            ordered_blocks = lines\
                 .sort_values(
                     by=['page_number', 'origin_y'],
                     ascending=[True, (True if option == 'headers' else False)]
-                )\
-                .groupby('page_number')['block_number'].unique()
-
-            # Loop through pages
-            for page_number, block_numbers in ordered_blocks_by_page.items():
-                page_lines = lines.loc[lines['page_number'] == page_number]
-
-                # Loop through blocks and remove page labels and references
-                for block_number in block_numbers:
-
-                    block = page_lines.loc[page_lines['block_number'] == block_number]
-
-                    # Check if the whole block is a page label or reference
-                    # only for footers otherwise risk of dropping too much
-                    if option == 'footers':
-                        if block.is_page_label() or block.is_reference():
-                            lines.drop(labels=block.index, inplace=True)
-                            continue
-
-                    # Loop through lines and remove page numbers and references
-                    lines_page_label_or_reference = block.groupby(['line_number']).apply(
-                        lambda block_lines:
-                            block_lines.is_page_label() or block_lines.is_reference()
-                    )
-                    block_lines_to_drop = block.loc[
-                        block['line_number'].isin(lines_page_label_or_reference[lines_page_label_or_reference].index)
-                    ]
-                    lines.drop(labels=block_lines_to_drop.index, inplace=True)
-                    if lines_page_label_or_reference.all():
-                        continue
-
-                    break
+                )[block_keys]\
+                .dropna()\
+                .drop_duplicates()\
+                .set_index(block_keys)\
+                .index
+
+            # Check which lines are page labels or references, and whether all lines of each block are
+            lines_page_label_or_reference = lines.page_labels_references(by=line_keys)
+            all_lines_page_label_or_reference = lines_page_label_or_reference\
+                .groupby(level=block_keys).all()\
+                .reindex(ordered_blocks, fill_value=True)
+
+            # Check if the whole block is a page label or reference
+            # only for footers otherwise risk of dropping too much
+            if option == 'footers':
+                blocks_page_label_or_reference = lines.page_labels_references(by=block_keys).reindex(ordered_blocks)
+            else:
+                blocks_page_label_or_reference = pd.Series(False, index=ordered_blocks)
+
+            # Blocks are checked until the first block with lines which are not page labels or references (included)
+            stop = ~(blocks_page_label_or_reference | all_lines_page_label_or_reference)
+            checked = (stop.groupby(level='page_number').cumsum() - stop) == 0
+            blocks_to_drop = ordered_blocks[checked & blocks_page_label_or_reference]
+            blocks_to_check_lines = ordered_blocks[checked & ~blocks_page_label_or_reference]
+            lines_to_drop = lines_page_label_or_reference[lines_page_label_or_reference].index
+            lines_to_drop = lines_to_drop[lines_to_drop.droplevel('line_number').isin(blocks_to_check_lines)]
+
+            # Drop all at once
+            drop = (
+                pd.MultiIndex.from_frame(lines[block_keys]).isin(blocks_to_drop) |
+                pd.MultiIndex.from_frame(lines[line_keys]).isin(lines_to_drop)
+            )
+            lines = lines.loc[~drop]
 
         return lines
 
     def drop_all_repeating_headers_footers(self, lines):
         """
         Drop all repeating headers and footers.
-        Run until there are no more repeating headers or footers.
-        """
-        # Drop header blocks
-        while True:
-            repeating_blocks = self.get_repeating_blocks(which='top', lines=lines)
-            if repeating_blocks.empty:
-                break
-            lines = lines.drop(repeating_blocks['index'].explode())
-
-        # Drop header lines
-        while True:
-            repeating_lines = self.get_repeating_lines(which='top', lines=lines)
-            if repeating_lines.empty:
-                break
-            lines = lines.drop(repeating_lines['index'].explode())
-
-        # Drop footer blocks
-        while True:
-            repeating_blocks = self.get_repeating_blocks(which='bottom', lines=lines)
-            if repeating_blocks.empty:
-                break
-            lines = lines.drop(repeating_blocks['index'].explode())
-
-        # Drop footer lines
-        while True:
-            repeating_lines = self.get_repeating_lines(which='bottom', lines=lines)
-            if repeating_lines.empty:
-                break
-            lines = lines.drop(repeating_lines['index'].explode())
-
-        return lines
-
-    def get_repeating_blocks(self, which, lines):
+        Run until there are no more repeating headers or footers: header blocks, header lines, footer blocks, then footer lines.
         """
-        Drop any repeating elements at the top or bottom of pages.
-        """
-        # Get spans in blocks at top of each page
         lines['page_block'] = lines['page_number'].astype(str)+'_'+lines['block_number'].astype(str)
 
-        # Get the top and bottom blocks on each page
-        if which == 'top':
-            page_blocks = lines.loc[lines.groupby(['page_number'])['origin_y'].idxmin()]
-        elif which == 'bottom':
-            page_blocks = lines.loc[lines.groupby(['page_number'])['origin_y'].idxmax()]
-        else:
-            raise RuntimeError('Unrecognised value for "which", should be "top" or "bottom"')
-
-        # Get repeating texts
-        elements = lines.loc[lines['page_block'].isin(page_blocks['page_block'].unique())]
-        elements = elements\
-            .reset_index()\
-            .groupby(['page_number'])\
-            .agg({'text_base': lambda x: ' '.join(x), 'index': tuple})
-        elements = elements.loc[elements['text_base'].astype(bool)]
-        repeating_texts = elements\
-            .groupby(['text_base'])\
-            .filter(lambda x: len(x) > 2)
-
-        # Don't remove lessons learned or challenges titles
-        section_title_texts = ChallengesLessonsLearnedExtractor().title_texts()
-        repeating_texts = repeating_texts.loc[~(
-            repeating_texts['text_base']
-            .str.replace(r'[^A-Za-z ]+', ' ', regex=True)
-            .str.strip()
-            .apply(utils.remove_filler_words)
-            .isin(section_title_texts)
-        )]
-
-        return repeating_texts
-
-    def get_repeating_lines(self, which, lines):
-        """
-        """
-        # Get the top and bottom lines on each page
-        if which == 'top':
-            page_lines = lines.loc[lines.groupby(['page_number'])['origin_y'].idxmin()]
-        elif which == 'bottom':
-            page_lines = lines.loc[lines.groupby(['page_number'])['origin_y'].idxmax()]
-        else:
-            raise RuntimeError('Unrecognised value for "which", should be "top" or "bottom"')
-
-        # Get repeating texts
-        page_lines = page_lines.loc[page_lines['text_base'].astype(bool)]
-        repeating_texts = page_lines\
-            .reset_index()\
-            .groupby(['text_base'])\
-            .filter(lambda x: len(x) > 2)
-
-        # Don't remove lessons learned or challenges titles
-        section_title_texts = ChallengesLessonsLearnedExtractor().title_texts()
-        repeating_texts = repeating_texts.loc[~(
-            repeating_texts['text_base']
-            .str.replace(r'[^A-Za-z ]+', ' ', regex=True)
-            .str.strip()
-            .apply(utils.remove_filler_words)
-            .isin(section_title_texts)
-        )]
-
-        # Don't remove bullets
-        repeating_texts = repeating_texts.loc[~(
-            repeating_texts['text'].str.strip().isin(ea_parsing.definitions.BULLETS)
-        )]
+        # Rows are tracked by position, so the index does not need to be unique
+        page_edges = PageEdges(lines=lines, title_matcher=get_title_matcher())
+        page_edges.drop_repeating(which='top', element='block')
+        page_edges.drop_repeating(which='top', element='line')
+        page_edges.drop_repeating(which='bottom', element='block')
+        page_edges.drop_repeating(which='bottom', element='line')
 
-        return repeating_texts
+        return lines.loc[~page_edges.removed]
 
     def remove_reference_labels(self, lines):
         """
@@ -519,16 +359,7 @@ class AppealDocument:
             ]
 
         # Get a score representing how "sector titley" it is
-        sectors = Sectors()
-        sector_titles[['Sector title', 'Sector similarity score']] = sector_titles.apply(
-            lambda row:
-                None if row['text'] != row['text'] else
-                pd.Series(
-                    sectors.get_similar_sector(
-                        row['text']
-                    )
-                ), axis=1
-            )
+        sector_titles[['Sector title', 'Sector similarity score']] = get_sectors().match(sector_titles['text'])
 
         # Filter to only where the score is >= 0.5
         sector_titles = sector_titles.loc[sector_titles['Sector similarity score'] >= 0.5]
@@ -0,0 +1,101 @@
+"""
+Run blocking functions in an executor outside the asyncio event loop, with a limit on the number of tasks running or queued.
+
+This module is copied, identical, in dref_parsing, dref_tagging and ea_parsing: the packages are installed and deployed
+independently (each has its own setup.py, requirements and Dockerfile), so none of them can import it from another.
+Keep the copies identical (checked by ea_parsing/tests/test_shared_modules.py). The executors of each package are in its executors.py.
+"""
+import asyncio
+import functools
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+
+class ExecutorSaturated(Exception):
+    """
+    All workers are busy and the queue of the executor is full.
+    """
+
+
+class BoundedExecutor:
+    def __init__(self, create_executor, max_pending):
+        """
+        Run functions in an executor outside the event loop, with a limit on the number of tasks running or queued.
+        When the limit is reached, ExecutorSaturated is raised (the APIs answer 503), instead of queueing tasks without bounds.
+
+        Parameters
+        ----------
+        create_executor : function (required)
+            Function without arguments that creates the concurrent.futures executor. Called on first use.
+
+        max_pending : int (required)
+            Maximum number of tasks running or queued. Further tasks raise ExecutorSaturated.
+        """
+        self.create_executor = create_executor
+        self.max_pending = max_pending
+        self.pending = 0
+        self._executor = None
+        self._lock = threading.Lock()
+
+    @property
+    def executor(self):
+        """
+        Get the executor, creating it on first use.
+        """
+        with self._lock:
+            if self._executor is None:
+                self._executor = self.create_executor()
+            return self._executor
+
+    async def run(self, func, *args, **kwargs):
+        """
+        Run func(*args, **kwargs) in the executor without blocking the event loop.
+        Raises ExecutorSaturated straight away if max_pending tasks are running or queued.
+        """
+        with self._lock:
+            if self.pending >= self.max_pending:
+                raise ExecutorSaturated(f'{self.pending} tasks are running or queued')
+            self.pending += 1
+        try:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self.executor, functools.partial(func, *args, **kwargs))
+        except BrokenProcessPool:
+            # A worker process died (e.g. out of memory): start a new pool for the next tasks
+            with self._lock:
+                self._executor = None
+            raise
+        finally:
+            with self._lock:
+                self.pending -= 1
+
+    def run_sync(self, func, *args, **kwargs):
+        """
+        Run func(*args, **kwargs) in the executor from a thread outside the event loop (e.g. a background job), and wait for the result.
+        Counts towards the same max_pending limit as run, and raises ExecutorSaturated straight away in the same way.
+        """
+        with self._lock:
+            if self.pending >= self.max_pending:
+                raise ExecutorSaturated(f'{self.pending} tasks are running or queued')
+            self.pending += 1
+        try:
+            return self.executor.submit(func, *args, **kwargs).result()
+        except BrokenProcessPool:
+            # A worker process died (e.g. out of memory): start a new pool for the next tasks
+            with self._lock:
+                self._executor = None
+            raise
+        finally:
+            with self._lock:
+                self.pending -= 1
+
+
+def process_pool(max_workers):
+    """
+    Get a function creating a process pool. Processes are spawned, so they don't inherit threads and connections of the API process.
+    """
+    return lambda: ProcessPoolExecutor(
+        max_workers=max_workers,
+        mp_context=multiprocessing.get_context('spawn')
+    )
@@ -0,0 +1,15 @@
+import os
+from ea_parsing.bounded_executor import BoundedExecutor, ExecutorSaturated, process_pool
+
+__all__ = ['ExecutorSaturated', 'parsing_workers', 'parsing_executor']
+
+
+# Parsing (downloads and PyMuPDF) is blocking and CPU-bound, so run it in worker processes.
+# Set by environment variables EA_PARSING_WORKERS (default: number of CPUs, at most 4)
+# and EA_PARSING_MAX_PENDING (default: 2 x number of workers).
+parsing_workers = int(os.environ.get('EA_PARSING_WORKERS', min(4, os.cpu_count() or 1)))
+parsing_executor = BoundedExecutor(
+    process_pool(parsing_workers),
+    max_pending=int(os.environ.get('EA_PARSING_MAX_PENDING', 2*parsing_workers))
+)
+
@@ -1,10 +1,33 @@
 """
 """
-from functools import cached_property
+from functools import cached_property, lru_cache
 import numpy as np
 import pandas as pd
 import ea_parsing.definitions
-from ea_parsing.utils import generate_sentence_variations, remove_filler_words
+from ea_parsing.utils import generate_sentence_variations
+from ea_parsing.normalization import TitleMatcher
+
+
+@lru_cache(maxsize=None)
+def get_title_matcher(section_type=None):
+    """
+    Get the matcher of "Lessons Learned" or "Challenges" title texts (both if section_type is None), including abbreviations.
+    Title variations are generated from the definitions once per process.
+    """
+    # Get title definitions and abbreviations
+    section_titles_details = ea_parsing.definitions.LESSONS_LEARNED_TITLES
+    section_types = ['lessons_learned', 'challenges'] if section_type is None else [section_type]
+
+    # Get all possible title variations, considering abbreviations
+    title_texts = []
+    for section_type in section_types:
+        for title in section_titles_details.get(f'{section_type}_titles'):
+            title_texts += generate_sentence_variations(
+                sentence=title,
+                abbreviations=section_titles_details['abbreviations']
+            )
+
+    return TitleMatcher(titles=title_texts)
 
 
 class ChallengesLessonsLearnedExtractor:
@@ -19,44 +42,11 @@ class ChallengesLessonsLearnedExtractor:
             if section_type not in ['challenges', 'lessons_learned']:
                 raise ValueError("'section_type' must be 'challenges' or 'lessons_learned'")
 
-    @cached_property
-    def _title_texts_dict(self):
-        """
-        Get the title texts, including abbreviations.
-        """
-        # Get title definitions and abbreviations
-        section_titles_details = ea_parsing.definitions.LESSONS_LEARNED_TITLES
-
-        # Get all possible title variations, considering abbreviations
-        title_texts = {'lessons_learned': [], 'challenges': []}
-        for section_type in title_texts:
-            section_titles = section_titles_details.get(f'{section_type}_titles')
-            for title in section_titles:
-                title_texts[section_type] += generate_sentence_variations(
-                    sentence=title,
-                    abbreviations=section_titles_details['abbreviations']
-                )
-
-        # Remove filler words from titles
-        for section_type in title_texts:
-            title_texts[section_type] = list(set([
-                remove_filler_words(x)
-                for x in title_texts[section_type]
-            ]))
-
-        return title_texts
-
     def title_texts(self, section_type=None):
         """
         Return a list of lessons learned title texts and challenges title texts, without repititions.
         """
-        if section_type is None:
-            return list(set(
-                self._title_texts_dict['lessons_learned'] +
-                self._title_texts_dict['challenges']
-            ))
-        else:
-            return self._title_texts_dict[section_type]
+        return list(get_title_matcher(section_type).titles)
 
     @cached_property
     def section_titles(self):
@@ -64,11 +54,7 @@ class ChallengesLessonsLearnedExtractor:
         Get section titles
         """
         section_titles = self.document.titles.loc[
-            self.document.titles['text_base']
-                .str.replace(r'[^A-Za-z ]+', ' ', regex=True)
-                .str.strip()
-                .apply(remove_filler_words)
-                .isin(self.title_texts(self.section_type))
+            get_title_matcher(self.section_type).is_title_key(self.document.titles['text_key'])
         ]
         return section_titles
 
@@ -200,7 +186,7 @@ class ChallengesLessonsLearnedExtractor:
         sector_title_styles = sectors\
             .reset_index()\
             .rename(columns={'index': 'Sector title indexes'})\
-            .groupby(['style', 'double_fontsize_int'], dropna=False)\
+            .groupby(['style', 'double_fontsize_int'], dropna=False, observed=True)\
             .agg({
                 'text': tuple,
                 'Sector title': tuple,
@@ -392,11 +378,7 @@ class ChallengesLessonsLearnedExtractor:
 
         # Section must end before the next "Lessons Learned" or "Challenges" section
         lessons_learned_challenges_titles = self.document.titles.loc[
-            self.document.titles['text_base']
-                .str.replace(r'[^A-Za-z ]+', ' ', regex=True)
-                .str.strip()
-                .apply(remove_filler_words)
-                .isin(self.title_texts())
+            get_title_matcher().is_title_key(self.document.titles['text_key'])
         ]
         lessons_learned_challenges_titles_after_section = lessons_learned_challenges_titles.drop(title.name).loc[
             lessons_learned_challenges_titles['total_y'] > title['total_y']
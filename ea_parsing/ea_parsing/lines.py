@@ -2,9 +2,10 @@
 """
 import re
 from functools import cached_property
+import numpy as np
 import pandas as pd
 import ea_parsing.definitions
-from ea_parsing import utils
+from ea_parsing import utils, normalization
 
 
 class Line(pd.Series):
@@ -106,10 +107,13 @@ class Lines(pd.DataFrame):
             ('color' in self.columns) and
             ('highlight_color' in self.columns)
         ):
-            self['style'] = self['font'].str.lower().str.split(pat='-', n=1).str[-1].replace({'boldmt': 'bold'})+', ' +\
-                            self['double_fontsize_int'].astype(str)+', ' +\
-                            self['color'].astype(str)+', ' +\
-                            self['highlight_color'].astype(str)
+            # Few distinct styles: stored as a categorical, so group by it with observed=True
+            self['style'] = (
+                self['font'].str.lower().str.split(pat='-', n=1).str[-1].replace({'boldmt': 'bold'})+', ' +
+                self['double_fontsize_int'].astype(str)+', ' +
+                self['color'].astype(str)+', ' +
+                self['highlight_color'].astype(str)
+            ).astype('category')
 
     @property
     def _constructor(self):
@@ -138,21 +142,14 @@ class Lines(pd.DataFrame):
         """
         lines = self.copy()
 
-        # Don't merge rows which have text in exclude_texts (ignoring case etc)
+        # Don't merge rows which have text in exclude_texts (list of texts or normalization.TitleMatcher, ignoring case etc)
         lines['ignore'] = False
         if exclude_texts is not None:
-            exclude_texts = [utils.remove_filler_words(utils.strip_non_alphanumeric(item)) for item in exclude_texts]
-            lines['text_base'] = lines['text']\
-                .str.replace(r'[^A-Za-z0-9 ]+', ' ', regex=True)\
-                .str.replace(' +', ' ', regex=True)\
-                .str.lower()\
-                .str.strip()
+            if not isinstance(exclude_texts, normalization.TitleMatcher):
+                exclude_texts = normalization.TitleMatcher(titles=exclude_texts)
+            lines['text_base'] = normalization.text_base(lines['text'])
             exclude_indexes = lines.loc[
-                lines['text_base']
-                .str.replace(r'[^A-Za-z ]+', ' ', regex=True)
-                .str.strip()
-                .apply(utils.remove_filler_words)
-                .isin(exclude_texts)
+                exclude_texts.is_title(lines['text_base'])
             ].index
             lines.loc[exclude_indexes, 'ignore'] = True
             lines.loc[
@@ -207,7 +204,7 @@ class Lines(pd.DataFrame):
         """
         lines = self.copy()
         lines['text'] = lines\
-            .groupby(['page_number', 'block_number', 'line_number', 'style'])['text']\
+            .groupby(['page_number', 'block_number', 'line_number', 'style'], observed=True)['text']\
             .transform(lambda x: ' '.join([txt for txt in x if txt == txt]))
         lines = lines.drop_duplicates(subset=['page_number', 'block_number', 'line_number', 'style', 'text'])
 
@@ -217,33 +214,51 @@ class Lines(pd.DataFrame):
         """
         Sometimes, bullet points are listed as separate lines than the text which follows them.
         Combine these onto the same line, with different span numbers.
+        Each bullet is joined to the first text at the same height in the same block, which starts a different line.
+        If several bullets are at the same height in a block, only the first one is joined to the text.
+        Rows are tracked by position, so the index does not need to be unique.
         """
         lines = self.copy()
+        keys = ['page_number', 'block_number', 'total_y']
 
-        # Get bullets: span zero, bullet character
-        bullets = lines.loc[
+        # Get bullets: span zero, bullet character. Keep the first bullet at each height in a block
+        is_bullet = (
             (lines['text'].str.strip().isin(ea_parsing.definitions.BULLETS)) &
             (lines['span_number'] == 0)
-        ]
-
-        # Loop through bullets and put bullet item text on the same line_number
-        for i, bullet in bullets.iterrows():
-            bullet_block = lines.loc[
-                (lines['page_number'] == bullet['page_number']) &
-                (lines['block_number'] == bullet['block_number'])
-            ]
-            bullet_line = bullet_block.loc[
-                (lines['line_number'] == bullet['line_number'])
-            ]
-            text_at_bullet_level = bullet_block.loc[
-                (lines['line_number'] != bullet['line_number']) &
-                (lines['span_number'] == 0) &
-                (lines['total_y'] == bullet['total_y'])
-            ]
-            if not text_at_bullet_level.empty:
-                first_text_at_bullet_level = text_at_bullet_level.index[0]
-                lines.loc[first_text_at_bullet_level, 'line_number'] = bullet['line_number']
-                lines.loc[first_text_at_bullet_level, 'span_number'] = bullet_line['span_number'].max() + 1
+        ).to_numpy()
+        bullets = lines.loc[is_bullet, keys+['line_number']]
+        bullets['bullet_row'] = np.flatnonzero(is_bullet)
+        bullets = bullets.dropna(subset=keys).drop_duplicates(subset=keys, keep='first')
+
+        # Texts at bullet level: span zero at the same height in the same block as a bullet, on a different line
+        is_text = ((lines['span_number'] == 0).to_numpy()) & (~is_bullet)
+        texts = lines.loc[is_text, keys+['line_number']]
+        texts['row'] = np.flatnonzero(is_text)
+        texts = texts.dropna(subset=keys)
+        texts = texts.merge(bullets, on=keys, suffixes=('', '_bullet'))
+        texts = texts.loc[texts['line_number'] != texts['line_number_bullet']]
+        if texts.empty:
+            return lines
+
+        # First text for each bullet
+        texts = texts.sort_values(by='row').drop_duplicates(subset=keys, keep='first')
+
+        # Put the text on the bullet line, after the last span of the line.
+        # Texts of several bullets on the same line follow each other, in the order of the bullets
+        line_max_span = lines\
+            .groupby(['page_number', 'block_number', 'line_number'])['span_number'].max()\
+            .rename('max_span_number')
+        texts = texts.merge(
+            line_max_span,
+            left_on=['page_number', 'block_number', 'line_number_bullet'],
+            right_index=True,
+            how='left'
+        ).sort_values(by='bullet_row')
+        span_numbers = texts['max_span_number'] + 1 + \
+            texts.groupby(['page_number', 'block_number', 'line_number_bullet']).cumcount()
+        rows = texts['row'].to_numpy()
+        lines.iloc[rows, lines.columns.get_loc('line_number')] = texts['line_number_bullet'].to_numpy()
+        lines.iloc[rows, lines.columns.get_loc('span_number')] = span_numbers.to_numpy().astype(lines['span_number'].dtype)
 
         return lines
 
@@ -295,6 +310,54 @@ class Lines(pd.DataFrame):
 
         return False
 
+    def page_labels_references(self, by):
+        """
+        For each group of lines by the columns in by, check if the group is a page label or a reference.
+        Same as is_page_label() or is_reference() on each group, computed for all groups at once.
+
+        Parameters
+        ----------
+        by : list (required)
+            Columns to group the lines by, e.g. ['page_number', 'block_number'].
+        """
+        groups = self[by].dropna().drop_duplicates().set_index(by).index
+        lines = self\
+            .dropna(subset=['text_base'])\
+            .sort_values(by=by+['line_number', 'span_number'])\
+            .reset_index(drop=True)
+        if lines.empty:
+            return pd.Series(False, index=groups, dtype=bool)
+
+        # Features of each line
+        text = lines['text_base'].astype(str)
+        has_chars = text.str.contains('[a-z]')
+        features = lines[by].copy()
+        features['is_digit'] = text.str.isdigit()
+        features['starts_with_page'] = text.str.startswith('page').where(has_chars)
+        features['only_page_numbers'] = ~has_chars | (
+            text.str.replace(r'[0-9]', '', regex=True).str.replace('page', '', regex=False).str.strip() == ''
+        )
+        features['size'] = lines['size']
+
+        # Features of each group, and of its first and second lines
+        grouped = features.groupby(by)
+        position = grouped.cumcount()
+        first = features.loc[position == 0].set_index(by)
+        second = features.loc[position == 1].set_index(by)
+        n_lines = grouped.size()
+        starts_with_page = grouped['starts_with_page'].first().reindex(n_lines.index).fillna(False).astype(bool)
+        only_page_numbers = grouped['only_page_numbers'].all()
+        first_is_digit = first['is_digit'].reindex(n_lines.index)
+        size_increase = (second['size'] - first['size']).reindex(n_lines.index)
+
+        # Page label: starts with "page", is a single number, or only contains "page" and numbers
+        is_page_label = starts_with_page | ((n_lines == 1) & first_is_digit) | only_page_numbers
+
+        # Reference: starts with a number, followed by larger text
+        is_reference = first_is_digit & ((n_lines == 1) | (size_increase >= 1))
+
+        return (is_page_label | is_reference).reindex(groups, fill_value=False).astype(bool)
+
     @cached_property
     def is_nothing(self):
         """
@@ -1,6 +1,7 @@
-from fastapi import FastAPI, Query
+from fastapi import FastAPI, Query, HTTPException
 import pandas as pd
 from ea_parsing.appeal_document import Appeal
+from ea_parsing.executors import parsing_executor, ExecutorSaturated
 
 app = FastAPI()
 
@@ -19,6 +20,26 @@ async def run_parsing(
     """
     </ul>
     """
+    # Parse in a worker process, so that the event loop keeps serving other requests
+    try:
+        return await parsing_executor.run(parse_appeal, mdr_code=mdr_code)
+    except ExecutorSaturated:
+        raise HTTPException(
+            status_code=503,
+            detail="All parsing workers are busy, please try again later",
+            headers={'Retry-After': '30'}
+        )
+
+
+def parse_appeal(mdr_code):
+    """
+    Get the lessons learned and challenges from the final report of an appeal, in the same format as DREF_parsing.
+
+    Parameters
+    ----------
+    mdr_code : string (required)
+        MDR code of the appeal, e.g. MDRNG037.
+    """
     # Get appeal final report
     appeal = Appeal(mdr_code=mdr_code)
     final_report = appeal.final_report
@@ -0,0 +1,113 @@
+"""
+Text normalization, to compare texts ignoring case, non-alphanumeric characters and filler words.
+Patterns are compiled once, and there are Series versions of the functions to normalize all lines of a document at once:
+
+  text_base: non-alphanumeric characters replaced with spaces, lower case, e.g. "1. lessons learned"
+  text_key:  text_base with only letters and without filler words, e.g. "lessons learned", to match titles
+"""
+import re
+from functools import lru_cache
+
+NON_ALPHANUMERIC_REGEX = re.compile(r'[^A-Za-z0-9 ]+')
+NON_ALPHA_REGEX = re.compile(r'[^A-Za-z ]+')
+SPACES_REGEX = re.compile(' +')
+
+FILLER_WORDS = ['and', 'the', 'to', 'for', 'in', 'a', 'or', 'key']
+FILLER_WORDS_REGEX = re.compile(r"\b(?:{})\b".format('|'.join(FILLER_WORDS)))
+
+
+@lru_cache(maxsize=None)
+def phrase_regex(phrase):
+    return re.compile(r"\b{}\b".format(phrase))
+
+
+def phrase_in_sentence(phrase, sentence):
+    if phrase_regex(phrase).search(sentence.lower().strip()):
+        return True
+    return False
+
+
+def replace_phrases_in_sentence(phrases, repl, sentence):
+    replaced = sentence.lower().strip()
+    if isinstance(phrases, str):
+        phrases = [phrases]
+    for phrase in phrases:
+        replaced = phrase_regex(phrase).sub(repl, replaced)
+    replaced = SPACES_REGEX.sub(' ', replaced)
+    return replaced
+
+
+def strip_non_alpha(text):
+    text = NON_ALPHA_REGEX.sub(' ', text)
+    text = SPACES_REGEX.sub(' ', text)
+    return text.strip()
+
+
+def strip_non_alphanumeric(text):
+    text = NON_ALPHANUMERIC_REGEX.sub(' ', text)
+    text = SPACES_REGEX.sub(' ', text)
+    return text.strip()
+
+
+def remove_filler_words(text):
+    if text != text:
+        return
+    text_without_fillers = FILLER_WORDS_REGEX.sub('', str(text).lower().strip())
+    text_without_fillers = SPACES_REGEX.sub(' ', text_without_fillers).strip()
+    return text_without_fillers
+
+
+def remove_filler_words_series(texts):
+    """
+    Remove filler words from a Series of texts, the same as remove_filler_words for each text.
+    """
+    return texts\
+        .str.lower()\
+        .str.strip()\
+        .str.replace(FILLER_WORDS_REGEX, '', regex=True)\
+        .str.replace(SPACES_REGEX, ' ', regex=True)\
+        .str.strip()
+
+
+def text_base(texts):
+    """
+    Get the base text of a Series of texts: non-alphanumeric characters replaced with spaces, in lower case.
+    """
+    return texts\
+        .str.replace(NON_ALPHANUMERIC_REGEX, ' ', regex=True)\
+        .str.replace(SPACES_REGEX, ' ', regex=True)\
+        .str.lower()\
+        .str.strip()
+
+
+def text_key(texts):
+    """
+    Get the key of a Series of texts (or base texts) to match titles: only letters, in lower case, without filler words.
+    """
+    return remove_filler_words_series(texts.str.replace(NON_ALPHA_REGEX, ' ', regex=True))
+
+
+class TitleMatcher:
+    def __init__(self, titles):
+        """
+        Match texts to titles, ignoring case, non-letter characters and filler words.
+        Titles are normalized once, and texts are matched as a Series with the text keys (see text_key) and a set lookup.
+
+        Parameters
+        ----------
+        titles : list (required)
+            Title texts, e.g. "Lessons learned".
+        """
+        self.titles = set(remove_filler_words(strip_non_alphanumeric(title)) for title in titles)
+
+    def is_title(self, texts):
+        """
+        Check which texts of a Series are titles, returning a boolean Series.
+        """
+        return self.is_title_key(text_key(texts))
+
+    def is_title_key(self, text_keys):
+        """
+        Check which text keys of a Series (see text_key) are titles, returning a boolean Series.
+        """
+        return text_keys.isin(self.titles)
@@ -0,0 +1,134 @@
+from collections import Counter, defaultdict
+import numpy as np
+import pandas as pd
+import ea_parsing.definitions
+
+
+class PageEdges:
+    def __init__(self, lines, title_matcher):
+        """
+        Find repeating headers and footers: elements at the top or bottom of at least three pages with the same text.
+        Elements are peeled from the pages layer by layer, keeping the order of the lines on each page, so that only pages which changed are updated.
+
+        Parameters
+        ----------
+        lines : ea_parsing.lines.Lines (required)
+            Document lines, with page_block (page and block number) and text_base columns.
+
+        title_matcher : ea_parsing.normalization.TitleMatcher (required)
+            Matcher of section titles, which are never removed (see lessons_learned_extractor.get_title_matcher).
+        """
+        self.text = lines['text'].tolist()
+        self.text_base = lines['text_base'].tolist()
+        self.removed = np.zeros(len(lines), dtype=bool)
+        self.title_matcher = title_matcher
+        self._is_title = {}
+
+        # Rows of each block, in document order
+        self.block = lines['page_block'].tolist()
+        self.block_rows = defaultdict(list)
+        for row, block in enumerate(self.block):
+            self.block_rows[block].append(row)
+
+        # Rows of each page by vertical position, first row in document order if equal
+        # (the same as idxmin and idxmax of origin_y on each page). Stored in reverse, so the edge row is last
+        positions = lines[['page_number', 'origin_y']].reset_index(drop=True).dropna()
+        self.page_rows = {}
+        for which, ascending in [('top', True), ('bottom', False)]:
+            ordered = positions\
+                .assign(row=positions.index)\
+                .sort_values(by=['page_number', 'origin_y', 'row'], ascending=[True, ascending, True])
+            self.page_rows[which] = {
+                page_number: rows.tolist()[::-1]
+                for page_number, rows in ordered.groupby('page_number', sort=False)['row']
+            }
+
+    def titles(self, texts):
+        """
+        Get the texts which are section titles, e.g. "Lessons learned". Texts are only matched once.
+        """
+        new_texts = [text for text in texts if text not in self._is_title]
+        if new_texts:
+            self._is_title.update(zip(new_texts, self.title_matcher.is_title(pd.Series(new_texts, dtype=object))))
+        return {text for text in texts if self._is_title[text]}
+
+    def edge_row(self, which, page_number):
+        """
+        Get the top or bottom row of the page which has not been removed, or None.
+        """
+        rows = self.page_rows[which][page_number]
+        while rows and self.removed[rows[-1]]:
+            rows.pop()
+        return rows[-1] if rows else None
+
+    def block_text(self, block):
+        """
+        Text of the rows of a block which have not been removed.
+        """
+        return ' '.join(self.text_base[row] for row in self.block_rows[block] if not self.removed[row])
+
+    def edge_element(self, which, element, page_number):
+        """
+        Get the top or bottom element (block or line) of the page as (rows, text), or None.
+        """
+        row = self.edge_row(which, page_number)
+        if row is None:
+            return None
+        if element == 'block':
+            block = self.block[row]
+            return [row for row in self.block_rows[block] if not self.removed[row]], self.block_text(block)
+        return [row], self.text_base[row]
+
+    def drop_repeating(self, which, element):
+        """
+        Remove repeating elements (blocks or lines) from the top or bottom of the pages, until there are no more.
+        All pages are peeled at the same time, so a text may start repeating once other pages are peeled.
+
+        Parameters
+        ----------
+        which : string (required)
+            Either 'top' or 'bottom'.
+
+        element : string (required)
+            Either 'block' or 'line'.
+        """
+        if which not in ['top', 'bottom']:
+            raise RuntimeError('Unrecognised value for "which", should be "top" or "bottom"')
+
+        # Current edge element of each page, and number of pages with each text
+        edges = {}
+        counts = Counter()
+        for page_number in self.page_rows[which]:
+            edges[page_number] = self.edge_element(which, element, page_number)
+
+        def count(page_number, sign):
+            edge = edges[page_number]
+            if (edge is not None) and isinstance(edge[1], str) and edge[1]:
+                counts[edge[1]] += sign
+
+        for page_number in edges:
+            count(page_number, 1)
+
+        while True:
+            # Texts on more than two pages, except section titles
+            repeating_texts = {text for text, n in counts.items() if n > 2}
+            repeating_texts -= self.titles(repeating_texts)
+            pages = [
+                page_number for page_number, edge in edges.items()
+                if (edge is not None) and (edge[1] in repeating_texts)
+            ]
+
+            # Remove the elements, but not bullets
+            rows_to_remove = [
+                row for page_number in pages for row in edges[page_number][0]
+                if (element == 'block') or (self.text[row].strip() not in ea_parsing.definitions.BULLETS)
+            ]
+            if not rows_to_remove:
+                break
+            self.removed[rows_to_remove] = True
+
+            # Update the pages which changed
+            for page_number in pages:
+                count(page_number, -1)
+                edges[page_number] = self.edge_element(which, element, page_number)
+                count(page_number, 1)
@@ -0,0 +1,223 @@
+import os
+import tempfile
+import threading
+import multiprocessing
+from concurrent.futures.process import BrokenProcessPool
+import fitz
+import numpy as np
+import pandas as pd
+from ea_parsing.spatial_index import RectIndex
+from ea_parsing.bounded_executor import process_pool
+
+
+# Columns of the extracted spans and their types.
+# Coordinates are float32, as in PyMuPDF, so no precision is lost. total_y is the position in the whole document, so float64.
+SPAN_COLUMNS = {
+    'text': object,
+    'font': object,
+    'size': np.float64,
+    'flags': np.int16,
+    'color': object,
+    'bold': bool,
+    'highlight_color': object,
+    'page_number': np.int16,
+    'block_number': np.int16,
+    'line_number': np.int16,
+    'span_number': np.int16,
+    'origin_x': np.float32,
+    'origin_y': np.float32,
+    'total_y': np.float64,
+    'img': bool,
+    'bbox_x1': np.float32,
+    'bbox_y1': np.float32,
+    'bbox_x2': np.float32,
+    'bbox_y2': np.float32,
+}
+# Columns with few distinct values, stored as categoricals (as is the style derived from them in Lines)
+CATEGORICAL_COLUMNS = ['font', 'color']
+
+# Pages of a document can be extracted in parallel in a pool of worker processes.
+# This is opt-in: set by environment variable EA_PARSING_PAGE_WORKERS (default: 1, pages are extracted in the calling process).
+# The pool is only used in the top-level process, never in worker processes such as the parsing_executor workers of the API,
+# so that pools are not nested. Workers are spawned and import the __main__ module, so scripts which extract documents
+# with more than one page worker must run under an `if __name__ == '__main__':` guard.
+page_workers = int(os.environ.get('EA_PARSING_PAGE_WORKERS', 1))
+_page_pool = None
+_page_pool_lock = threading.Lock()
+
+
+def use_page_pool(n_pages):
+    """
+    Check if the pages of a document should be extracted in the page extraction pool.
+    """
+    return (page_workers > 1) and (n_pages > 1) and (multiprocessing.parent_process() is None)
+
+
+def get_page_pool():
+    """
+    Get the process pool for page extraction, creating it on first use.
+    """
+    global _page_pool
+    with _page_pool_lock:
+        if _page_pool is None:
+            _page_pool = process_pool(page_workers)()
+        return _page_pool
+
+
+def reset_page_pool():
+    """
+    Drop the page extraction pool after a worker process died, so that a new pool is started for the next document.
+    """
+    global _page_pool
+    with _page_pool_lock:
+        if _page_pool is not None:
+            _page_pool.shutdown(wait=False)
+        _page_pool = None
+
+
+def to_span_frame(pages_columns):
+    """
+    Build a DataFrame of spans from the column arrays of the pages (see extract_page_spans), with the types of SPAN_COLUMNS.
+
+    Parameters
+    ----------
+    pages_columns : list (required)
+        Dicts of column arrays, one per page, in page order.
+    """
+    spans = pd.DataFrame({
+        col: np.concatenate([page_columns[col] for page_columns in pages_columns])
+        if pages_columns else np.empty(0, dtype=dtype)
+        for col, dtype in SPAN_COLUMNS.items()
+    })
+    for col in CATEGORICAL_COLUMNS:
+        spans[col] = spans[col].astype('category')
+    return spans
+
+
+def extract_document_spans(pdf_data):
+    """
+    Extract the text spans of all pages of a PDF document, in page order, as a DataFrame (see to_span_frame).
+    Pages are extracted in the calling process, or in parallel in the page extraction pool if page_workers is more than 1 (see use_page_pool).
+
+    Parameters
+    ----------
+    pdf_data : bytes (required)
+        Content of the PDF file.
+    """
+    doc = fitz.open(stream=pdf_data, filetype='pdf')
+
+    # Vertical offset of each page in the document, so pages can be extracted independently
+    page_offsets = []
+    total_y = 0
+    for page_layout in doc:
+        page_offsets.append(total_y)
+        total_y += page_layout.rect.height
+
+    if not use_page_pool(n_pages=len(page_offsets)):
+        return to_span_frame([
+            extract_page_spans(page_layout, page_number=page_number, total_y=page_offsets[page_number])
+            for page_number, page_layout in enumerate(doc)
+        ])
+    doc.close()
+
+    # Workers open the document from a temporary file, so that the PDF content is not sent to every task
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        path = os.path.join(tmp_dir, 'document.pdf')
+        with open(path, 'wb') as f:
+            f.write(pdf_data)
+        try:
+            pages_columns = get_page_pool().map(
+                extract_page_spans_from_file,
+                [path]*len(page_offsets),
+                range(len(page_offsets)),
+                page_offsets
+            )
+            return to_span_frame(list(pages_columns))
+        except BrokenProcessPool:
+            reset_page_pool()
+            raise
+
+
+def extract_page_spans_from_file(path, page_number, total_y):
+    """
+    Extract the text spans of one page of the PDF file at path. Run in the page extraction pool.
+    """
+    with fitz.open(path) as doc:
+        return extract_page_spans(doc[page_number], page_number=page_number, total_y=total_y)
+
+
+def extract_page_spans(page_layout, page_number, total_y):
+    """
+    Extract the text spans of a page, with their styles, highlight colours and positions.
+    Returns a dict of column arrays with the types of SPAN_COLUMNS, one row per span.
+
+    Parameters
+    ----------
+    page_layout : fitz.Page (required)
+        Page of the document.
+
+    page_number : int (required)
+        Number of the page in the document, starting from 0.
+
+    total_y : float (required)
+        Sum of the heights of the previous pages, added to the span y coordinates to get total_y.
+    """
+    # Get drawings to get text highlights
+    coloured_drawings = [
+        drawing
+        for drawing in page_layout.get_drawings()
+        if (drawing['fill'] != (0.0, 0.0, 0.0))
+    ]
+    page_images = page_layout.get_image_info()
+
+    # Spans with their block, line and span numbers
+    blocks = page_layout.get_text("dict", flags=11)["blocks"]
+    page_spans = []
+    for block_number, block in enumerate(blocks):
+        for line_number, line in enumerate(block["lines"]):
+            spans = [span for span in line['spans'] if span['text'].strip()]
+            for span_number, span in enumerate(spans):
+                page_spans.append((block_number, line_number, span_number, span))
+    bboxes = [span['bbox'] for _, _, _, span in page_spans]
+
+    # Get the drawing with the largest overlap with each span (text highlight),
+    # and check if each span is contained in any page images
+    largest_highlights = RectIndex([drawing['rect'] for drawing in coloured_drawings]).largest_overlap(bboxes)
+    spans_in_images = RectIndex([img['bbox'] for img in page_images]).contained_in_any(bboxes)
+
+    columns = {col: np.empty(len(page_spans), dtype=dtype) for col, dtype in SPAN_COLUMNS.items()}
+    for i, ((block_number, line_number, span_number, span), largest_highlight, contains_images) in enumerate(zip(
+        page_spans, largest_highlights, spans_in_images
+    )):
+        highlight_color_hex = None
+        if largest_highlight >= 0:
+            highlight_color = coloured_drawings[largest_highlight]['fill']
+            if highlight_color:
+                highlight_color_hex = '#%02x%02x%02x' % (
+                    int(255*highlight_color[0]),
+                    int(255*highlight_color[1]),
+                    int(255*highlight_color[2])
+                )
+
+        # Fill the columns
+        columns['text'][i] = span['text'].replace('\r', '\n')
+        columns['font'][i] = span['font']
+        columns['size'][i] = span['size']
+        columns['flags'][i] = span['flags']
+        columns['color'][i] = "#%06x" % span['color']
+        columns['bold'][i] = ("black" in span['font'].lower()) or ("bold" in span['font'].lower())
+        columns['highlight_color'][i] = highlight_color_hex
+        columns['page_number'][i] = page_number
+        columns['block_number'][i] = block_number
+        columns['line_number'][i] = line_number
+        columns['span_number'][i] = span_number
+        columns['origin_x'][i] = span['origin'][0]
+        columns['origin_y'][i] = span['origin'][1]
+        columns['total_y'][i] = span['origin'][1]+total_y
+        columns['img'][i] = contains_images
+        columns['bbox_x1'][i] = span['bbox'][0]
+        columns['bbox_y1'][i] = span['bbox'][1]
+        columns['bbox_x2'][i] = span['bbox'][2]
+        columns['bbox_y2'][i] = span['bbox'][3]
+
+    return columns
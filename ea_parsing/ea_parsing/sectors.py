@@ -1,5 +1,16 @@
+from functools import lru_cache
+import pandas as pd
 import ea_parsing.definitions
-from ea_parsing.utils import strip_non_alpha, remove_filler_words, generate_sentence_variations
+from ea_parsing.utils import generate_sentence_variations
+from ea_parsing.normalization import NON_ALPHA_REGEX, SPACES_REGEX, strip_non_alpha, remove_filler_words, remove_filler_words_series
+
+
+@lru_cache(maxsize=None)
+def get_sectors():
+    """
+    Get the sectors with their title variations, generated from the definitions once per process.
+    """
+    return Sectors()
 
 
 class Sectors:
@@ -11,6 +22,15 @@ class Sectors:
             abbreviations=ea_parsing.definitions.ABBREVIATIONS
         )
 
+        # Index the titles, and the titles without filler words.
+        # If a title is in several sectors, the first sector is used
+        self.sector_by_title = {}
+        self.sector_by_title_without_fillers = {}
+        for sector_name, titles in self.sectors.items():
+            for title in titles:
+                self.sector_by_title.setdefault(title, sector_name)
+                self.sector_by_title_without_fillers.setdefault(remove_filler_words(title), sector_name)
+
     def _process_sectors(self, sectors, abbreviations):
         """
         """
@@ -70,15 +90,48 @@ class Sectors:
                     text_base = text_base[len(prefix):].strip()
 
         # First, check if there is an exact match with the titles
-        for sector_name, titles in self.sectors.items():
-            for title in titles:
-                if text_base == title:
-                    return sector_name, 1
+        if text_base in self.sector_by_title:
+            return self.sector_by_title[text_base], 1
 
         # Next, check if the title is any title plus filler words
-        for sector_name, titles in self.sectors.items():
-            for title in titles:
-                if remove_filler_words(text_base) == remove_filler_words(title):
-                    return sector_name, 1
+        sector_name = self.sector_by_title_without_fillers.get(remove_filler_words(text_base))
+        if sector_name is not None:
+            return sector_name, 1
 
         return None, 0
+
+    def match(self, texts):
+        """
+        Get the sector that is most similar to each text, the same as get_similar_sector.
+        Return a DataFrame with columns "Sector title" and "Sector similarity score", with the index of texts. Missing texts have missing values.
+
+        Parameters
+        ----------
+        texts : pandas Series (required)
+            Texts, e.g. titles in the document.
+        """
+        texts_base = texts\
+            .str.replace(NON_ALPHA_REGEX, ' ', regex=True)\
+            .str.replace(SPACES_REGEX, ' ', regex=True)\
+            .str.strip()\
+            .str.lower()
+
+        # Remove any prefix text
+        prefixes = ['strategies for implementation']
+        for prefix in prefixes:
+            has_prefix = texts_base.str.startswith(prefix, na=False) & (texts_base != prefix)
+            texts_base = texts_base.where(~has_prefix, texts_base.str[len(prefix):].str.strip())
+
+        # Exact matches with the titles first, then titles plus filler words
+        sector_titles = texts_base.map(self.sector_by_title)
+        sector_titles = sector_titles.fillna(
+            remove_filler_words_series(texts_base).map(self.sector_by_title_without_fillers)
+        )
+
+        matches = pd.DataFrame({
+            'Sector title': sector_titles.astype(object).where(sector_titles.notna(), None),
+            'Sector similarity score': sector_titles.notna().astype(float)
+        }, index=texts.index)
+        matches.loc[texts_base.isna(), :] = float('nan')
+
+        return matches
@@ -0,0 +1,120 @@
+import numpy as np
+
+
+class RectIndex:
+    def __init__(self, rects, band_height=20):
+        """
+        Spatial index over the rectangles of a page (e.g. drawings or images), to find the rectangles overlapping or containing many boxes (e.g. text spans) at once.
+        The page is split into horizontal bands, and each rectangle is registered in the bands it crosses. Boxes are only compared with the rectangles in their bands.
+
+        Parameters
+        ----------
+        rects : list (required)
+            Rectangles as (x0, y0, x1, y1), e.g. fitz.Rect.
+
+        band_height : float (default=20)
+            Height of the bands. Text spans usually cross one or two bands.
+        """
+        self.band_height = band_height
+        self.rects = np.array([tuple(rect) for rect in rects], dtype=float).reshape(-1, 4)
+
+        # Band entries of the rectangles, sorted by band, then by rectangle index
+        rect_ids, bands = self._band_entries(self.rects)
+        order = np.lexsort((rect_ids, bands))
+        self.rect_ids = rect_ids[order]
+        self.bands = bands[order]
+
+    def __len__(self):
+        return len(self.rects)
+
+    def _band_entries(self, boxes):
+        """
+        Get (box index, band) for every band that each box crosses.
+        """
+        y = np.clip(boxes[:, [1, 3]], -1e6, 1e6)
+        first = np.floor(y.min(axis=1)/self.band_height).astype(np.int64)
+        last = np.floor(y.max(axis=1)/self.band_height).astype(np.int64)
+        counts = last - first + 1
+        box_ids = np.repeat(np.arange(len(boxes)), counts)
+        bands = np.repeat(first, counts) + self._group_positions(counts)
+        return box_ids, bands
+
+    @staticmethod
+    def _group_positions(counts):
+        """
+        Position within each group, for groups of the given sizes, e.g. [2, 3] -> [0, 1, 0, 1, 2].
+        """
+        return np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+
+    def _candidate_pairs(self, boxes):
+        """
+        Get the pairs (box index, rectangle index) sharing a band, sorted by box and then rectangle.
+        """
+        box_ids, bands = self._band_entries(boxes)
+        start = np.searchsorted(self.bands, bands, side='left')
+        counts = np.searchsorted(self.bands, bands, side='right') - start
+        pairs = np.stack([
+            np.repeat(box_ids, counts),
+            self.rect_ids[np.repeat(start, counts) + self._group_positions(counts)]
+        ], axis=1)
+        # A box and a rectangle may share several bands
+        pairs = np.unique(pairs, axis=0)
+        return pairs[:, 0], pairs[:, 1]
+
+    def _to_boxes(self, bboxes):
+        return np.array([tuple(bbox) for bbox in bboxes], dtype=float).reshape(-1, 4)
+
+    def largest_overlap(self, bboxes):
+        """
+        For each box, get the index of the rectangle with the largest overlap area (same as utils.get_overlap), or -1 if no rectangle overlaps.
+        Only positive overlaps count, and ties go to the first rectangle.
+
+        Parameters
+        ----------
+        bboxes : list (required)
+            Boxes as (x0, y0, x1, y1).
+        """
+        boxes = self._to_boxes(bboxes)
+        largest = np.full(len(boxes), -1, dtype=np.int64)
+        if (len(boxes) == 0) or (len(self.rects) == 0):
+            return largest
+
+        box_ids, rect_ids = self._candidate_pairs(boxes)
+        box, rect = boxes[box_ids], self.rects[rect_ids]
+        dx = np.minimum(box[:, 2], rect[:, 2]) - np.maximum(box[:, 0], rect[:, 0])
+        dy = np.minimum(box[:, 3], rect[:, 3]) - np.maximum(box[:, 1], rect[:, 1])
+        overlap = dx*dy
+        overlapping = (dx >= 0) & (dy >= 0) & (overlap > 0)
+        box_ids, rect_ids, overlap = box_ids[overlapping], rect_ids[overlapping], overlap[overlapping]
+
+        # Sort by box, largest overlap, then first rectangle, and keep the first pair of each box
+        order = np.lexsort((rect_ids, -overlap, box_ids))
+        box_ids, rect_ids = box_ids[order], rect_ids[order]
+        first = np.unique(box_ids, return_index=True)[1]
+        largest[box_ids[first]] = rect_ids[first]
+        return largest
+
+    def contained_in_any(self, bboxes):
+        """
+        For each box, check if it is strictly contained in any of the rectangles (same as utils.contains).
+
+        Parameters
+        ----------
+        bboxes : list (required)
+            Boxes as (x0, y0, x1, y1).
+        """
+        boxes = self._to_boxes(bboxes)
+        contained = np.zeros(len(boxes), dtype=bool)
+        if (len(boxes) == 0) or (len(self.rects) == 0):
+            return contained
+
+        box_ids, rect_ids = self._candidate_pairs(boxes)
+        box, rect = boxes[box_ids], self.rects[rect_ids]
+        inside = (
+            (rect[:, 0] < box[:, 0]) &
+            (rect[:, 1] < box[:, 1]) &
+            (rect[:, 2] > box[:, 2]) &
+            (rect[:, 3] > box[:, 3])
+        )
+        contained[box_ids[inside]] = True
+        return contained
@@ -1,22 +1,7 @@
 import re
 import itertools
 import ea_parsing.definitions
-
-
-def phrase_in_sentence(phrase, sentence):
-    if re.search(r"\b{}\b".format(phrase), sentence.lower().strip()):
-        return True
-    return False
-
-
-def replace_phrases_in_sentence(phrases, repl, sentence):
-    replaced = sentence.lower().strip()
-    if isinstance(phrases, str):
-        phrases = [phrases]
-    for phrase in phrases:
-        replaced = re.sub(r"\b{}\b".format(phrase), repl, replaced)
-    replaced = re.sub(' +', ' ', replaced)
-    return replaced
+from ea_parsing.normalization import phrase_in_sentence, replace_phrases_in_sentence
 
 
 def generate_sentence_variations(sentence, abbreviations):
@@ -76,26 +61,6 @@ def is_text_title(text):
     return False
 
 
-def strip_non_alpha(text):
-    text = re.sub(r'[^A-Za-z ]+', ' ', text)
-    text = re.sub(' +', ' ', text)
-    return text.strip()
-
-
-def strip_non_alphanumeric(text):
-    text = re.sub(r'[^A-Za-z0-9 ]+', ' ', text)
-    text = re.sub(' +', ' ', text)
-    return text.strip()
-
-
-def remove_filler_words(text):
-    if text != text:
-        return
-    filler_words = ['and', 'the', 'to', 'for', 'in', 'a', 'in', 'or', 'key']
-    text_without_fillers = replace_phrases_in_sentence(filler_words, '', str(text)).strip()
-    return text_without_fillers
-
-
 def is_bulleted(text, end=False):
     """
     Check whether the text is a bullet point, i.e. it starts with a bullet point or other format ("a)", "a.", etc.)
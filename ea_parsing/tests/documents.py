@@ -0,0 +1,19 @@
+import fitz
+
+
+def create_document(n_pages=4):
+    """
+    Create a PDF document with a repeating header, footer and page number on every page,
+    body text, and bullet points written separately from the text of the items.
+    """
+    doc = fitz.open()
+    for page_number in range(n_pages):
+        page = doc.new_page(width=595, height=842)
+        page.insert_text((72, 40), 'Emergency appeal operation update', fontname='helv', fontsize=9)
+        page.insert_text((72, 200), f'Body text of page {page_number} about the flood response.', fontname='helv')
+        for item_number, y in enumerate([300, 330]):
+            page.insert_textbox(fitz.Rect(72, y, 85, y+20), '-', fontname='helv', fontsize=11)
+            page.insert_textbox(fitz.Rect(90, y, 500, y+20), f'Item {item_number} on page {page_number}', fontname='helv', fontsize=11)
+        page.insert_text((72, 800), 'International Federation of Red Cross', fontname='helv', fontsize=8)
+        page.insert_text((500, 820), f'Page {page_number+1}', fontname='helv', fontsize=8)
+    return doc.tobytes()
@@ -0,0 +1,208 @@
+import random
+import unittest
+from functools import cached_property
+import pandas as pd
+import ea_parsing.definitions
+from ea_parsing import normalization
+from ea_parsing.lines import Lines
+from ea_parsing.appeal_document import AppealDocument
+from ea_parsing.lessons_learned_extractor import get_title_matcher
+from ea_parsing.page_extraction import extract_document_spans
+from tests.documents import create_document
+
+
+def drop_all_repeating_headers_footers_loop(lines):
+    """
+    Drop all repeating headers and footers, finding them again in the whole document after each drop (the method before AppealDocument.drop_all_repeating_headers_footers).
+    """
+    # Drop header blocks
+    while True:
+        repeating_blocks = get_repeating_blocks(which='top', lines=lines)
+        if repeating_blocks.empty:
+            break
+        lines = lines.drop(repeating_blocks['index'].explode())
+
+    # Drop header lines
+    while True:
+        repeating_lines = get_repeating_lines(which='top', lines=lines)
+        if repeating_lines.empty:
+            break
+        lines = lines.drop(repeating_lines['index'].explode())
+
+    # Drop footer blocks
+    while True:
+        repeating_blocks = get_repeating_blocks(which='bottom', lines=lines)
+        if repeating_blocks.empty:
+            break
+        lines = lines.drop(repeating_blocks['index'].explode())
+
+    # Drop footer lines
+    while True:
+        repeating_lines = get_repeating_lines(which='bottom', lines=lines)
+        if repeating_lines.empty:
+            break
+        lines = lines.drop(repeating_lines['index'].explode())
+
+    return lines
+
+def get_repeating_blocks(which, lines):
+    """
+    Get repeating blocks at the top or bottom of pages.
+    """
+    # Get spans in blocks at top of each page
+    lines['page_block'] = lines['page_number'].astype(str)+'_'+lines['block_number'].astype(str)
+
+    # Get the top and bottom blocks on each page
+    if which == 'top':
+        page_blocks = lines.loc[lines.groupby(['page_number'])['origin_y'].idxmin()]
+    elif which == 'bottom':
+        page_blocks = lines.loc[lines.groupby(['page_number'])['origin_y'].idxmax()]
+    else:
+        raise RuntimeError('Unrecognised value for "which", should be "top" or "bottom"')
+
+    # Get repeating texts
+    elements = lines.loc[lines['page_block'].isin(page_blocks['page_block'].unique())]
+    elements = elements\
+        .reset_index()\
+        .groupby(['page_number'])\
+        .agg({'text_base': lambda x: ' '.join(x), 'index': tuple})
+    elements = elements.loc[elements['text_base'].astype(bool)]
+    repeating_texts = elements\
+        .groupby(['text_base'])\
+        .filter(lambda x: len(x) > 2)
+
+    # Don't remove lessons learned or challenges titles
+    repeating_texts = repeating_texts.loc[
+        ~get_title_matcher().is_title(repeating_texts['text_base'])
+    ]
+
+    return repeating_texts
+
+def get_repeating_lines(which, lines):
+    """
+    Get repeating lines at the top or bottom of pages.
+    """
+    # Get the top and bottom lines on each page
+    if which == 'top':
+        page_lines = lines.loc[lines.groupby(['page_number'])['origin_y'].idxmin()]
+    elif which == 'bottom':
+        page_lines = lines.loc[lines.groupby(['page_number'])['origin_y'].idxmax()]
+    else:
+        raise RuntimeError('Unrecognised value for "which", should be "top" or "bottom"')
+
+    # Get repeating texts
+    page_lines = page_lines.loc[page_lines['text_base'].astype(bool)]
+    repeating_texts = page_lines\
+        .reset_index()\
+        .groupby(['text_base'])\
+        .filter(lambda x: len(x) > 2)
+
+    # Don't remove lessons learned or challenges titles
+    repeating_texts = repeating_texts.loc[
+        ~get_title_matcher().is_title_key(repeating_texts['text_key'])
+    ]
+
+    # Don't remove bullets
+    repeating_texts = repeating_texts.loc[~(
+        repeating_texts['text'].str.strip().isin(ea_parsing.definitions.BULLETS)
+    )]
+
+    return repeating_texts
+
+
+class TestRepeatingHeadersFooters(unittest.TestCase):
+
+    @cached_property
+    def document(self):
+        return AppealDocument(name='', document_url='', created_at='')
+
+    def assert_same_as_loop(self, lines):
+        """
+        Check that peeling the pages gives the same lines as finding repeating elements in the whole document after each drop.
+        """
+        pd.testing.assert_frame_equal(
+            pd.DataFrame(self.document.drop_all_repeating_headers_footers(lines=lines.copy())),
+            pd.DataFrame(drop_all_repeating_headers_footers_loop(lines=lines.copy()))
+        )
+
+    def random_lines(self, seed):
+        """
+        Random pages with headers and footers of one or two lines, some of them section titles or bullets.
+        """
+        rng = random.Random(seed)
+        texts = ['some body text', 'more text', 'lessons learned', 'page', '', 'ifrc']
+        data = []
+        for page_number in range(rng.randint(2, 10)):
+            blocks = [
+                (block_number, [rng.choice(texts) for i in range(rng.randint(1, 3))], rng.choice([100, 300, 500]))
+                for block_number in range(rng.randint(1, 4))
+            ]
+            if rng.random() < 0.8:
+                blocks.append((10, rng.sample(['dref final report', 'operation update', 'challenges'], rng.randint(1, 2)), rng.choice([1, 2])))
+            if rng.random() < 0.8:
+                blocks.append((11, rng.sample(['ifrc', 'page', '•'], rng.randint(1, 2)), rng.choice([800, 801])))
+            for block_number, block_texts, origin_y in blocks:
+                for line_number, text in enumerate(block_texts):
+                    data.append({
+                        'text': text,
+                        'text_base': text.replace('•', ''),
+                        'page_number': page_number,
+                        'block_number': block_number,
+                        'line_number': line_number,
+                        'origin_y': origin_y + line_number,
+                    })
+        lines = pd.DataFrame(data)
+        lines['text_key'] = normalization.text_key(lines['text_base'])
+        return Lines(lines.sample(frac=1, random_state=seed).reset_index(drop=True))
+
+    def test_random_lines(self):
+        """
+        Compare on random pages.
+        """
+        for seed in range(50):
+            with self.subTest(seed=seed):
+                self.assert_same_as_loop(self.random_lines(seed=seed))
+
+    def test_duplicate_index(self):
+        """
+        Rows with the same index are dropped like rows with a unique index.
+        """
+        for seed in range(10):
+            with self.subTest(seed=seed):
+                lines = self.random_lines(seed=seed)
+                lines.index = [i // 2 for i in range(len(lines))]
+                expected = self.document.drop_all_repeating_headers_footers(lines=Lines(lines.reset_index(drop=True)))
+                result = self.document.drop_all_repeating_headers_footers(lines=lines.copy())
+                self.assertListEqual(result['text'].tolist(), expected['text'].tolist())
+                self.assertListEqual(result.index.tolist(), lines.index[expected.index].tolist())
+
+    def test_document_lines(self):
+        """
+        Compare on the lines of a PDF document, processed up to dropping headers and footers.
+        Only the header and footer are dropped.
+        """
+        lines = Lines(extract_document_spans(create_document()))
+        lines = lines\
+            .merge_inline_text(exclude_texts=get_title_matcher())\
+            .sort_blocks_by_y()\
+            .combine_spans_same_style()\
+            .combine_bullet_spans()
+        lines['text_base'] = normalization.text_base(lines['text'])
+        lines['text_key'] = normalization.text_key(lines['text_base'])
+        lines = self.document.remove_photo_blocks(lines=lines)
+        lines = self.document.remove_page_labels_references(lines=lines)
+        self.assert_same_as_loop(lines)
+
+        texts = self.document.drop_all_repeating_headers_footers(lines=lines.copy())['text']
+        self.assertListEqual(
+            sorted(set(lines['text']) - set(texts)),
+            ['Emergency appeal operation update', 'International Federation of Red Cross']
+        )
+        document = AppealDocument(name='', document_url='', created_at='', raw_lines=extract_document_spans(create_document()))
+        self.assertEqual(document.lines['text'].str.startswith('Body text').sum(), 4)
+        self.assertEqual(document.lines['text'].str.startswith('Item').sum(), 8)
+        self.assertFalse(document.lines['text'].isin(['Emergency appeal operation update', 'Page 1']).any())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,96 @@
+import os
+import asyncio
+import threading
+import unittest
+from unittest import mock
+from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from ea_parsing.bounded_executor import BoundedExecutor, ExecutorSaturated, process_pool
+
+try:
+    from fastapi.testclient import TestClient
+    from ea_parsing import main
+except ImportError:
+    main = None
+
+
+def exit_worker():
+    """
+    Kill the worker process, as the OOM killer would.
+    """
+    os._exit(1)
+
+
+class TestBoundedExecutor(unittest.TestCase):
+
+    def fill(self, executor):
+        """
+        Run a task that blocks until the returned function is called, and wait until it is running.
+        """
+        started, release = threading.Event(), threading.Event()
+
+        def block():
+            started.set()
+            release.wait(10)
+
+        def finish():
+            release.set()
+            thread.join()
+
+        thread = threading.Thread(target=executor.run_sync, args=(block,))
+        thread.start()
+        self.assertTrue(started.wait(10))
+        self.addCleanup(finish)
+        return finish
+
+    def test_saturated(self):
+        """
+        When max_pending tasks are running, further tasks are rejected straight away, not queued.
+        """
+        executor = BoundedExecutor(lambda: ThreadPoolExecutor(max_workers=1), max_pending=1)
+        self.addCleanup(executor.executor.shutdown)
+        finish = self.fill(executor)
+        with self.assertRaises(ExecutorSaturated):
+            asyncio.run(executor.run(sum, [1, 2]))
+        with self.assertRaises(ExecutorSaturated):
+            executor.run_sync(sum, [1, 2])
+        self.assertEqual(executor.pending, 1)
+
+        # tasks are accepted again once the running task finished
+        finish()
+        self.assertEqual(asyncio.run(executor.run(sum, [1, 2])), 3)
+        self.assertEqual(executor.run_sync(sum, [1, 2]), 3)
+        self.assertEqual(executor.pending, 0)
+
+    def test_broken_pool(self):
+        """
+        After a worker process died, a new pool is started for the next tasks.
+        """
+        executor = BoundedExecutor(process_pool(1), max_pending=1)
+        with self.assertRaises(BrokenProcessPool):
+            asyncio.run(executor.run(exit_worker))
+        pid = asyncio.run(executor.run(os.getpid))
+        self.assertNotEqual(pid, os.getpid())
+
+        with self.assertRaises(BrokenProcessPool):
+            executor.run_sync(exit_worker)
+        self.assertNotEqual(executor.run_sync(os.getpid), pid)
+        self.assertEqual(executor.pending, 0)
+        executor.executor.shutdown()
+
+    @unittest.skipIf(main is None, 'The API needs fastapi')
+    def test_api_saturated(self):
+        """
+        The API answers 503 when all parsing workers are busy.
+        """
+        executor = BoundedExecutor(lambda: ThreadPoolExecutor(max_workers=1), max_pending=1)
+        self.addCleanup(executor.executor.shutdown)
+        self.fill(executor)
+        with mock.patch.object(main, 'parsing_executor', executor):
+            response = TestClient(main.app).post('/parse/', params={'mdr_code': 'MDRKE043'})
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(response.headers['Retry-After'], '30')
+
+
+if __name__ == '__main__':
+    unittest.main()
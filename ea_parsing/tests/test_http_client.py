@@ -0,0 +1,101 @@
+import time
+import random
+import threading
+import unittest
+import requests
+from unittest import mock
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from ea_parsing.http_client import HTTPClient
+
+
+def paginated_response(results, url, params, count, page_size):
+    """
+    Mocked response of a paginated API with limit/offset params, as the IFRC GO API.
+    """
+    params = params or {}
+    limit = params.get('limit', page_size)
+    offset = params.get('offset', 0)
+    page = results[offset:offset+limit]
+    next_url = f'{url}?limit={limit}&offset={offset+limit}' if offset+limit < count else None
+    response = mock.Mock()
+    response.json.return_value = {'count': count, 'next': next_url, 'results': page}
+    return response
+
+
+class TestHTTPClient(unittest.TestCase):
+
+    def test_concurrent_pages(self):
+        """
+        Pages after the first one are fetched concurrently, and results are returned in the order of the pages.
+        """
+        results = [{'id': i} for i in range(95)]
+        client = HTTPClient(max_workers=4)
+        offsets = []
+
+        def get(url, params=None, timeout=None):
+            offsets.append((params or {}).get('offset', 0))
+            # later pages may be answered first
+            time.sleep(random.uniform(0, 0.02))
+            return paginated_response(results, url, params, count=len(results), page_size=10)
+
+        with mock.patch.object(client.session, 'get', side_effect=get):
+            self.assertEqual(client.get_results('https://goadmin.ifrc.org/api/v2/appeal/', params={'format': 'json'}), results)
+        self.assertEqual(sorted(offsets), list(range(0, 95, 10)))
+
+    def test_sequential_pages(self):
+        """
+        Without the total count, pages are fetched following the next URLs.
+        """
+        results = [{'id': i} for i in range(25)]
+        client = HTTPClient()
+
+        def get(url, params=None, timeout=None):
+            offset = int(url.split('offset=')[1]) if 'offset=' in url else 0
+            response = paginated_response(results, url.split('?')[0], {'limit': 10, 'offset': offset}, count=len(results), page_size=10)
+            del response.json.return_value['count']
+            return response
+
+        with mock.patch.object(client.session, 'get', side_effect=get) as session_get:
+            self.assertEqual(client.get_results('https://goadmin.ifrc.org/api/v2/appeal/'), results)
+        self.assertEqual(session_get.call_count, 3)
+
+    def test_retries(self):
+        """
+        Requests are retried after 5xx responses.
+        """
+        statuses = [503, 502, 200]
+        requested = []
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                requested.append(self.path)
+                self.send_response(statuses[len(requested)-1] if len(requested) <= len(statuses) else 200)
+                self.send_header('Content-Type', 'application/json')
+                self.end_headers()
+                self.wfile.write(b'{"count": 1, "next": null, "results": [{"id": 1}]}')
+
+            def log_message(self, *args):
+                pass
+
+        server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        thread = threading.Thread(target=server.serve_forever)
+        thread.start()
+        self.addCleanup(thread.join)
+        self.addCleanup(server.server_close)
+        self.addCleanup(server.shutdown)
+        url = f'http://127.0.0.1:{server.server_address[1]}/api/v2/appeal/'
+
+        client = HTTPClient(retries=3, backoff_factor=0)
+        self.assertEqual(client.get_results(url), [{'id': 1}])
+        self.assertEqual(len(requested), 3)
+
+        # the error is raised once retries are exhausted
+        requested.clear()
+        statuses[:] = [500, 500, 500]
+        with self.assertRaises(requests.HTTPError):
+            HTTPClient(retries=1, backoff_factor=0).get_results(url)
+        self.assertEqual(len(requested), 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,201 @@
+import random
+import unittest
+import pandas as pd
+import ea_parsing.definitions
+from ea_parsing.lines import Lines
+from ea_parsing.page_extraction import extract_document_spans
+from tests.documents import create_document
+
+
+def combine_bullet_spans_loop(lines):
+    """
+    Combine bullet points and the text which follows them, one bullet at a time.
+    Previous implementation of Lines.combine_bullet_spans, kept to check the vectorized one.
+    """
+    lines = lines.copy()
+
+    # Get bullets: span zero, bullet character
+    bullets = lines.loc[
+        (lines['text'].str.strip().isin(ea_parsing.definitions.BULLETS)) &
+        (lines['span_number'] == 0)
+    ]
+
+    # Loop through bullets and put bullet item text on the same line_number
+    for i, bullet in bullets.iterrows():
+        bullet_block = lines.loc[
+            (lines['page_number'] == bullet['page_number']) &
+            (lines['block_number'] == bullet['block_number'])
+        ]
+        bullet_line = bullet_block.loc[
+            (lines['line_number'] == bullet['line_number'])
+        ]
+        text_at_bullet_level = bullet_block.loc[
+            (lines['line_number'] != bullet['line_number']) &
+            (lines['span_number'] == 0) &
+            (lines['total_y'] == bullet['total_y'])
+        ]
+        if not text_at_bullet_level.empty:
+            first_text_at_bullet_level = text_at_bullet_level.index[0]
+            lines.loc[first_text_at_bullet_level, 'line_number'] = bullet['line_number']
+            lines.loc[first_text_at_bullet_level, 'span_number'] = bullet_line['span_number'].max() + 1
+
+    return lines
+
+
+class TestCombineBulletSpans(unittest.TestCase):
+
+    def assert_same_as_loop(self, lines):
+        """
+        Check that the vectorized combine_bullet_spans gives the same lines as the loop through bullets.
+        Bullets after the first one at the same height in a block are left as they are:
+        the loop is run without them (it would join them to the first bullet).
+        """
+        lines = Lines(lines.reset_index(drop=True))
+        is_bullet = lines['text'].str.strip().isin(ea_parsing.definitions.BULLETS) & (lines['span_number'] == 0)
+        first_bullets = lines.loc[is_bullet].drop_duplicates(subset=['page_number', 'block_number', 'total_y']).index
+        later_bullets = is_bullet & ~lines.index.isin(first_bullets)
+        combined = lines.combine_bullet_spans()
+        pd.testing.assert_frame_equal(
+            pd.DataFrame(combined.loc[~later_bullets]),
+            pd.DataFrame(combine_bullet_spans_loop(lines.loc[~later_bullets]))
+        )
+        pd.testing.assert_frame_equal(pd.DataFrame(combined.loc[later_bullets]), pd.DataFrame(lines.loc[later_bullets]))
+
+    def random_lines(self, seed, n_blocks=5, n_lines=8):
+        """
+        Random lines with bullets and texts at the same heights in blocks.
+        """
+        rng = random.Random(seed)
+        data = []
+        for page_number in range(2):
+            for block_number in range(n_blocks):
+                for line_number in range(n_lines):
+                    total_y = page_number*800 + block_number*100 + rng.choice([0, 10, 20, 30, 40])
+                    for span_number in range(rng.choice([1, 1, 2])):
+                        data.append({
+                            'text': rng.choice(['•', ' ● ', '-', 'Some text', 'More text']),
+                            'page_number': page_number,
+                            'block_number': block_number,
+                            'line_number': line_number,
+                            'span_number': span_number,
+                            'total_y': total_y + 0.5*span_number,
+                        })
+        lines = pd.DataFrame(data)
+        return Lines(lines.sample(frac=1, random_state=seed))
+
+    def test_random_lines(self):
+        """
+        Compare on random lines, with and without several bullets at the same height in a block.
+        """
+        for seed in range(30):
+            with self.subTest(seed=seed):
+                self.assert_same_as_loop(self.random_lines(seed=seed))
+            with self.subTest(seed=seed, one_line_per_block=True):
+                self.assert_same_as_loop(self.random_lines(seed=seed, n_lines=2))
+
+    def test_bullet_lines(self):
+        """
+        A bullet and its text on separate lines are put on the same line.
+        """
+        lines = Lines(pd.DataFrame({
+            'text': ['•', 'First item', '•', 'Second item', 'Other text'],
+            'page_number': [0, 0, 0, 0, 0],
+            'block_number': [1, 1, 1, 1, 1],
+            'line_number': [0, 1, 2, 3, 4],
+            'span_number': [0, 0, 0, 0, 0],
+            'total_y': [10.0, 10.0, 20.0, 20.0, 30.0],
+        }))
+        combined = lines.combine_bullet_spans()
+        self.assertListEqual(combined['line_number'].tolist(), [0, 0, 2, 2, 4])
+        self.assertListEqual(combined['span_number'].tolist(), [0, 1, 0, 1, 0])
+        self.assert_same_as_loop(lines)
+
+    def test_document_lines(self):
+        """
+        Bullets and their items extracted from a PDF document are put on the same lines.
+        """
+        lines = Lines(extract_document_spans(create_document()))\
+            .sort_blocks_by_y()\
+            .combine_spans_same_style()
+        combined = lines.combine_bullet_spans()
+        items = combined.loc[combined['text'].str.startswith('Item')]
+        bullets = combined.loc[combined['text'] == '-']
+        self.assertEqual(len(items), 8)
+        pd.testing.assert_frame_equal(
+            items[['page_number', 'block_number', 'line_number']].reset_index(drop=True),
+            bullets[['page_number', 'block_number', 'line_number']].reset_index(drop=True)
+        )
+        self.assertTrue((items['span_number'] == 1).all())
+        self.assert_same_as_loop(lines)
+
+    def test_duplicate_index(self):
+        """
+        Rows with the same index are combined like rows with a unique index.
+        """
+        for seed in range(10):
+            with self.subTest(seed=seed):
+                lines = self.random_lines(seed=seed)
+                lines.index = [i // 2 for i in range(len(lines))]
+                expected = Lines(lines.reset_index(drop=True)).combine_bullet_spans()
+                expected.index = lines.index
+                pd.testing.assert_frame_equal(pd.DataFrame(lines.combine_bullet_spans()), pd.DataFrame(expected))
+
+    def test_several_bullets(self):
+        """
+        Of several bullets at the same height in a block, the first one is joined to the text.
+        Texts of several bullets on the same line follow each other.
+        """
+        lines = Lines(pd.DataFrame({
+            'text': ['•', '•', 'Item', '•', '•', 'First item', 'Second item'],
+            'page_number': [0, 0, 0, 0, 0, 0, 0],
+            'block_number': [1, 1, 1, 2, 2, 2, 2],
+            'line_number': [0, 1, 2, 0, 0, 1, 2],
+            'span_number': [0, 0, 0, 0, 0, 0, 0],
+            'total_y': [10.0, 10.0, 10.0, 10.0, 20.0, 10.0, 20.0],
+        }, index=[5, 5, 6, 7, 8, 9, 10]))
+        combined = lines.combine_bullet_spans()
+        self.assertListEqual(combined['line_number'].tolist(), [0, 1, 0, 0, 0, 0, 0])
+        self.assertListEqual(combined['span_number'].tolist(), [0, 0, 1, 0, 0, 1, 2])
+        self.assertListEqual(combined.index.tolist(), lines.index.tolist())
+        self.assert_same_as_loop(lines)
+
+
+class TestPageLabelsReferences(unittest.TestCase):
+
+    def random_lines(self, seed):
+        """
+        Random lines of page headers and footers: page labels, references, and other text.
+        """
+        rng = random.Random(seed)
+        texts = ['page 3', '3', '12', 'page', 'page 12 of 40', '1 2', 'pagepage 4', 'p 1', 'annual report', 'x', '', None]
+        data = []
+        for page_number in range(3):
+            for block_number in range(4):
+                for line_number in range(rng.randint(1, 3)):
+                    for span_number in range(rng.randint(1, 3)):
+                        data.append({
+                            'text_base': rng.choice(texts),
+                            'size': rng.choice([6, 8, 10, 11, None]),
+                            'page_number': page_number,
+                            'block_number': block_number,
+                            'line_number': line_number,
+                            'span_number': span_number,
+                        })
+        lines = pd.DataFrame(data)
+        return Lines(lines.sample(frac=1, random_state=seed))
+
+    def test_same_as_groups(self):
+        """
+        Check page_labels_references against is_page_label and is_reference on each group of lines.
+        """
+        for seed in range(30):
+            lines = self.random_lines(seed=seed)
+            for by in [['page_number', 'block_number'], ['page_number', 'block_number', 'line_number']]:
+                with self.subTest(seed=seed, by=by):
+                    page_labels_references = lines.page_labels_references(by=by)
+                    expected = lines.groupby(by).apply(lambda group: group.is_page_label() or group.is_reference())
+                    self.assertDictEqual(page_labels_references.to_dict(), expected.astype(bool).to_dict())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,55 @@
+import unittest
+import pandas as pd
+from ea_parsing import normalization
+from ea_parsing.lessons_learned_extractor import get_title_matcher
+
+
+class TestTitleMatcher(unittest.TestCase):
+
+    TEXTS = [
+        'Lessons learned', 'LESSONS LEARNT:', '3. Challenges and lessons learned', 'key challenges', 'challenges, constraints',
+        'the challenge', 'Lessons learned included the following', 'lessons', 'learned', 'in-the-field', '', '  ', float('nan')
+    ]
+
+    def test_text_key(self):
+        """
+        Text keys of a Series are the same as removing filler words after replacing non-letter characters.
+        """
+        texts = pd.Series(self.TEXTS, dtype=object)
+        expected = texts\
+            .str.replace(r'[^A-Za-z ]+', ' ', regex=True)\
+            .str.strip()\
+            .apply(normalization.remove_filler_words)
+        normalized = normalization.text_key(normalization.text_base(texts))
+        for text, expected_text, normalized_text in zip(self.TEXTS, expected, normalized):
+            with self.subTest(text=text):
+                if pd.isna(expected_text):
+                    self.assertTrue(pd.isna(normalized_text))
+                else:
+                    self.assertEqual(normalized_text, expected_text)
+
+    def test_is_title(self):
+        texts = pd.Series(self.TEXTS, dtype=object)
+        self.assertEqual(
+            get_title_matcher().is_title(texts).tolist(),
+            [True, True, True, True, True, True, False, False, False, False, False, False, False]
+        )
+        self.assertEqual(
+            get_title_matcher('lessons_learned').is_title(texts).tolist(),
+            [True, True, True, False, False, False, False, False, False, False, False, False, False]
+        )
+
+    def test_titles_from_list(self):
+        """
+        Titles given as a list are normalized like the texts.
+        """
+        matcher = normalization.TitleMatcher(titles=['Lessons Learned', 'The Challenges!'])
+        self.assertEqual(matcher.titles, {'lessons learned', 'challenges'})
+        self.assertEqual(
+            matcher.is_title(pd.Series(['lessons-learned', 'challenges', 'challenge'])).tolist(),
+            [True, True, False]
+        )
+
+
+if __name__ == '__main__':
+    unittest.main()
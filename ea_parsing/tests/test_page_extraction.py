@@ -0,0 +1,89 @@
+import unittest
+from unittest import mock
+import fitz
+import pandas as pd
+from ea_parsing import page_extraction
+from ea_parsing.lines import Lines
+from ea_parsing.page_extraction import extract_document_spans, SPAN_COLUMNS, CATEGORICAL_COLUMNS
+
+
+class TestPageExtraction(unittest.TestCase):
+
+    def create_document(self, n_pages=5):
+        """
+        Create a PDF document with text, highlighted text and images on every page.
+        """
+        doc = fitz.open()
+        image = fitz.Pixmap(fitz.csRGB, fitz.IRect(0, 0, 10, 10), 0)
+        image.set_rect(image.irect, (200, 50, 50))
+        for page_number in range(n_pages):
+            page = doc.new_page(width=595, height=842 if page_number % 2 else 600)
+            page.draw_rect(fitz.Rect(60, 90, 300, 110), color=None, fill=(1.0, 0.9, 0.0))
+            page.insert_text((72, 105), f'Highlighted title on page {page_number}', fontname='helv')
+            page.insert_text((72, 150), 'Bold text', fontname='hebo')
+            page.insert_image(fitz.Rect(60, 200, 400, 400), pixmap=image)
+            page.insert_text((72, 300), 'Photo: caption inside the image', fontname='helv')
+            page.insert_text((72, 500), f'Page {page_number+1}', fontname='helv')
+        return doc.tobytes()
+
+    def extract(self, pdf_data, page_workers):
+        with mock.patch.object(page_extraction, 'page_workers', page_workers):
+            return extract_document_spans(pdf_data)
+
+    def test_parallel_extraction_matches_serial(self):
+        """
+        Spans extracted in the page extraction pool are the same, and in the same order, as spans extracted page by page.
+        """
+        pdf_data = self.create_document()
+        serial = self.extract(pdf_data, page_workers=1)
+        parallel = self.extract(pdf_data, page_workers=2)
+        pd.testing.assert_frame_equal(serial, parallel)
+
+        # All pages in order, with total_y increasing over the pages
+        self.assertListEqual(serial['page_number'].unique().tolist(), list(range(5)))
+        self.assertTrue(serial['total_y'].is_monotonic_increasing)
+        self.assertTrue(serial['img'].any())
+        self.assertTrue(serial['highlight_color'].notnull().any())
+
+    def test_page_pool_opt_in(self):
+        """
+        The page extraction pool is only used with more than one page worker, and not in worker processes.
+        """
+        with mock.patch.object(page_extraction, 'page_workers', 1):
+            self.assertFalse(page_extraction.use_page_pool(n_pages=5))
+        with mock.patch.object(page_extraction, 'page_workers', 2):
+            self.assertTrue(page_extraction.use_page_pool(n_pages=5))
+            self.assertFalse(page_extraction.use_page_pool(n_pages=1))
+            with mock.patch('multiprocessing.parent_process', return_value=object()):
+                self.assertFalse(page_extraction.use_page_pool(n_pages=5))
+
+    def test_column_types(self):
+        """
+        Spans are stored in typed columns: categoricals for fonts, colours and styles, float32 coordinates, int16 numbers.
+        """
+        spans = self.extract(self.create_document(n_pages=2), page_workers=1)
+        self.assertListEqual(spans.columns.tolist(), list(SPAN_COLUMNS))
+        for col, dtype in SPAN_COLUMNS.items():
+            with self.subTest(col=col):
+                if col in CATEGORICAL_COLUMNS:
+                    self.assertEqual(spans[col].dtype, 'category')
+                else:
+                    self.assertEqual(spans[col].dtype, dtype)
+        self.assertEqual(Lines(spans)['style'].dtype, 'category')
+
+        # No spans
+        spans = self.extract(self.create_empty_document(), page_workers=1)
+        self.assertTrue(spans.empty)
+        self.assertListEqual(spans.columns.tolist(), list(SPAN_COLUMNS))
+
+    def create_empty_document(self):
+        """
+        Create a PDF document with one blank page.
+        """
+        doc = fitz.open()
+        doc.new_page()
+        return doc.tobytes()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,54 @@
+import random
+import unittest
+import pandas as pd
+from ea_parsing.sectors import get_sectors
+
+
+class TestSectorsMatch(unittest.TestCase):
+
+    def random_texts(self, seed, n=500):
+        """
+        Random sector titles with filler words, prefixes, punctuation and different cases, and other texts.
+        """
+        rng = random.Random(seed)
+        sectors = get_sectors()
+        titles = [title for titles in sectors.sectors.values() for title in titles] + list(sectors.sectors)
+        texts = []
+        for i in range(n):
+            words = rng.choice(titles).split()
+            if rng.random() < 0.4:
+                words.insert(rng.randint(0, len(words)), rng.choice(['and', 'the', 'of', '&', 'key', 'A', 'other']))
+            text = ' '.join(words)
+            if rng.random() < 0.3:
+                text = 'Strategies for implementation: ' + text
+            if rng.random() < 0.3:
+                text = text.upper()
+            if rng.random() < 0.2:
+                text = text + rng.choice([':', ' (cont.)', ' 2', '  '])
+            texts.append(rng.choice([text, text, text, 'strategies for implementation', '', 'Other text']))
+        return texts
+
+    def test_same_as_get_similar_sector(self):
+        """
+        Check that matching a Series gives the same as getting the similar sector of each text.
+        """
+        sectors = get_sectors()
+        for seed in range(5):
+            with self.subTest(seed=seed):
+                texts = self.random_texts(seed=seed)
+                matches = sectors.match(pd.Series(texts, index=range(0, 2*len(texts), 2)))
+                self.assertEqual(list(matches.index), list(range(0, 2*len(texts), 2)))
+                self.assertEqual(
+                    list(zip(matches['Sector title'], matches['Sector similarity score'])),
+                    [sectors.get_similar_sector(text) for text in texts]
+                )
+
+    def test_missing_texts(self):
+        matches = get_sectors().match(pd.Series(['Health', None, 'Shelter and', 'Other text']))
+        self.assertEqual(matches['Sector title'].tolist()[2:], ['Shelter, Housing and Settlements', None])
+        self.assertTrue(matches.loc[1].isna().all())
+        self.assertEqual(matches['Sector similarity score'].fillna(-1).tolist(), [1, -1, 1, 0])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,34 @@
+import os
+import unittest
+from functools import cached_property
+
+
+class TestSharedModules(unittest.TestCase):
+    """
+    Modules copied in several packages, which are installed independently, must stay identical.
+    """
+    SHARED_MODULES = {
+        'bounded_executor.py': ['dref_parsing', 'dref_tagging', 'ea_parsing'],
+        'http_client.py': ['dref_parsing', 'ea_parsing'],
+    }
+
+    @cached_property
+    def ROOT_DIR(self):
+        return os.path.dirname(os.path.dirname(os.path.dirname(os.path.realpath(__file__))))
+
+    def test_copies_identical(self):
+        for module, packages in self.SHARED_MODULES.items():
+            paths = [os.path.join(self.ROOT_DIR, package, package, module) for package in packages]
+            if not all(os.path.isfile(path) for path in paths):
+                self.skipTest('Packages are not all in the repository checkout')
+            with self.subTest(module=module):
+                contents = []
+                for path in paths:
+                    with open(path, 'r') as f:
+                        contents.append(f.read())
+                for package, content in zip(packages[1:], contents[1:]):
+                    self.assertEqual(content, contents[0], f'{package}/{module} differs from {packages[0]}/{module}')
+
+
+if __name__ == '__main__':
+    unittest.main()
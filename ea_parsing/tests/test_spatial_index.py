@@ -0,0 +1,65 @@
+import random
+import unittest
+from ea_parsing import utils
+from ea_parsing.spatial_index import RectIndex
+
+
+class TestSpatialIndex(unittest.TestCase):
+
+    def random_rects(self, n, seed):
+        """
+        Random rectangles on a page, on a coarse grid so that there are touching edges and equal overlaps.
+        """
+        rng = random.Random(seed)
+        rects = []
+        for i in range(n):
+            x0, y0 = rng.randrange(0, 600, 5), rng.randrange(0, 850, 5)
+            rects.append((x0, y0, x0+rng.randrange(0, 300, 5), y0+rng.choice([5, 10, 15, 200, 850])))
+        return rects
+
+    def brute_force_largest_overlap(self, bbox, rects):
+        """
+        Largest overlap as in the loop over all drawings: first maximum of the positive overlaps.
+        """
+        highlights = [(i, utils.get_overlap(bbox, rect)) for i, rect in enumerate(rects) if utils.get_overlap(bbox, rect)]
+        if not highlights:
+            return -1
+        return max(highlights, key=lambda x: x[1])[0]
+
+    def test_largest_overlap(self):
+        """
+        Check the largest overlap against the loop over all rectangles.
+        """
+        for seed in range(20):
+            rects = self.random_rects(50, seed=seed)
+            bboxes = self.random_rects(100, seed=seed+100)
+            with self.subTest(seed=seed):
+                self.assertListEqual(
+                    RectIndex(rects).largest_overlap(bboxes).tolist(),
+                    [self.brute_force_largest_overlap(bbox, rects) for bbox in bboxes]
+                )
+
+    def test_contained_in_any(self):
+        """
+        Check containment against the loop over all rectangles.
+        """
+        for seed in range(20):
+            rects = self.random_rects(20, seed=seed)
+            bboxes = self.random_rects(100, seed=seed+100)
+            with self.subTest(seed=seed):
+                self.assertListEqual(
+                    RectIndex(rects).contained_in_any(bboxes).tolist(),
+                    [any(utils.contains(rect, bbox) for rect in rects) for bbox in bboxes]
+                )
+
+    def test_empty(self):
+        """
+        No rectangles or no boxes.
+        """
+        self.assertListEqual(RectIndex([]).largest_overlap([(0, 0, 10, 10)]).tolist(), [-1])
+        self.assertListEqual(RectIndex([]).contained_in_any([(0, 0, 10, 10)]).tolist(), [False])
+        self.assertListEqual(RectIndex([(0, 0, 10, 10)]).largest_overlap([]).tolist(), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
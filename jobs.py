@@ -0,0 +1,255 @@
+# Bulk Parsing+Tagging jobs for the API (main.py).
+#
+# A job is a list of items (appeal codes or uploaded PDF files). The job is accepted
+# right away and its items are processed in the background: parsing in a pool of
+# worker processes, tagging in the inference executor of the API (dref_tagging.executors),
+# so that jobs share its limit on pending inference and never run the model concurrently.
+# When the inference executor is saturated, job items wait and try again.
+# Status and results are kept on disk, one folder per job:
+#   <DREF_JOBS_DIR>/<job id>/status.json           - status of the job and its items
+#   <DREF_JOBS_DIR>/<job id>/inputs/<item>.pdf     - uploaded PDF files
+#   <DREF_JOBS_DIR>/<job id>/results/<item>.parquet
+# so results survive a restart of the app, and can be read by any app worker.
+# Items that were queued or running when the app stopped are not resumed:
+# they are marked failed when the app starts again (see fail_interrupted).
+# Items are the appeal codes, and upload-1, upload-2, ... for uploaded files
+# (cannot be confused with appeal codes, which are alphanumeric).
+#
+# Settings by environment variables:
+#   DREF_JOBS_DIR       - folder for jobs (default: dref_jobs in temp folder)
+#   DREF_JOBS_WORKERS   - number of items processed in parallel (default 2)
+#   DREF_JOBS_TTL_HOURS - jobs older than this are deleted (default 24)
+#   DREF_JOBS_INFERENCE_WAIT - seconds to wait before trying again when the inference
+#                              executor is saturated (default 5)
+
+import os
+import re
+import json
+import uuid
+import shutil
+import tempfile
+import datetime
+import time
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+import pandas as pd
+
+from dref_parsing.parser_utils import parse_PDF_combined
+from dref_tagging.prediction import predict_tags_any_length
+from dref_tagging.executors import inference_executor, ExecutorSaturated
+from pipeline import parsing_error_message, select_excerpts, add_tags
+
+
+# Job ids are uuid4 hex strings, appeal codes are alphanumeric.
+# Both are used in file names, so nothing else is accepted
+job_id_pattern = re.compile(r'^[0-9a-f]{32}$')
+lead_pattern = re.compile(r'^[A-Za-z0-9]+$')
+
+
+class JobManager:
+    def __init__(self, folder, max_workers=2, ttl_hours=24, inference_wait=5):
+        self.folder = folder
+        self.max_workers = max_workers
+        self.ttl_hours = ttl_hours
+        self.inference_wait = inference_wait
+        # The folder is created with the first job.
+        # Pools are created on first use.
+        # Jobs have their own pools, so that they don't block interactive requests
+        self._parse_pool = None
+        self._runner = None
+        self._lock = threading.Lock()
+
+    # ------------------------------------------------------------------
+    # Helpers
+
+    def _job_folder(self, job_id):
+        return os.path.join(self.folder, job_id)
+
+    def _status_file(self, job_id):
+        return os.path.join(self._job_folder(job_id), 'status.json')
+
+    def _result_file(self, job_id, item_id):
+        return os.path.join(self._job_folder(job_id), 'results', item_id + '.parquet')
+
+    def _input_file(self, job_id, item_id):
+        return os.path.join(self._job_folder(job_id), 'inputs', item_id + '.pdf')
+
+    # Write to a temporary file and rename it, so that readers never see a partial file
+    def _write_atomic(self, filename, data):
+        os.makedirs(os.path.dirname(filename), exist_ok=True)
+        tmp_name = filename + '.' + uuid.uuid4().hex + '.tmp'
+        with open(tmp_name, 'wb') as f:
+            f.write(data)
+        os.replace(tmp_name, filename)
+
+    def _write_status(self, job_id, status):
+        self._write_atomic(self._status_file(job_id), json.dumps(status).encode('utf-8'))
+
+    def _read_status(self, job_id):
+        if not job_id_pattern.match(job_id):
+            return None
+        try:
+            with open(self._status_file(job_id), 'r') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def _job_ids(self):
+        try:
+            return os.listdir(self.folder)
+        except FileNotFoundError:
+            return []
+
+    def _update_item(self, job_id, item_id, **fields):
+        with self._lock:
+            status = self._read_status(job_id)
+            status['items'][item_id].update(fields)
+            self._write_status(job_id, status)
+
+    def _get_pools(self):
+        with self._lock:
+            if self._runner is None:
+                self._parse_pool = ProcessPoolExecutor(max_workers=self.max_workers,
+                                                       mp_context=multiprocessing.get_context('spawn'))
+                self._runner = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix='job')
+        return self._parse_pool, self._runner
+
+    # ------------------------------------------------------------------
+    # Jobs
+
+    # Create a job for appeal codes (leads) and PDF files (list of (filename, bytes)).
+    # Returns the job id
+    def submit(self, leads=(), pdf_files=()):
+        invalid_leads = [lead for lead in leads if not lead_pattern.match(lead)]
+        if invalid_leads:
+            raise ValueError(f'Invalid appeal codes: {invalid_leads}')
+        self.remove_expired()
+
+        job_id = uuid.uuid4().hex
+        items = {}
+        for lead in leads:
+            if lead not in items:
+                items[lead] = dict(lead=lead, filename=None, status='queued', error=None, exception=None, n_rows=None)
+        for i, (filename, pdf_data) in enumerate(pdf_files):
+            item_id = f'upload-{i+1}'
+            self._write_atomic(self._input_file(job_id, item_id), pdf_data)
+            items[item_id] = dict(lead='Unknown', filename=filename, status='queued', error=None, exception=None, n_rows=None)
+
+        created_at = datetime.datetime.now(datetime.timezone.utc).isoformat()
+        self._write_status(job_id, dict(job_id=job_id, created_at=created_at, items=items))
+
+        parse_pool, runner = self._get_pools()
+        for item_id in items:
+            runner.submit(self._run_item, job_id, item_id)
+        return job_id
+
+    # Tags of the excerpts in the inference executor shared with the API requests,
+    # waiting while it is saturated
+    def _predict_tags(self, excerpts):
+        while True:
+            try:
+                return inference_executor.run_sync(predict_tags_any_length, excerpts)
+            except ExecutorSaturated:
+                time.sleep(self.inference_wait)
+
+    # Parse and tag one item of a job, save its results.
+    # Failed items keep the error message and the exception (type and message) in the status
+    def _run_item(self, job_id, item_id):
+        self._update_item(job_id, item_id, status='running')
+        lead = self._read_status(job_id)['items'][item_id]['lead']
+        try:
+            pdf_file = None
+            if os.path.exists(self._input_file(job_id, item_id)):
+                with open(self._input_file(job_id, item_id), 'rb') as f:
+                    pdf_file = f.read()
+            parse_pool, _ = self._get_pools()
+            all_parsed = parse_pool.submit(parse_PDF_combined, lead, pdf_file = pdf_file).result()
+        except Exception as e:
+            self._update_item(job_id, item_id, status='failed', error=parsing_error_message(e, lead),
+                              exception=f'{type(e).__name__}: {e}')
+            return
+        try:
+            df = select_excerpts(all_parsed)
+            df = add_tags(df, self._predict_tags(df['Modified Excerpt'].tolist()))
+            self._write_atomic(self._result_file(job_id, item_id), df.to_parquet(index=False))
+        except Exception as e:
+            self._update_item(job_id, item_id, status='failed', error='Tagging didn\'t work',
+                              exception=f'{type(e).__name__}: {e}')
+            return
+        self._update_item(job_id, item_id, status='done', n_rows=len(df))
+
+    # Status of a job (None if there is no such job), with a summary
+    # state: 'queued', 'running' or 'finished' (all items either done or failed)
+    def status(self, job_id):
+        status = self._read_status(job_id)
+        if status is None:
+            return None
+        counts = pd.Series([item['status'] for item in status['items'].values()], dtype=object).value_counts()
+        status['counts'] = {k: int(v) for k, v in counts.items()}
+        n_finished = counts.get('done', 0) + counts.get('failed', 0)
+        if n_finished == len(status['items']):
+            status['state'] = 'finished'
+        elif counts.get('queued', 0) == len(status['items']):
+            status['state'] = 'queued'
+        else:
+            status['state'] = 'running'
+        return status
+
+    # Results of an item of a job (None if they are not available)
+    def item_results(self, job_id, item_id):
+        status = self._read_status(job_id)
+        if (status is None) or (status['items'].get(item_id, {}).get('status') != 'done'):
+            return None
+        return pd.read_parquet(self._result_file(job_id, item_id))
+
+    # Results of all finished items of a job (None if there is no such job)
+    def combined_results(self, job_id):
+        status = self._read_status(job_id)
+        if status is None:
+            return None
+        dfs = [pd.read_parquet(self._result_file(job_id, item_id))
+               for item_id, item in status['items'].items() if item['status'] == 'done']
+        if len(dfs) == 0:
+            return pd.DataFrame()
+        return pd.concat(dfs, ignore_index=True)
+
+    # Delete jobs older than ttl_hours
+    def remove_expired(self):
+        now = datetime.datetime.now(datetime.timezone.utc)
+        for job_id in self._job_ids():
+            status = self._read_status(job_id)
+            if status is None:
+                continue
+            created_at = datetime.datetime.fromisoformat(status['created_at'])
+            if created_at.tzinfo is None:
+                # jobs created before created_at had a time zone are in UTC
+                created_at = created_at.replace(tzinfo=datetime.timezone.utc)
+            age = now - created_at
+            if age.total_seconds() > self.ttl_hours*3600:
+                shutil.rmtree(self._job_folder(job_id), ignore_errors=True)
+
+    # Mark items that were queued or running when the app stopped as failed,
+    # since they are not resumed. To be called when the app starts.
+    # Returns the number of such items
+    def fail_interrupted(self):
+        n_failed = 0
+        for job_id in self._job_ids():
+            with self._lock:
+                status = self._read_status(job_id)
+                if status is None:
+                    continue
+                interrupted = [item for item in status['items'].values() if item['status'] in ['queued', 'running']]
+                for item in interrupted:
+                    item.update(status='failed', error='Interrupted by a restart of the app')
+                if interrupted:
+                    self._write_status(job_id, status)
+                n_failed += len(interrupted)
+        return n_failed
+
+
+job_manager = JobManager(folder = os.environ.get('DREF_JOBS_DIR', os.path.join(tempfile.gettempdir(), 'dref_jobs')),
+                         max_workers = int(os.environ.get('DREF_JOBS_WORKERS', 2)),
+                         ttl_hours = float(os.environ.get('DREF_JOBS_TTL_HOURS', 24)),
+                         inference_wait = float(os.environ.get('DREF_JOBS_INFERENCE_WAIT', 5)))
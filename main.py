@@ -1,29 +1,71 @@
 # main.py for DREF_PARSETAG
 
-from fastapi import FastAPI, Query, HTTPException
+from fastapi import FastAPI, Query, HTTPException, Header
 from fastapi.responses import StreamingResponse
-from fastapi import File, UploadFile
-from typing import Optional
-from importlib import resources
+from fastapi import File, UploadFile, Form
+from typing import Optional, List
 import io
+import re
 from enum import Enum
 
 from dref_parsing.parser_utils import *
+from dref_parsing.cache import invalidation_allowed
+from dref_parsing.executors import parsing_executor, ExecutorSaturated as ParsingSaturated
 from dref_tagging.prediction import predict_tags_any_length
+from dref_tagging.executors import inference_executor, ExecutorSaturated as TaggingSaturated
+from dref_tagging.registry import warmup
+from pipeline import get_Dimension_from_Subdimension, parsing_error_message, select_excerpts, add_tags
+from jobs import job_manager
 
 app = FastAPI()
 
+
+# Load tokenizer, model and spaCy at startup, 
+# so that the first request does not have to wait for them
+@app.on_event("startup")
+def load_tagging_resources():
+    warmup()
+
+# Items of jobs interrupted by a restart of the app are not resumed, mark them failed.
+# NB: with several app workers, restart them together (a single restarted worker
+# would also mark the items still running in the other workers)
+@app.on_event("startup")
+def fail_interrupted_jobs():
+    job_manager.fail_interrupted()
+
 # This Enum class allows us to see a dropdown menu with possible choices
 class OuputFormat(str, Enum):
     json = "json"
     csv = "csv"
 
+# Output formats for results of jobs
+class JobOutputFormat(str, Enum):
+    json = "json"
+    csv = "csv"
+    parquet = "parquet"
+
+
+# Returns DataFrame as Json, or as Csv/Parquet file for download
+def dataframe_response(df, output_format, filename='export'):
+    if output_format == 'json':
+        return df.to_dict()
+
+    if output_format == 'parquet':
+        stream = io.BytesIO()
+        df.to_parquet(stream, index = False)
+        response = StreamingResponse(iter([stream.getvalue()]), media_type="application/octet-stream")
+        response.headers["Content-Disposition"] = f"attachment; filename={filename}.parquet"
+        return response
+
+    # prepare csv output
+    stream = io.StringIO()
+    # NB: comma as a separator works OK even if there exist commas in some excerpts 
+    # since pandas is smart to insert quotes where needed
+    df.to_csv(stream, index = False, sep=',')
 
-# Once Subdimension is found, this function helps select the corresponding Dimension
-def get_Dimension_from_Subdimension(subdim, spec):
-    if subdim in list(spec.index):
-        return spec.loc[subdim,'Dimension']
-    return 'ERROR: No Dimension matches this Subdimension :('
+    response = StreamingResponse(iter([stream.getvalue()]), media_type="text/csv")
+    response.headers["Content-Disposition"] = f"attachment; filename={filename}.csv"
+    return response
 
 
 
@@ -68,70 +110,116 @@ async def parse_and_tag(output_format: OuputFormat,
     # ---------------------------------------------------------
     # Parsing PDF
     try:
-        # excerpts (and other relevant columns)
-        all_parsed = parse_PDF_combined(lead, pdf_file = pdf_file)
-    except ExceptionNotInAPI:
-        raise HTTPException(status_code=404, 
-                            detail=f"{lead} doesn't have a DREF Final Report in IFRC GO appeal database")
-    except ExceptionNoURLforPDF:
-        raise HTTPException(status_code=404, 
-                            detail=f"PDF URL for Appeal code {lead} was not found using IFRC GO API call appeal_document")
-    except:
-        raise HTTPException(status_code=500, detail="PDF Parsing didn't work by some reason")
+        # excerpts (and other relevant columns).
+        # Parsing runs in a worker process, so that the event loop keeps serving other requests
+        all_parsed = await parsing_executor.run(parse_PDF_combined, lead, pdf_file = pdf_file)
+    except ParsingSaturated:
+        raise HTTPException(status_code=503, detail="All parsing workers are busy, please try again later",
+                            headers={"Retry-After": "30"})
+    except (ExceptionNotInAPI, ExceptionNoURLforPDF) as e:
+        raise HTTPException(status_code=404, detail=parsing_error_message(e, lead))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=parsing_error_message(e, lead))
 
-    df = all_parsed[['Modified Excerpt', 'Learning', 'DREF_Sector', 'lead', 'Hazard', 'Country', 'Date', 'Region']].copy() #,'position', 'DREF_Sector_id']]
+    df = select_excerpts(all_parsed)
 
     # -----------------------------------------------------------
     # Tagging excerpts and cleaning/renaming
 
-    df.loc[:,'Subdimension'] = df['Modified Excerpt'].apply(lambda x: predict_tags_any_length(x)[0])
-    # Split to "row per tag"
-    df = df.explode('Subdimension')
+    # All excerpts of the report are tagged in one call, 
+    # so that their chunks are batched together by the model.
+    # Inference runs in a worker thread
+    try:
+        tags = await inference_executor.run(predict_tags_any_length, df['Modified Excerpt'].tolist())
+    except TaggingSaturated:
+        raise HTTPException(status_code=503, detail="The model is busy with other requests, please try again later",
+                            headers={"Retry-After": "10"})
+    df = add_tags(df, tags)
 
-    # Define Dimensions from Subdimensions using a dics from csv file
-    with resources.path("dref_tagging.config", "DREF_spec.csv") as DREF_spec_file:
-        spec = pd.read_csv(DREF_spec_file).set_index('Subdimension')    
-    
-    df['Dimension'] = df['Subdimension'].apply(lambda x: get_Dimension_from_Subdimension(x, spec))     
-    df = df.fillna('Unknown')   
+    # -----------------------------------
+    # Return DataFrame as Json or Csv:
+    return dataframe_response(df, output_format)
 
-    df = df.rename(columns={'lead':'Appeal code','Modified Excerpt':'Excerpt'})
 
-    # reorder columns
-    cols_order = ['Excerpt', 'Learning', 'DREF_Sector', 'Appeal code', 'Hazard', 'Country', 'Date', 'Region', 'Dimension' ,'Subdimension']
-    df = df[cols_order]
+# *********************************************************************
+# Jobs: bulk Parsing+Tagging in the background (see jobs.py)
 
-    # -----------------------------------
-    # Return DataFrame as Json or Csv:
+@app.post("/jobs/", status_code=202)
+async def submit_job(
+    Appeal_codes: Optional[List[str]] = Form(None, 
+        description="Appeal codes MDR*****, separated by commas or spaces (the field can also be repeated)"),
+    pdf_files: Optional[List[UploadFile]] = File(None, description="Optional PDF files of reports")):
+    """
+    Submit a job for Parsing+Tagging of many DREF Final Reports.  
+    <b>Input</b>: Appeal codes of the reports, MDR*****, and/or PDF files  
+    <b>Output</b>: job id. The job runs in the background:  
+    &nbsp;&nbsp; poll its status with <i>/jobs/{job_id}</i>, and get the results of all reports 
+    with <i>/jobs/{job_id}/results/{output_format}</i>  
+    &nbsp;&nbsp; or of one report with <i>/jobs/{job_id}/items/{item_id}/{output_format}</i>.  
+    &nbsp;&nbsp; Items are the Appeal codes, and upload-1, upload-2, ... for PDF files.
+    """
+    leads = []
+    for codes in (Appeal_codes or []):
+        leads += [code for code in re.split(r'[,\s]+', codes) if code]
+    files = [(f.filename, await f.read()) for f in (pdf_files or [])]
+    if len(leads) + len(files) == 0:
+        raise HTTPException(status_code=400, detail="No Appeal codes or PDF files given")
 
-    if output_format == 'json':
-        return df.to_dict()
+    try:
+        job_id = job_manager.submit(leads=leads, pdf_files=files)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return {'job_id': job_id, 'items': list(job_manager.status(job_id)['items'])}
 
-    else: 
-        # prepare csv output
-        stream = io.StringIO()
-        # NB: comma as a separator works OK even if there exist commas in some excerpts 
-        # since pandas is smart to insert quotes where needed
-        df.to_csv(stream, index = False, sep=',')
 
-        response = StreamingResponse(iter([stream.getvalue()]), media_type="text/csv")
-        response.headers["Content-Disposition"] = "attachment; filename=export.csv"
-        return response    
+@app.get("/jobs/{job_id}")
+def get_job_status(job_id: str):
+    """
+    Status of a job: 'queued', 'running' or 'finished', and status of each item: 
+    'queued', 'running', 'done' or 'failed' (with the error, and the type and message of the exception).
+    """
+    status = job_manager.status(job_id)
+    if status is None:
+        raise HTTPException(status_code=404, detail=f"Job {job_id} not found")
+    return status
+
+
+@app.get("/jobs/{job_id}/results/{output_format}")
+def get_job_results(job_id: str, output_format: JobOutputFormat):
+    """
+    Combined results of all finished items of a job, as json, csv or parquet.
+    """
+    df = job_manager.combined_results(job_id)
+    if df is None:
+        raise HTTPException(status_code=404, detail=f"Job {job_id} not found")
+    return dataframe_response(df, output_format, filename=f'job_{job_id}')
+
+
+@app.get("/jobs/{job_id}/items/{item_id}/{output_format}")
+def get_job_item_results(job_id: str, item_id: str, output_format: JobOutputFormat):
+    """
+    Results of one item of a job (Appeal code, or upload-1, upload-2, ...), as json, csv or parquet.
+    """
+    df = job_manager.item_results(job_id, item_id)
+    if df is None:
+        raise HTTPException(status_code=404, detail=f"No results for {item_id} in job {job_id}")
+    return dataframe_response(df, output_format, filename=f'{item_id}')
 
 
 # *********************************************************************
 
 @app.get("/refresh/")
-async def reload_GO_API_data():
+def reload_GO_API_data(full: bool = Query(False, 
+        description='Download all data again. By default, only changes since the last refresh are downloaded')):
     """
     Reload data from GO database.  
-    This may be needed since the Parse-and-Tag app downloads data from GO
-    the first time it runs and never checks for updates.  
-    To refresh data from GO, run this app.
+    This may be needed since the Parse-and-Tag app keeps a local snapshot of GO data,
+    which is downloaded the first time it runs and updated only by this app.  
+    By default only the changes since the last refresh are downloaded.
     """    
     try:
-        initialize_apdo(refresh=True)
-        initialize_aadf(refresh=True)
+        initialize_apdo(refresh=True, full=full)
+        initialize_aadf(refresh=True, full=full)
 
         # NB: we need to do import again, 
         # otherwise updated apdo, aadf won't be accessible here
@@ -141,7 +229,31 @@ async def reload_GO_API_data():
         output += ' (only DREF Final Reports are selected)'
     except:
         raise HTTPException(status_code=500, detail="Error while accessing GO API data")
-    return output 
+    return output
+
+
+# *********************************************************************
+
+@app.post("/invalidate_cache/")
+def invalidate_PDF_cache(
+    Appeal_code: Optional[str] = Query(None, title="Appeal code",
+        description="Remove cached PDF and parsing results for this Appeal code. If empty, the whole cache is cleared"),
+    x_admin_token: Optional[str] = Header(None)):
+    """
+    Remove downloaded PDFs and their parsing results from the cache.  
+    Normally not needed, since a new URL of the report is not found in cache.
+    But it may be useful if a PDF was replaced under the same URL,
+    or if the parser changed.
+
+    Needs the token set by environment variable DREF_PARSING_CACHE_ADMIN_TOKEN 
+    in header X-Admin-Token (without it, the endpoint is disabled).
+    The cache can also be cleared with 'python -m dref_parsing.cache [Appeal code]'
+    """
+    if not invalidation_allowed(x_admin_token):
+        raise HTTPException(status_code=403, detail="Cache invalidation needs a valid X-Admin-Token")
+    n_removed = pdf_cache.invalidate(lead=Appeal_code)
+    return f'PDF cache: {n_removed} documents removed'
+
 
     # Command to start API:
     # uvicorn main:app --reload
@@ -0,0 +1,68 @@
+# Steps of Parsing+Tagging shared by the API (main.py),
+# its bulk jobs (jobs.py) and the batch command line tool
+
+from importlib import resources
+from functools import lru_cache
+import pandas as pd
+
+from dref_parsing.parser_utils import parse_PDF_combined, ExceptionNotInAPI, ExceptionNoURLforPDF
+
+# Columns of the output
+cols_order = ['Excerpt', 'Learning', 'DREF_Sector', 'Appeal code', 'Hazard', 'Country', 'Date', 'Region', 'Dimension' ,'Subdimension']
+
+
+# Once Subdimension is found, this function helps select the corresponding Dimension
+def get_Dimension_from_Subdimension(subdim, spec):
+    if subdim in list(spec.index):
+        return spec.loc[subdim,'Dimension']
+    return 'ERROR: No Dimension matches this Subdimension :('
+
+# Dimensions of Subdimensions, from csv file
+@lru_cache(maxsize=None)
+def get_DREF_spec():
+    with resources.path("dref_tagging.config", "DREF_spec.csv") as DREF_spec_file:
+        spec = pd.read_csv(DREF_spec_file).set_index('Subdimension')
+    return spec
+
+
+# Error message for exceptions of parsing the report of a lead
+def parsing_error_message(exception, lead):
+    if isinstance(exception, ExceptionNotInAPI):
+        return f"{lead} doesn't have a DREF Final Report in IFRC GO appeal database"
+    if isinstance(exception, ExceptionNoURLforPDF):
+        return f"PDF URL for Appeal code {lead} was not found using IFRC GO API call appeal_document"
+    return "PDF Parsing didn't work by some reason"
+
+
+# Parses a report given by its lead (PDF is downloaded using GO API), 
+# or by a PDF file on disk (then lead may be 'Unknown'). 
+# Reads the file itself, so that worker processes don't need to receive the PDF data
+def parse_report(lead, pdf_path=None):
+    pdf_file = None
+    if pdf_path is not None:
+        with open(pdf_path, 'rb') as f:
+            pdf_file = f.read()
+    return parse_PDF_combined(lead, pdf_file = pdf_file)
+
+
+# Excerpts (and other relevant columns) from the parsed report
+def select_excerpts(all_parsed):
+    return all_parsed[['Modified Excerpt', 'Learning', 'DREF_Sector', 'lead', 'Hazard', 'Country', 'Date', 'Region']].copy() #,'position', 'DREF_Sector_id']]
+
+# Adds tags of the excerpts (list of Subdimensions per excerpt) to the excerpts df,
+# with one row per tag, and cleans/renames the columns
+def add_tags(df, tags):
+    df['Subdimension'] = pd.Series(tags, index=df.index, dtype=object)
+    # Split to "row per tag"
+    df = df.explode('Subdimension')
+
+    # Define Dimensions from Subdimensions
+    spec = get_DREF_spec()
+    df['Dimension'] = df['Subdimension'].apply(lambda x: get_Dimension_from_Subdimension(x, spec))
+    df = df.fillna('Unknown')
+
+    df = df.rename(columns={'lead':'Appeal code','Modified Excerpt':'Excerpt'})
+
+    # reorder columns
+    df = df[cols_order]
+    return df
@@ -0,0 +1,114 @@
+import os
+import sys
+import json
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+from concurrent.futures import ThreadPoolExecutor
+
+import pandas as pd
+
+try:
+    import batch
+except ImportError:
+    batch = None
+
+
+# Parsing results of a report: the excerpts of parse_PDF_combined
+def parse_report(lead, pdf_path=None):
+    if lead == 'MDRXX404':
+        raise KeyError('boom')
+    return pd.DataFrame({'Modified Excerpt': [f'{lead} excerpt'], 'Learning': 'Lessons learnt',
+                         'DREF_Sector': 'Health', 'lead': lead, 'Hazard': 'Flood', 'Country': 'Chile',
+                         'Date': '2021-05-01', 'Region': 'Americas'})
+
+
+@unittest.skipIf(batch is None, 'dref_parsing, dref_tagging or their dependencies are not installed')
+class TestBatch(unittest.TestCase):
+
+    def setUp(self):
+        self.folder = tempfile.mkdtemp()
+        self.output = os.path.join(self.folder, 'output')
+
+    def tearDown(self):
+        shutil.rmtree(self.folder)
+
+    def items(self, codes):
+        return [dict(item=code, lead=code, pdf_path=None) for code in codes]
+
+    def test_get_items(self):
+        reports = os.path.join(self.folder, 'reports')
+        os.makedirs(reports)
+        for name in ['MDRCD030dfr.pdf', 'report.pdf', 'MDRCD030dfr_copy.pdf', 'notes.txt']:
+            open(os.path.join(reports, name), 'w').close()
+
+        items = batch.get_items(folder=reports, codes=['MDRDO013', 'report.pdf', 'MDRDO013'])
+        self.assertEqual(items, [
+            dict(item='MDRCD030dfr.pdf', lead='MDRCD030', pdf_path=os.path.join(reports, 'MDRCD030dfr.pdf')),
+            dict(item='report.pdf', lead='Unknown', pdf_path=os.path.join(reports, 'report.pdf')),
+            dict(item='MDRDO013', lead='MDRDO013', pdf_path=None)])
+
+        items = batch.get_items(folder=reports, offline=True)
+        self.assertEqual([item['lead'] for item in items], ['Unknown', 'Unknown'])
+        self.assertEqual(batch.get_items(), [])
+
+    def test_get_manifest(self):
+        items = self.items(['MDR00001', 'MDR00002', 'MDR00003'])
+        manifest = batch.get_manifest(self.output, items, shard_size=2)
+        self.assertEqual(manifest['shards'], [items[:2], items[2:]])
+
+        # resume: the manifest is read again, also if items are given in another order or shard size
+        self.assertEqual(batch.get_manifest(self.output, items[::-1], shard_size=10), manifest)
+
+        # new items go to new shards, existing shards stay as they are
+        new_items = self.items(['MDR00004', 'MDR00005', 'MDR00006'])
+        manifest = batch.get_manifest(self.output, new_items[:1] + items + new_items[1:], shard_size=2)
+        self.assertEqual(manifest['shards'], [items[:2], items[2:], new_items[:2], new_items[2:]])
+        with open(os.path.join(self.output, batch.manifest_name), 'r') as f:
+            self.assertEqual(json.load(f), manifest)
+
+    def test_shards_to_process(self):
+        manifest = batch.get_manifest(self.output, self.items([f'MDR0000{i}' for i in range(4)]), shard_size=1)
+        # shard 0: finished, shard 1: finished with a failed report,
+        # shard 2: not finished, shard 3: finished without errors file
+        for shard, errors in [(0, {}), (1, {'MDR00001': 'failed'}), (2, {})]:
+            batch.write_atomic(batch.shard_file(self.output, shard, '.errors.json'), json.dumps(errors))
+        for shard in [0, 1, 3]:
+            batch.write_atomic(batch.shard_file(self.output, shard), b'parquet')
+
+        self.assertEqual(batch.shards_to_process(self.output, manifest), [2])
+        self.assertEqual(batch.shards_to_process(self.output, manifest, retry_failed=True), [1, 2])
+
+    def run_main(self, *args):
+        with mock.patch.object(sys, 'argv', ['batch.py', '--output', self.output, '--workers', '2'] + list(args)):
+            batch.main()
+
+    def test_main(self):
+        pools = []
+
+        def pool(max_workers, mp_context):
+            pools.append(ThreadPoolExecutor(max_workers=max_workers))
+            return pools[-1]
+
+        with mock.patch.multiple(batch, parse_report=parse_report, ProcessPoolExecutor=pool,
+                                 predict_tags_any_length=lambda excerpts: [['Coordination']]*len(excerpts)):
+            self.run_main('--codes', 'MDR00001', 'MDRXX404', 'MDR00002', '--shard-size', '2')
+            df = pd.read_parquet(batch.shard_file(self.output, 0))
+            self.assertEqual(df['Item'].tolist(), ['MDR00001'])
+            with open(batch.shard_file(self.output, 0, '.errors.json'), 'r') as f:
+                self.assertEqual(list(json.load(f)), ['MDRXX404'])
+            self.assertEqual(pd.read_parquet(batch.shard_file(self.output, 1))['Item'].tolist(), ['MDR00002'])
+
+            # the pool is shut down also if tagging fails
+            os.remove(batch.shard_file(self.output, 1))
+            with mock.patch.object(batch, 'tag_shard', side_effect=RuntimeError('tagging failed')):
+                with self.assertRaises(RuntimeError):
+                    self.run_main('--codes', 'MDR00001', 'MDRXX404', 'MDR00002')
+        self.assertEqual(len(pools), 2)
+        for pool in pools:
+            self.assertTrue(pool._shutdown)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,133 @@
+import os
+import json
+import time
+import shutil
+import tempfile
+import datetime
+import unittest
+from unittest import mock
+from concurrent.futures import ThreadPoolExecutor
+
+import pandas as pd
+
+try:
+    import jobs
+    from jobs import JobManager
+except ImportError:
+    jobs = None
+
+
+# Parsing results of a report with two excerpts
+def parse_PDF_combined(lead, pdf_file=None):
+    if lead == 'MDRXX404':
+        raise KeyError('boom')
+    lead = lead if pdf_file is None else pdf_file.decode('utf-8')
+    return pd.DataFrame({'Modified Excerpt': [f'{lead} excerpt 1', f'{lead} excerpt 2'],
+                         'Learning': 'Lessons learnt', 'DREF_Sector': 'Health', 'lead': lead,
+                         'Hazard': 'Flood', 'Country': 'Chile', 'Date': '2021-05-01', 'Region': 'Americas'})
+
+
+def predict_tags_any_length(excerpts):
+    return [['Coordination'] for excerpt in excerpts]
+
+
+@unittest.skipIf(jobs is None, 'dref_parsing, dref_tagging or their dependencies are not installed')
+class TestJobManager(unittest.TestCase):
+
+    def setUp(self):
+        self.folder = os.path.join(tempfile.mkdtemp(), 'jobs')
+        self.manager = JobManager(self.folder, max_workers=2, ttl_hours=1, inference_wait=0.01)
+        # parsing and tagging are stubbed, and run in threads of the test process
+        pools = (ThreadPoolExecutor(max_workers=2), ThreadPoolExecutor(max_workers=2))
+        patchers = [mock.patch.object(jobs, 'parse_PDF_combined', parse_PDF_combined),
+                    mock.patch.object(jobs, 'predict_tags_any_length', predict_tags_any_length),
+                    mock.patch.object(self.manager, '_get_pools', return_value=pools)]
+        for patcher in patchers:
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        for pool in pools:
+            self.addCleanup(pool.shutdown)
+        self.addCleanup(shutil.rmtree, os.path.dirname(self.folder))
+
+    def wait(self, job_id, timeout=10):
+        start = time.time()
+        while self.manager.status(job_id)['state'] != 'finished':
+            self.assertLess(time.time() - start, timeout)
+            time.sleep(0.01)
+        return self.manager.status(job_id)
+
+    def test_folder_created_lazily(self):
+        self.assertFalse(os.path.exists(self.folder))
+        self.assertEqual(self.manager.fail_interrupted(), 0)
+        self.manager.remove_expired()
+        self.assertFalse(os.path.exists(self.folder))
+
+    def test_submit(self):
+        job_id = self.manager.submit(leads=['MDRDO013', 'MDRXX404', 'MDRDO013', 'upload1'],
+                                     pdf_files=[('report.pdf', b'MDRBO014')])
+        status = self.wait(job_id)
+        self.assertEqual(list(status['items']), ['MDRDO013', 'MDRXX404', 'upload1', 'upload-1'])
+        self.assertEqual(status['counts'], {'done': 3, 'failed': 1})
+        failed = status['items']['MDRXX404']
+        self.assertEqual(failed['error'], "PDF Parsing didn't work by some reason")
+        self.assertEqual(failed['exception'], "KeyError: 'boom'")
+        self.assertEqual(status['items']['upload-1']['filename'], 'report.pdf')
+        self.assertEqual(status['items']['upload-1']['n_rows'], 2)
+
+        df = self.manager.item_results(job_id, 'upload-1')
+        self.assertEqual(df['Appeal code'].tolist(), ['MDRBO014', 'MDRBO014'])
+        self.assertEqual(df['Subdimension'].tolist(), ['Coordination', 'Coordination'])
+        self.assertIsNone(self.manager.item_results(job_id, 'MDRXX404'))
+        self.assertEqual(len(self.manager.combined_results(job_id)), 6)
+
+        self.assertIsNone(self.manager.status('0' * 32))
+        self.assertIsNone(self.manager.status('../jobs'))
+        with self.assertRaises(ValueError):
+            self.manager.submit(leads=['../MDRDO013'])
+
+    def test_inference_saturated(self):
+        calls = []
+
+        def run_sync(func, *args):
+            calls.append(func)
+            if len(calls) == 1:
+                raise jobs.ExecutorSaturated('busy')
+            return func(*args)
+
+        with mock.patch.object(jobs.inference_executor, 'run_sync', run_sync):
+            status = self.wait(self.manager.submit(leads=['MDRDO013']))
+        self.assertEqual(status['counts'], {'done': 1})
+        self.assertEqual(len(calls), 2)
+
+    def test_expiry(self):
+        job_id = self.manager.submit(leads=['MDRDO013'])
+        self.wait(job_id)
+        self.manager.remove_expired()
+        self.assertIsNotNone(self.manager.status(job_id))
+
+        # an old job, with created_at without time zone as written before
+        with open(self.manager._status_file(job_id), 'r') as f:
+            status = json.load(f)
+        status['created_at'] = (datetime.datetime.now(datetime.timezone.utc) - datetime.timedelta(hours=2)).replace(tzinfo=None).isoformat()
+        self.manager._write_status(job_id, status)
+        self.manager.remove_expired()
+        self.assertIsNone(self.manager.status(job_id))
+        self.assertFalse(os.path.exists(self.manager._job_folder(job_id)))
+
+    def test_fail_interrupted(self):
+        job_id = self.manager.submit(leads=['MDRDO013', 'MDRBO014'])
+        self.wait(job_id)
+        status = self.manager.status(job_id)
+        status['items']['MDRBO014']['status'] = 'running'
+        self.manager._write_status(job_id, status)
+
+        self.assertEqual(self.manager.fail_interrupted(), 1)
+        status = self.manager.status(job_id)
+        self.assertEqual(status['state'], 'finished')
+        self.assertEqual(status['items']['MDRDO013']['status'], 'done')
+        self.assertEqual(status['items']['MDRBO014']['status'], 'failed')
+        self.assertEqual(status['items']['MDRBO014']['error'], 'Interrupted by a restart of the app')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -97,6 +97,10 @@ def convert_examples_to_features(examples, max_seq_length, tokenizer, print_exam
     :return: a list of InputBatch objects
     """
 
+    # Fast (Rust) tokenizers encode all single sequences in one batched call
+    if getattr(tokenizer, 'is_fast', False) and not any(example.text_b for example in examples):
+        return _convert_examples_to_features_fast(examples, max_seq_length, tokenizer, print_examples)
+
     features = []
     for (ex_index, example) in enumerate(examples):
         tokens_a = tokenizer.tokenize(example.text_a)
@@ -170,6 +174,46 @@ def convert_examples_to_features(examples, max_seq_length, tokenizer, print_exam
     return features
 
 
+def _convert_examples_to_features_fast(examples, max_seq_length, tokenizer, print_examples=False):
+    """
+    Same as convert_examples_to_features for single sequences, but tokenizes
+    all examples at once with a fast tokenizer
+    :param examples:
+    :param max_seq_length:
+    :param tokenizer: a fast tokenizer, e.g. BertTokenizerFast
+    :param print_examples:
+    :return: a list of InputBatch objects
+    """
+    encoded = tokenizer([example.text_a for example in examples],
+                        padding='max_length',
+                        truncation=True,
+                        max_length=max_seq_length,
+                        return_attention_mask=True,
+                        return_token_type_ids=True)
+
+    features = []
+    for (ex_index, example) in enumerate(examples):
+        input_ids = encoded['input_ids'][ex_index]
+        input_mask = encoded['attention_mask'][ex_index]
+        segment_ids = encoded['token_type_ids'][ex_index]
+
+        label_id = [float(x) for x in example.label]
+
+        if print_examples and ex_index < 5:
+            tokens = tokenizer.convert_ids_to_tokens(input_ids[:sum(input_mask)])
+            print("tokens: %s" % " ".join([str(x) for x in tokens]))
+            print("input_ids: %s" % " ".join([str(x) for x in input_ids]))
+            print("input_mask: %s" % " ".join([str(x) for x in input_mask]))
+            print("segment_ids: %s" % " ".join([str(x) for x in segment_ids]))
+            print("label: %s" % example.label)
+
+        features.append(InputFeatures(input_ids=input_ids,
+                                      input_mask=input_mask,
+                                      segment_ids=segment_ids,
+                                      label_id=label_id))
+    return features
+
+
 def convert_examples_to_hierarchical_features(examples, max_seq_length, tokenizer, print_examples=False):
     """
     Loads a data file into a list of InputBatch objects
@@ -6,7 +6,7 @@ import torch
 from transformers import (
     AdamW,
     BertForSequenceClassification,
-    BertTokenizer,
+    BertTokenizerFast,
     get_linear_schedule_with_warmup,
 )
 
@@ -94,7 +94,7 @@ if __name__ == "__main__":
 
     args.is_hierarchical = False
     processor = dataset_map[args.dataset]()
-    tokenizer = BertTokenizer.from_pretrained(args.model)
+    tokenizer = BertTokenizerFast.from_pretrained(args.model)
 
     train_examples = None
     num_train_optimization_steps = None